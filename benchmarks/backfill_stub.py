@@ -0,0 +1,183 @@
+# Догрузка истории против локального stub-сервера (без внешней сети).
+# Сервер отдаёт CoinGecko market_chart/range (часовые точки) и ExchangeRate-API
+# history/<base>/<Y>/<M>/<D>, с задержкой, случайными 500 и редкими 429.
+# Сценарий: запуск прерывается после части чанков, повторный запуск
+# продолжает с checkpoint; проверяются полнота и отсутствие дублей.
+#
+#   python -m benchmarks.backfill_stub --days 120 --workers 4
+#   python -m benchmarks.backfill_stub --serve --port 8765   # только сервер
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from valutatrade_hub.parser_service.api_clients import (
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+from valutatrade_hub.parser_service.backfill import Backfiller
+from valutatrade_hub.parser_service.history import HistoryStore
+from valutatrade_hub.parser_service.rate_limiter import TokenBucketLimiter
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+COINS = {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana"}
+FIAT = {"EUR": 0.92, "GBP": 0.79, "RUB": 91.0}
+
+
+def _price(key: str, ts: int) -> float:
+    base = 100.0 + sum(map(ord, key))
+    return round(base * (1 + 0.05 * math.sin(ts / 86400)), 6)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.02
+    fail_rate = 0.05
+    throttle_rate = 0.01
+    requests = 0
+    _lock = threading.Lock()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, code: int, body: dict | None = None, headers=None) -> None:
+        raw = json.dumps(body or {}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self) -> None:
+        with StubHandler._lock:
+            StubHandler.requests += 1
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return self._send(429, headers={"Retry-After": "1"})
+        if roll < self.throttle_rate + self.fail_rate:
+            return self._send(500)
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:1] == ["coins"] and parts[2:] == ["market_chart", "range"]:
+            q = parse_qs(url.query)
+            lo, hi = int(q["from"][0]), int(q["to"][0])
+            first = lo + (-lo % 3600)
+            prices = [
+                [t * 1000, _price(parts[1], t)] for t in range(first, hi + 1, 3600)
+            ]
+            return self._send(200, {"prices": prices})
+        if "history" in parts:
+            y, m, d = (int(x) for x in parts[-3:])
+            day = int(time.mktime((y, m, d, 0, 0, 0, 0, 0, 0)) - time.timezone)
+            rates = {c: _price(c, day) * v / 100 for c, v in FIAT.items()}
+            return self._send(200, {"result": "success", "conversion_rates": rates})
+        self._send(404)
+
+
+def _serve(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _clients(url: str, tmp: Path) -> list:
+    cg = CoinGeckoClient(
+        f"{url}/simple/price",
+        COINS,
+        history_url=f"{url}/coins/{{id}}/market_chart/range",
+    )
+    er = ExchangeRateApiClient(url, "stub-key", "USD")
+    for c in (cg, er):
+        c.use_limiter(TokenBucketLimiter(tmp / "rl", c.SOURCE, 50, 200), 5.0)
+    return [cg, er]
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interrupt-after", type=int, default=10)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--serve", action="store_true")
+    args = parser.parse_args()
+
+    server = _serve(args.port)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.serve:
+        print(f"stub server on {url} (Ctrl-C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    pairs = [f"{c}_USD" for c in COINS] + [f"{c}_USD" for c in FIAT]
+    until = int(time.time()) // 86400 * 86400
+    since = until - args.days * 86400
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        history = HistoryStore(tmp / "history", retention_seconds={"raw": None})
+        storage = RatesStorage(tmp / "rates.json", tmp / "er.json", history=history)
+        checkpoint = tmp / "backfill.checkpoint.json"
+
+        def make() -> Backfiller:
+            return Backfiller(
+                _clients(url, tmp),
+                storage,
+                checkpoint,
+                workers=args.workers,
+                flush_points=2_000,
+                max_wait=5.0,
+            )
+
+        def stop_early(st: dict) -> None:
+            if st["fetched"] >= args.interrupt_after:
+                raise _Interrupt
+
+        t0 = time.perf_counter()
+        try:
+            make().run(pairs, since, until, stop_early)
+        except _Interrupt:
+            pass
+        done = json.loads(checkpoint.read_text())["done"]
+        print(f"interrupted run: {len(done)} chunks checkpointed")
+
+        for attempt in range(1, 4):
+            res = make().run(pairs, since, until)
+            print(
+                f"resume #{attempt}: chunks={res['chunks']} skipped={res['skipped']} "
+                f"fetched={res['fetched']} failed={res['failed']} "
+                f"added={res['added']}"
+            )
+            if not res["failed"] and not res["throttled"]:
+                break
+        elapsed = time.perf_counter() - t0
+
+        rows = history.query(since=since, until=until - 1)
+        ids = [(r["pair"], r["ts"]) for r in rows]
+        expected = len(COINS) * args.days * 24 + len(FIAT) * args.days
+        daily = history.query(since=since, until=until - 1, resolution_seconds=86400)
+        print(
+            f"points={len(rows)} expected={expected} "
+            f"duplicates={len(ids) - len(set(ids))} "
+            f"daily_bars={len(daily)}/{len(pairs) * args.days} "
+            f"requests={StubHandler.requests} elapsed={elapsed:.2f}s"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
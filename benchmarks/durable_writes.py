@@ -0,0 +1,88 @@
+# Пропускная способность сделок при разных уровнях надёжности записи.
+# Сделка = изменение кошелька в портфелях + запись portfolios.json через
+# DurableWriter (как DatabaseManager.write). Потоки имитируют одновременных
+# писателей: в режиме group их записи объединяются в один fsync.
+#
+#   python -m benchmarks.durable_writes --users 1000 --trades 400 --threads 1,8
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from valutatrade_hub.infra.codecs import get_codec
+from valutatrade_hub.infra.commit import DURABILITY_LEVELS, DurableWriter
+
+
+def _portfolios(n: int, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    codes = ["USD", "EUR", "BTC", "ETH", "RUB"]
+    return [
+        {
+            "user_id": i,
+            "wallets": {c: {"balance": round(rnd.random() * 1000, 6)} for c in codes},
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _run(
+    level: str, threads: int, trades: int, users: int, codec: str, window_ms: float
+) -> tuple[float, int]:
+    portfolios = _portfolios(users, 42)
+    state_lock = threading.Lock()
+    codec_obj = get_codec(codec)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "portfolios.json"
+        writer = DurableWriter(level, window_ms / 1000)
+        writer.write(path, portfolios, codec_obj)
+        per_thread = trades // threads
+
+        def work(seed: int) -> None:
+            rnd = random.Random(seed)
+            for _ in range(per_thread):
+                with state_lock:
+                    p = portfolios[rnd.randrange(users)]
+                    p["wallets"]["BTC"]["balance"] += 0.001
+                    # Снимок состояния на момент сделки (как read-modify-write)
+                    data = [dict(x, wallets=dict(x["wallets"])) for x in portfolios]
+                writer.write(path, data, codec_obj)
+
+        pool = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+        flushes_before = writer.flushes
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        return per_thread * threads / elapsed, writer.flushes - flushes_before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--trades", type=int, default=400)
+    parser.add_argument("--threads", default="1,8")
+    parser.add_argument("--codec", default="json")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(
+        f"users={args.users} trades={args.trades} codec={args.codec} "
+        f"window={args.window_ms}ms"
+    )
+    for threads in (int(x) for x in args.threads.split(",")):
+        for level in DURABILITY_LEVELS:
+            tps, flushes = _run(
+                level, threads, args.trades, args.users, args.codec, args.window_ms
+            )
+            extra = f" flushes={flushes}" if level == "group" else ""
+            print(f"threads={threads:>2} {level:>5}: {tps:8.1f} trades/s{extra}")
+
+
+if __name__ == "__main__":
+    main()
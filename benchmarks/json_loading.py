@@ -0,0 +1,104 @@
+# Пиковый RSS и время скана большого JSON-массива:
+# read_text + json.loads (прежний загрузчик) против потокового iter_json_array.
+# Каждый режим запускается в отдельном процессе, чтобы ru_maxrss был честным.
+#
+#   python -m benchmarks.json_loading --records 500000
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.infra.jsonstream import iter_json_array
+
+MODES = ("baseline", "loads", "stream")
+
+
+def _generate(path: Path, n: int, seed: int) -> None:
+    # Файл в формате portfolios.json, пишется потоково
+    rnd = random.Random(seed)
+    codes = ["USD", "EUR", "RUB", "BTC", "ETH", "SOL", "GBP", "JPY"]
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(1, n + 1):
+            wallets = {
+                c: {"balance": round(rnd.random() * 1000, 6)}
+                for c in rnd.sample(codes, 3)
+            }
+            rec = {"user_id": i, "wallets": wallets}
+            f.write(("," if i > 1 else "") + json.dumps(rec, indent=2) + "\n")
+        f.write("]\n")
+
+
+def _peak_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _child(mode: str, path: Path) -> None:
+    # Скан: число пользователей и сумма балансов
+    t0 = time.perf_counter()
+    if mode == "loads":
+        records = json.loads(path.read_text(encoding="utf-8").strip())
+    elif mode == "stream":
+        records = iter_json_array(path)
+    else:
+        records = []
+    users = 0
+    total = 0.0
+    for p in records:
+        users += 1
+        for w in p["wallets"].values():
+            total += w["balance"]
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"users": users, "elapsed": elapsed, "peak_mb": _peak_mb()}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", choices=MODES, default=None)
+    parser.add_argument("--path", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "portfolios.json"
+        _generate(path, args.records, args.seed)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"records={args.records} file={size_mb:.1f}MB")
+
+        for mode in MODES:
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.json_loading",
+                    "--child",
+                    mode,
+                    "--path",
+                    str(path),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            res = json.loads(out)
+            print(
+                f"{mode:>8}: users={res['users']} "
+                f"elapsed={res['elapsed']:.2f}s peak_rss={res['peak_mb']:.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
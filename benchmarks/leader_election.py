@@ -0,0 +1,128 @@
+# Выбор лидера между несколькими локальными процессами планировщика.
+# Каждый процесс держит LeaseElector на общем файле аренды; лидер раз в такт
+# "пишет курсы" (строка в общий журнал, под тем же ограждением, что и
+# RatesUpdater). Лидера убивают SIGKILL — меряем, за сколько новый лидер
+# начинает писать, и проверяем, что в журнале нет записей от двух владельцев
+# в одном сроке и записей старого срока после нового.
+#
+#   python -m benchmarks.leader_election --procs 4 --lease 2 --rounds 3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.parser_service.leader import LeaseElector
+
+
+def _child(lease_path: Path, journal: Path, lease: float) -> None:
+    elector = LeaseElector(lease_path, lease_seconds=lease)
+    elector.start_heartbeat()
+    while True:
+        if elector.holds():
+            rec = {"owner": elector.owner_id, "term": elector.term, "t": time.time()}
+            with journal.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+        time.sleep(lease / 10)
+
+
+def _journal(path: Path) -> list[dict]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def _wait_leader(journal: Path, after: float, timeout: float) -> dict | None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        fresh = [r for r in _journal(journal) if r["t"] > after]
+        if fresh:
+            return fresh[0]
+        time.sleep(0.02)
+    return None
+
+
+def _check(records: list[dict]) -> list[str]:
+    # Один владелец на срок, сроки в журнале не убывают
+    problems = []
+    owners: dict[int, str] = {}
+    top = 0
+    for r in records:
+        if owners.setdefault(r["term"], r["owner"]) != r["owner"]:
+            problems.append(f"term {r['term']}: two owners")
+        if r["term"] < top:
+            problems.append(f"stale write term {r['term']} after term {top}")
+        top = max(top, r["term"])
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--lease", type=float, default=2.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--path", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.path / "scheduler.lease", args.path / "journal.jsonl", args.lease)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cmd = [
+            sys.executable,
+            "-m",
+            "benchmarks.leader_election",
+            "--child",
+            "--path",
+            tmp,
+            "--lease",
+            str(args.lease),
+        ]
+        procs = {}
+        for _ in range(args.procs):
+            p = subprocess.Popen(cmd)
+            procs[p.pid] = p
+        journal = Path(tmp) / "journal.jsonl"
+        try:
+            leader = _wait_leader(journal, 0.0, args.lease * 3)
+            if leader is None:
+                sys.exit("no leader elected")
+            print(f"procs={args.procs} lease={args.lease}s")
+            print(f"initial leader term={leader['term']} {leader['owner']}")
+            for i in range(1, min(args.rounds, args.procs - 1) + 1):
+                # Лидер успевает поработать и продлить аренду
+                time.sleep(args.lease)
+                pid = int(leader["owner"].split(":")[1])
+                killed_at = time.time()
+                os.kill(pid, signal.SIGKILL)
+                procs.pop(pid).wait()
+                leader = _wait_leader(journal, killed_at, args.lease * 3)
+                if leader is None:
+                    sys.exit(f"round {i}: no takeover")
+                print(
+                    f"round {i}: takeover in {leader['t'] - killed_at:.2f}s "
+                    f"-> term={leader['term']} {leader['owner']}"
+                )
+        finally:
+            for p in procs.values():
+                p.kill()
+                p.wait()
+        records = _journal(journal)
+        problems = _check(records)
+        print(f"journal: {len(records)} writes, {len(problems)} conflicts")
+        for line in problems[:10]:
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
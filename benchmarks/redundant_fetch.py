@@ -0,0 +1,106 @@
+# Хвостовые задержки и точность обновления при резервных источниках.
+# Фейковые клиенты: логнормальная задержка, редкие зависания (stall) основного
+# источника (у резервного — в 10 раз реже) и третий источник, который иногда
+# врёт на +10% (участвует только в quorum).
+# Сравниваются режимы single / hedged / quorum RedundantFetcher:
+# p50/p95/p99 времени обновления группы и максимальная ошибка курса.
+#
+#   python -m benchmarks.redundant_fetch --rounds 1000 --stall-rate 0.03
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import time
+
+from valutatrade_hub.parser_service.redundancy import (
+    LatencyTracker,
+    RedundantFetcher,
+)
+
+TRUE_RATES = {"BTC_USD": 60000.0, "ETH_USD": 3000.0, "SOL_USD": 150.0}
+
+
+class FakeClient:
+    def __init__(
+        self,
+        source: str,
+        median: float,
+        stall_rate: float = 0.0,
+        stall: float = 1.0,
+        wrong_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.SOURCE = source
+        self._median = median
+        self._stall_rate = stall_rate
+        self._stall = stall
+        self._wrong_rate = wrong_rate
+        self._rnd = random.Random(seed)
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict]:
+        delay = self._median * self._rnd.lognormvariate(0, 0.3)
+        if self._rnd.random() < self._stall_rate:
+            delay += self._stall
+        time.sleep(delay)
+        k = 1.10 if self._rnd.random() < self._wrong_rate else 1.0
+        rates = {p: v * k for p, v in TRUE_RATES.items()}
+        return rates, {"source": self.SOURCE, "request_ms": int(delay * 1000)}
+
+
+def _pct(data: list[float], p: float) -> float:
+    data = sorted(data)
+    return data[min(len(data) - 1, int(p * len(data)))]
+
+
+def _run(mode: str, args: argparse.Namespace) -> None:
+    group = [
+        FakeClient("Primary", 0.02, stall_rate=args.stall_rate, seed=1),
+        FakeClient("Backup", 0.03, stall_rate=args.stall_rate / 10, seed=2),
+        FakeClient("Liar", 0.025, wrong_rate=args.wrong_rate, seed=3),
+    ]
+    if mode != "quorum":
+        # Без кворума «врун» в группе не участвует — иначе hedged его бы взял
+        group = group[:2]
+    fetcher = RedundantFetcher(
+        [group],
+        mode=mode,
+        hedge_percentile=0.95,
+        hedge_default_delay=0.1,
+        hedge_min_delay=0.01,
+        quorum=2,
+        max_deviation=0.02,
+        latency=LatencyTracker(),
+    )
+    times: list[float] = []
+    worst = 0.0
+    previous = dict(TRUE_RATES)
+    for _ in range(args.rounds):
+        t0 = time.perf_counter()
+        for _, rates, _, error in fetcher.fetch_all(previous):
+            if error is None:
+                for pair, rate in rates.items():
+                    worst = max(worst, abs(rate / TRUE_RATES[pair] - 1))
+        times.append(time.perf_counter() - t0)
+    print(
+        f"{mode:>7}: p50={_pct(times, 0.5) * 1000:6.1f}ms "
+        f"p95={_pct(times, 0.95) * 1000:6.1f}ms "
+        f"p99={_pct(times, 0.99) * 1000:6.1f}ms "
+        f"max_error={worst:.1%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--wrong-rate", type=float, default=0.2)
+    args = parser.parse_args()
+    # Сообщения об отброшенных выбросах не нужны в выводе бенчмарка
+    logging.disable(logging.WARNING)
+    for mode in ("single", "hedged", "quorum"):
+        _run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Размер файла, время сохранения и загрузки portfolios.json в каждом кодеке.
+#
+#   python -m benchmarks.storage_codecs --records 200000
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.infra.codecs import CODECS, dump_file, load_file
+
+
+def _portfolios(n: int, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    codes = ["USD", "EUR", "RUB", "BTC", "ETH", "SOL", "GBP", "JPY"]
+    return [
+        {
+            "user_id": i,
+            "wallets": {
+                c: {"balance": round(rnd.random() * 1000, 6)}
+                for c in rnd.sample(codes, 3)
+            },
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    data = _portfolios(args.records, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"records={args.records}")
+        for name, codec in CODECS.items():
+            path = Path(tmp) / f"portfolios.{name}"
+            save = _best(
+                lambda p=path, c=codec: dump_file(p, data, c), args.repeat
+            )
+            load = _best(lambda p=path: load_file(p), args.repeat)
+            assert load_file(path) == data
+            size_mb = path.stat().st_size / (1024 * 1024)
+            print(
+                f"{name:>12}: size={size_mb:.1f}MB "
+                f"save={save * 1000:.0f}ms load={load * 1000:.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Офлайн-бенчмарк пайплайна обновления курсов:
+# SyntheticMarketClient (или ReplayClient) -> RatesUpdater -> RatesStorage.
+#
+#   python -m benchmarks.update_pipeline --pairs 5000 --ticks 20
+#   python -m benchmarks.update_pipeline --replay data/recordings/coingecko.jsonl
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from valutatrade_hub.parser_service.offline_clients import (
+    ReplayClient,
+    SyntheticMarketClient,
+)
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replay", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.replay:
+        client = ReplayClient(args.replay, speed=0.0, loop=True)
+    else:
+        client = SyntheticMarketClient(n_pairs=args.pairs, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        storage = RatesStorage(root / "rates.json", root / "exchange_rates.json")
+        updater = RatesUpdater(clients=[client], storage=storage)
+
+        t0 = time.perf_counter()
+        processed = written = 0
+        for _ in range(args.ticks):
+            res = updater.run_update()
+            processed += res["total_pairs"]
+            # id истории секундный: тики в пределах секунды схлопываются
+            written += res["history_added"]
+        elapsed = time.perf_counter() - t0
+
+    print(
+        f"ticks={args.ticks} pairs={processed} history={written} "
+        f"elapsed={elapsed:.2f}s updates/s={args.ticks / elapsed:.1f} "
+        f"pairs/s={processed / elapsed:,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
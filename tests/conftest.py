@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import importlib
+
+import pytest
+
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.parser_service.storage import utc_now_iso
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Свой каталог данных на тест: синглтоны создаются заново
+    path = tmp_path / "data"
+    monkeypatch.setitem(SettingsLoader()._cache, "DATA_DIR", str(path))
+    monkeypatch.setattr(DatabaseManager, "_instance", None)
+    return path
+
+
+@pytest.fixture
+def usecases(data_dir):
+    # usecases держит состояние на уровне модуля — перезагружаем его
+    from valutatrade_hub.core import usecases as module
+
+    return importlib.reload(module)
+
+
+@pytest.fixture
+def alice(usecases):
+    usecases.register("alice", "secret")
+    usecases.login("alice", "secret")
+    return usecases
+
+
+@pytest.fixture
+def set_rates(usecases):
+    # Свежий rates.json: {"BTC_USD": 100.0, ...}
+    def apply(rates: dict[str, float]) -> None:
+        now = utc_now_iso()
+        pairs = {
+            pair: {"rate": rate, "updated_at": now, "source": "test"}
+            for pair, rate in rates.items()
+        }
+        usecases._db.write(
+            usecases._db.rates_path, {"pairs": pairs, "last_refresh": now}
+        )
+
+    return apply
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from valutatrade_hub.parser_service.events import RatesChangedEvent
+
+
+def _move(pair: str, old: float, new: float) -> RatesChangedEvent:
+    return RatesChangedEvent(1, frozenset([pair]), moves={pair: (old, new)})
+
+
+def test_alert_fires_once_when_threshold_crossed(alice):
+    above = alice.add_alert("BTC", 110, "above")
+    below = alice.add_alert("BTC", 90, "below")
+
+    assert alice.on_rates_changed(_move("BTC_USD", 100, 105)) == []
+    fired = alice.on_rates_changed(_move("BTC_USD", 105, 115))
+    assert [a["id"] for a in fired] == [above["id"]]
+    assert fired[0]["triggered_rate"] == 115
+
+    # Повторное пересечение не срабатывает второй раз
+    assert alice.on_rates_changed(_move("BTC_USD", 100, 120)) == []
+    stored = {a["id"]: a for a in alice.list_alerts()}
+    assert stored[above["id"]]["triggered_at"] is not None
+    assert stored[below["id"]]["triggered_at"] is None
+
+
+def test_alerts_written_by_another_process_are_picked_up(alice):
+    alice.add_alert("BTC", 110, "above")
+    alice.on_rates_changed(_move("BTC_USD", 100, 100.5))
+
+    # Другой процесс дописал алерт в файл, минуя индекс этого процесса
+    alerts = alice._db.read(alice._db.alerts_path)
+    alerts.append(dict(alerts[0], id=2, threshold=101))
+    alice._db.write(alice._db.alerts_path, alerts)
+
+    fired = alice.on_rates_changed(_move("BTC_USD", 100.5, 102))
+    assert [a["id"] for a in fired] == [2]
+
+
+def test_alert_triggered_elsewhere_is_not_rewritten(alice):
+    alert = alice.add_alert("BTC", 110, "above")
+    alice._get_alert_engine()
+
+    alerts = alice._db.read(alice._db.alerts_path)
+    alerts[0]["triggered_at"] = "2024-01-01T00:00:00"
+    alerts[0]["triggered_rate"] = 111
+    alice._db.write(alice._db.alerts_path, alerts)
+
+    assert alice.on_rates_changed(_move("BTC_USD", 100, 120)) == []
+    (stored,) = alice.list_alerts()
+    assert stored["id"] == alert["id"]
+    assert stored["triggered_rate"] == 111
+
+
+def test_handle_rates_changed_runs_every_subscriber(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+    alice.add_alert("BTC", 95, "below")
+    order = alice.place_order("buy", "BTC", 96, 1)
+
+    triggered, orders = alice.handle_rates_changed(_move("BTC_USD", 100, 94))
+    assert len(triggered) == 1
+    assert [(o["id"], o["status"]) for o in orders] == [(order["id"], "filled")]
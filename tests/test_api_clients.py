@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service import api_clients
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient
+
+
+class FlakyCoinGecko(CoinGeckoClient):
+    # Кусок с "bad" не отвечает никогда, с "slow" — только со второй попытки
+    def __init__(self, **kwargs) -> None:
+        ids = {"BTC": "bitcoin", "ETH": "slow", "SOL": "bad"}
+        super().__init__("http://test", ids, chunk_size=1, **kwargs)
+        self.calls: dict[str, int] = {}
+
+    def _fetch_chunk(self, ids):
+        coin = ids[0]
+        self.calls[coin] = self.calls.get(coin, 0) + 1
+        if coin == "bad" or (coin == "slow" and self.calls[coin] == 1):
+            raise ApiRequestError(f"{coin}: timeout")
+        return {coin: {"usd": 1.0}}, {"status_code": 200}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls: list[float] = []
+    monkeypatch.setattr(api_clients.time, "sleep", calls.append)
+    return calls
+
+
+def test_partial_result_is_flagged_without_fake_status(sleeps):
+    client = FlakyCoinGecko(max_retries=2, retry_backoff=1.0)
+    rates, meta = client.fetch_rates()
+
+    assert rates == {"BTC_USD": 1.0, "ETH_USD": 1.0}
+    assert meta["status_code"] == 200
+    assert meta["partial"] is True
+    assert meta["failed_chunks"] == [2]
+    assert client.calls == {"bitcoin": 1, "slow": 2, "bad": 3}
+
+
+def test_retries_back_off_exponentially_with_jitter(sleeps, monkeypatch):
+    monkeypatch.setattr(api_clients.random, "uniform", lambda lo, hi: hi)
+    FlakyCoinGecko(max_retries=2, retry_backoff=0.5).fetch_rates()
+    # Пауза только между раундами и не больше base * 2**n
+    assert sleeps == [0.5, 1.0]
+
+
+def test_full_result_is_not_partial(sleeps):
+    client = FlakyCoinGecko(max_retries=0)
+    client._crypto_id_map = {"BTC": "bitcoin"}
+    _, meta = client.fetch_rates()
+    assert meta["partial"] is False
+    assert sleeps == []
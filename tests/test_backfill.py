@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.backfill import Backfiller, plan_chunks
+from valutatrade_hub.parser_service.history import HistoryStore
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+DAY = 86400
+SINCE = 19675 * DAY
+UNTIL = SINCE + 30 * DAY
+
+
+def _price(pair: str, ts: int) -> float:
+    return 100.0 + sum(map(ord, pair)) + ts % 997 / 1000
+
+
+class StubHistoryClient:
+    # Часовые точки; каждый третий чанк с первого раза отвечает ошибкой
+    SOURCE = "Stub"
+    HISTORY_CHUNK_SECONDS = 7 * DAY
+
+    def __init__(self, pairs: list[str], step: int = 3600) -> None:
+        self._pairs = pairs
+        self._step = step
+        self._lock = threading.Lock()
+        self.calls: dict[tuple, int] = {}
+
+    def history_groups(self, pairs: list[str]) -> list[list[str]]:
+        return [[p] for p in pairs if p in self._pairs]
+
+    def fetch_history(self, pairs, start, end):
+        key = (tuple(pairs), start, end)
+        with self._lock:
+            n = self.calls[key] = self.calls.get(key, 0) + 1
+        if n == 1 and (start // self.HISTORY_CHUNK_SECONDS) % 3 == 0:
+            raise ApiRequestError("Stub: 500")
+        first = start + (-start % self._step)
+        return {
+            p: [(t, _price(p, t)) for t in range(first, end, self._step)]
+            for p in pairs
+        }
+
+
+class Interrupt(Exception):
+    pass
+
+
+@pytest.fixture
+def storage(tmp_path):
+    history = HistoryStore(tmp_path / "history", retention_seconds={"raw": None})
+    return RatesStorage(tmp_path / "rates.json", tmp_path / "er.json", history)
+
+
+def _backfiller(client, storage, tmp_path) -> Backfiller:
+    return Backfiller(
+        [client],
+        storage,
+        tmp_path / "backfill.checkpoint.json",
+        workers=3,
+        flush_points=200,
+        sleep=lambda s: None,
+    )
+
+
+def _points(storage) -> list[tuple[str, int]]:
+    return [(r["pair"], r["ts"]) for r in storage.load_history(None, SINCE, UNTIL)]
+
+
+def test_interrupted_backfill_resumes_without_gaps_or_duplicates(storage, tmp_path):
+    pairs = ["BTC_USD", "ETH_USD"]
+    client = StubHistoryClient(pairs)
+
+    def stop_early(stats: dict) -> None:
+        if stats["fetched"] >= 3:
+            raise Interrupt
+
+    with pytest.raises(Interrupt):
+        _backfiller(client, storage, tmp_path).run(pairs, SINCE, UNTIL, stop_early)
+    first = _points(storage)
+    assert 0 < len(first) < len(pairs) * 30 * 24
+    checkpoint = json.loads((tmp_path / "backfill.checkpoint.json").read_text())
+    chunks, _ = plan_chunks([client], pairs, SINCE, UNTIL)
+    saved = [(c.pairs, c.start, c.end) for c in chunks if c.key in checkpoint["done"]]
+    calls_before = dict(client.calls)
+
+    res = _backfiller(client, storage, tmp_path).run(pairs, SINCE, UNTIL)
+    assert res["failed"] == 0
+    assert res["skipped"] >= 3
+    assert res["skipped"] + res["fetched"] == res["chunks"]
+
+    points = _points(storage)
+    assert len(points) == len(set(points))
+    expected = {(p, t) for p in pairs for t in range(SINCE, UNTIL, 3600)}
+    assert set(points) == expected
+    # Чанки из checkpoint после прерывания повторно не запрашивались
+    assert len(saved) >= 3
+    assert all(client.calls[k] == calls_before[k] for k in saved)
+
+    again = _backfiller(client, storage, tmp_path).run(pairs, SINCE, UNTIL)
+    assert again["fetched"] == 0 and again["added"] == 0
+
+
+def test_interior_chunk_keys_do_not_depend_on_since():
+    client = StubHistoryClient(["BTC_USD"])
+    span = StubHistoryClient.HISTORY_CHUNK_SECONDS
+    a, _ = plan_chunks([client], ["BTC_USD"], SINCE, UNTIL)
+    b, _ = plan_chunks([client], ["BTC_USD"], SINCE + DAY, UNTIL)
+
+    interior = {c.key for c in a if c.start % span == 0 and c.end - c.start == span}
+    assert interior and interior <= {c.key for c in b}
+    # Обрезанный крайний чанк ключуется своими границами
+    assert b[0].start == SINCE + DAY and b[0].key != a[0].key
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from valutatrade_hub.infra import commit
+from valutatrade_hub.infra.codecs import dump_file, get_codec
+from valutatrade_hub.infra.commit import DurableWriter, GroupCommitter
+
+CODEC = get_codec("json")
+
+
+class RecordingFlush:
+    # Подменяет commit_files: запоминает пакеты и пишет их как есть.
+    # С gate сброс ждёт разрешения, started отмечает начало первого сброса
+    def __init__(self, gate: threading.Event | None = None) -> None:
+        self.batches: list[dict] = []
+        self.started = threading.Event()
+        self._gate = gate
+
+    def __call__(self, batch):
+        self.started.set()
+        if self._gate is not None:
+            self._gate.wait(5)
+        self.batches.append({p.name: data for p, (data, _) in batch.items()})
+        commit.commit_files(batch)
+
+
+def _writers(group: GroupCommitter, tmp_path, n: int) -> list[threading.Thread]:
+    threads = [
+        threading.Thread(
+            target=group.submit, args=(tmp_path / f"u{i % 4}.json", i, CODEC)
+        )
+        for i in range(n)
+    ]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_single_writer_flushes_without_window(tmp_path):
+    flush = RecordingFlush()
+    group = GroupCommitter(window_seconds=5.0, flush=flush)
+    t0 = time.monotonic()
+    for i in range(3):
+        group.submit(tmp_path / "a.json", {"n": i}, CODEC)
+
+    # Прошлый пакет из одного писателя — окно не ждётся
+    assert time.monotonic() - t0 < 1.0
+    assert flush.batches == [{"a.json": {"n": i}} for i in range(3)]
+    assert CODEC.loads((tmp_path / "a.json").read_bytes()) == {"n": 2}
+
+
+def test_concurrent_writers_share_one_flush(tmp_path):
+    # Первый сброс задерживаем: остальные писатели копятся в следующем пакете
+    gate = threading.Event()
+    flush = RecordingFlush(gate)
+    group = GroupCommitter(window_seconds=5.0, flush=flush)
+
+    first = threading.Thread(
+        target=group.submit, args=(tmp_path / "first.json", 0, CODEC)
+    )
+    first.start()
+    assert flush.started.wait(5)
+    writers = _writers(group, tmp_path, 8)
+    assert group.wait_pending(8, timeout=5)
+    gate.set()
+    for t in [first, *writers]:
+        t.join()
+
+    assert group.flushes == 2
+    assert flush.batches[0] == {"first.json": 0}
+    # Повторные записи файла в пакете схлопнуты до одной версии
+    assert sorted(flush.batches[1]) == [f"u{i}.json" for i in range(4)]
+    for i in range(4):
+        value = CODEC.loads((tmp_path / f"u{i}.json").read_bytes())
+        assert value == flush.batches[1][f"u{i}.json"]
+
+
+def test_window_collects_as_many_writers_as_last_batch(tmp_path):
+    gate = threading.Event()
+    flush = RecordingFlush(gate)
+    group = GroupCommitter(window_seconds=5.0, flush=flush)
+    first = threading.Thread(
+        target=group.submit, args=(tmp_path / "first.json", 0, CODEC)
+    )
+    first.start()
+    assert flush.started.wait(5)
+    writers = _writers(group, tmp_path, 6)
+    assert group.wait_pending(6, timeout=5)
+    gate.set()
+    for t in [first, *writers]:
+        t.join()
+    assert group.flushes == 2
+
+    # Сброс свободен, но прошлый пакет был из шести: лидер ждёт остальных
+    t0 = time.monotonic()
+    for t in _writers(group, tmp_path, 6):
+        t.join()
+    assert time.monotonic() - t0 < 5.0
+    assert group.flushes == 3
+    assert sorted(flush.batches[2]) == [f"u{i}.json" for i in range(4)]
+
+
+def test_flush_error_reaches_every_writer_of_the_group(tmp_path):
+    def broken(batch):
+        raise OSError("disk full")
+
+    group = GroupCommitter(window_seconds=0.0, flush=broken)
+    with pytest.raises(OSError, match="disk full"):
+        group.submit(tmp_path / "a.json", 1, CODEC)
+    assert not (tmp_path / "a.json").exists()
+
+
+@pytest.mark.parametrize("durability", ["none", "fsync", "group"])
+def test_durable_writer_replaces_file_atomically(tmp_path, durability):
+    writer = DurableWriter(durability, window_seconds=0.0)
+    path = tmp_path / "data.json"
+    writer.write(path, [1, 2], CODEC)
+    writer.write(path, [3], CODEC)
+    assert CODEC.loads(path.read_bytes()) == [3]
+    assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
+
+
+def test_parallel_dumps_use_separate_temp_files(tmp_path):
+    # Общий <name>.tmp у параллельных писателей терялся при rename
+    path = tmp_path / "portfolios.json"
+    errors: list[BaseException] = []
+
+    def worker(n: int) -> None:
+        try:
+            for i in range(50):
+                dump_file(path, {"writer": n, "i": i}, CODEC)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert CODEC.loads(path.read_bytes())["i"] == 49
+    assert [p.name for p in tmp_path.iterdir()] == ["portfolios.json"]
+
+
+def test_unknown_durability_is_rejected():
+    with pytest.raises(ValueError):
+        DurableWriter("sometimes")
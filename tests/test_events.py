@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+
+from valutatrade_hub.parser_service.events import (
+    RatesEventBus,
+    RatesVersionWatcher,
+)
+from valutatrade_hub.parser_service.history import epoch_to_iso
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class StubClient:
+    SOURCE = "CoinGecko"
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        self.rates = rates
+
+    def fetch_rates(self):
+        return dict(self.rates), {"source": self.SOURCE, "status_code": 200}
+
+
+def test_watcher_updates_leaderboard_from_other_process(alice, data_dir, monkeypatch):
+    storage = RatesStorage(alice._db.rates_path, data_dir / "exchange_rates.json")
+    # Минутой раньше: обновление в ту же секунду не перезаписало бы курс
+    snapshot_at = epoch_to_iso(int(time.time()) - 60)
+    storage.save_snapshot(
+        {
+            "pairs": {"BTC_USD": {"rate": 100.0, "updated_at": snapshot_at}},
+            "last_refresh": snapshot_at,
+        }
+    )
+    alice.buy("BTC", 2)
+    assert alice.leaderboard("USD")["rows"][0][2] == 200.0
+    watcher = RatesVersionWatcher(storage.version_file)
+
+    # Планировщик в другом процессе: своя шина, общие файлы
+    other = RatesUpdater(
+        clients=[StubClient({"BTC_USD": 150.0})], storage=storage, bus=RatesEventBus()
+    )
+    other.run_update()
+
+    event = watcher.poll()
+    assert event.pairs == {"BTC_USD"} and not event.full
+    assert alice.apply_external_rates(event) == 1
+    assert watcher.poll() is None
+
+    # Рейтинг уже свежий: rates.json повторно не разбирается
+    def no_full_read():
+        raise AssertionError("rates.json read")
+
+    monkeypatch.setattr(alice, "_rates_pairs", no_full_read)
+    assert alice.leaderboard("USD")["rows"][0][2] == 300.0
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from valutatrade_hub.parser_service.history import HistoryStore
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+DAY = 19675 * 86400  # начало суток UTC
+
+
+def _points(store: HistoryStore, points: list[tuple[int, float]]) -> None:
+    store.append([{"pair": "BTC_USD", "ts": ts, "rate": r} for ts, r in points])
+
+
+def test_bar_close_is_known_only_after_bar_end(tmp_path):
+    store = HistoryStore(tmp_path / "history", retention_seconds={"raw": None})
+    _points(store, [(DAY + 10, 1.0), (DAY + 3000, 2.0), (DAY + 3610, 3.0)])
+
+    hourly = store.series("BTC_USD", DAY - 86400, DAY + 7200, 3600)
+    # Внутри первого часа его close ещё неизвестен
+    assert hourly.at(DAY + 100) is None
+    assert hourly.at(DAY + 3599) is None
+    assert hourly.at(DAY + 3600) == 2.0
+    assert hourly.sample([DAY + 3700, DAY + 7200]) == [2.0, 3.0]
+
+
+def test_raw_points_are_known_at_their_timestamp(tmp_path):
+    store = HistoryStore(tmp_path / "history", retention_seconds={"raw": None})
+    _points(store, [(DAY + 10, 1.0), (DAY + 3000, 2.0)])
+
+    assert store.rate_at("BTC_USD", DAY + 9) is None
+    assert store.rate_at("BTC_USD", DAY + 10) == 1.0
+    assert store.rate_at("BTC_USD", DAY + 2999) == 1.0
+
+
+def test_daily_fallback_uses_closed_days_only(tmp_path):
+    store = HistoryStore(tmp_path / "history", retention_seconds={"raw": None})
+    _points(store, [(DAY - 86400 + 10, 5.0), (DAY + 10, 6.0), (DAY + 500, 7.0)])
+    store.maintain(now=DAY + 2 * 86400)
+
+    # Сырых точек за сутки до момента нет — берётся close прошлого дня
+    assert store.rate_at("BTC_USD", DAY + 86400 * 2 + 100) == 7.0
+    daily = store.series("BTC_USD", None, DAY + 86400, 86400)
+    assert daily.at(DAY + 200) == 5.0
+
+
+def test_storage_constructor_leaves_legacy_history_alone(tmp_path):
+    legacy = tmp_path / "exchange_rates.json"
+    record = {
+        "id": "BTC_USD_2023-11-14T00:00:10Z",
+        "from_currency": "BTC",
+        "to_currency": "USD",
+        "rate": 1.0,
+        "timestamp": "2023-11-14T00:00:10Z",
+    }
+    legacy.write_text(json.dumps([record]), encoding="utf-8")
+
+    storage = RatesStorage(tmp_path / "rates.json", legacy)
+    assert json.loads(legacy.read_text(encoding="utf-8")) == [record]
+
+    assert storage.import_legacy_history() == 1
+    assert json.loads(legacy.read_text(encoding="utf-8")) == []
+    assert [r["close"] for r in storage.load_history("BTC_USD")] == [1.0]
+
+
+def test_other_process_appends_survive_maintenance(tmp_path):
+    # Дочерний процесс дописывает закрываемый день, пока здесь идёт maintain
+    child = (
+        "import sys\n"
+        "from valutatrade_hub.parser_service.history import HistoryStore\n"
+        "store = HistoryStore(sys.argv[1], retention_seconds={'raw': None})\n"
+        "for i in range(300):\n"
+        f"    store.append([{{'pair': 'BTC_USD', 'ts': {DAY} + i, 'rate': 1.0}}])\n"
+    )
+    root = tmp_path / "history"
+    store = HistoryStore(root, retention_seconds={"raw": None})
+    env = {"PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    proc = subprocess.Popen([sys.executable, "-c", child, str(root)], env=env)
+    while proc.poll() is None:
+        store.maintain(now=DAY + 2 * 86400)
+    assert proc.returncode == 0
+    store.maintain(now=DAY + 2 * 86400)
+
+    rows = store.query("BTC_USD", DAY, DAY + 86400)
+    assert sorted(r["ts"] for r in rows) == [DAY + i for i in range(300)]
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import json
+
+from valutatrade_hub.infra.jsonstream import iter_json_array, read_json
+
+
+def test_array_is_read_element_by_element(tmp_path):
+    path = tmp_path / "rows.json"
+    rows = [{"id": i, "rate": i / 3, "tags": ["a", "b"]} for i in range(500)]
+    path.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+    # Маленький буфер: элементы и числа режутся границами чтения
+    assert list(iter_json_array(path, buffer_size=7)) == rows
+    assert read_json(path) == rows
+
+
+def test_non_array_documents_are_loaded_whole(tmp_path):
+    path = tmp_path / "rates.json"
+    path.write_text('\n  {"pairs": {"BTC_USD": {"rate": 1.5}}}', encoding="utf-8")
+    assert read_json(path) == {"pairs": {"BTC_USD": {"rate": 1.5}}}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+LEASE = 1.0
+ROOT = Path(__file__).resolve().parents[1]
+
+# Процесс планировщика в миниатюре: пишет снимок под аренду с её сроком
+# и журналирует только принятые хранилищем записи
+CHILD = """
+import json, sys, time
+from pathlib import Path
+from valutatrade_hub.parser_service.leader import LeaseElector
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+tmp, lease = Path(sys.argv[1]), float(sys.argv[2])
+elector = LeaseElector(tmp / "scheduler.lease", lease_seconds=lease)
+elector.start_heartbeat()
+storage = RatesStorage(tmp / "rates.json", tmp / "exchange_rates.json")
+while True:
+    term = elector.term
+    if elector.holds() and storage.save_snapshot({"pairs": {}}, term):
+        rec = {"owner": elector.owner_id, "term": term, "t": time.time()}
+        with (tmp / "journal.jsonl").open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\\n")
+    time.sleep(lease / 10)
+"""
+
+
+def _journal(path: Path) -> list[dict]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def _wait_writer(journal: Path, after: float, timeout: float) -> dict | None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        fresh = [r for r in _journal(journal) if r["t"] > after]
+        if fresh:
+            return fresh[0]
+        time.sleep(0.02)
+    return None
+
+
+def test_stale_term_cannot_overwrite_snapshot(tmp_path):
+    storage = RatesStorage(tmp_path / "rates.json", tmp_path / "exchange_rates.json")
+    assert storage.save_snapshot({"pairs": {"A_USD": {"rate": 1.0}}}, term=2)
+    assert not storage.save_snapshot({"pairs": {"A_USD": {"rate": 9.0}}}, term=1)
+    # Запись без срока (один экземпляр) срок не сбрасывает
+    assert storage.save_snapshot({"pairs": {}})
+
+    snap = storage.load_snapshot()
+    assert snap["term"] == 2
+    assert not storage.save_snapshot({"pairs": {}}, term=1)
+
+
+def test_single_writer_per_term_and_takeover_within_lease(tmp_path):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    cmd = [sys.executable, "-c", CHILD, str(tmp_path), str(LEASE)]
+    procs = {}
+    for _ in range(3):
+        p = subprocess.Popen(cmd, env=env)
+        procs[p.pid] = p
+    journal = tmp_path / "journal.jsonl"
+    try:
+        leader = _wait_writer(journal, 0.0, LEASE * 5)
+        assert leader is not None, "лидер не выбран"
+        for _ in range(2):
+            time.sleep(LEASE)
+            pid = int(leader["owner"].split(":")[1])
+            killed_at = time.time()
+            os.kill(pid, signal.SIGKILL)
+            procs.pop(pid).wait()
+
+            leader = _wait_writer(journal, killed_at, LEASE * 3)
+            assert leader is not None, "аренду никто не перехватил"
+            # Аренда убитого истекает не позже чем через LEASE после kill;
+            # запас — на такт опроса и планирование процессов
+            assert leader["t"] - killed_at < LEASE * 1.5
+            assert int(leader["owner"].split(":")[1]) != pid
+    finally:
+        for p in procs.values():
+            p.kill()
+            p.wait()
+
+    owners: dict[int, str] = {}
+    for r in _journal(journal):
+        assert owners.setdefault(r["term"], r["owner"]) == r["owner"]
+    assert len(owners) == 3
+    # Последним в снимке остался самый новый срок
+    storage = RatesStorage(tmp_path / "rates.json", tmp_path / "exchange_rates.json")
+    assert storage.load_snapshot()["term"] == max(owners)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+
+from valutatrade_hub.core.leaderboard import Leaderboard
+from valutatrade_hub.parser_service.events import RatesChangedEvent
+
+PAIRS = {"BTC_USD": 100.0, "ETH_USD": 10.0, "EUR_USD": 2.0}
+
+
+def _portfolios() -> list[dict]:
+    return [
+        {"user_id": 1, "wallets": {"BTC": {"balance": 1.0}}},
+        {"user_id": 2, "wallets": {"ETH": {"balance": 5.0}}},
+        {"user_id": 3, "wallets": {"USD": {"balance": 70.0}}},
+    ]
+
+
+def _written_later(path) -> None:
+    # Чужая запись позже нашей: mtime грубее наносекунд, сдвигаем явно
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def _board(base: str = "USD") -> Leaderboard:
+    board = Leaderboard(base)
+    board.load(_portfolios(), {k: {"rate": v} for k, v in PAIRS.items()})
+    return board
+
+
+def test_rate_change_reranks_only_holders():
+    board = _board()
+    assert board.top(3) == [(1, 100.0), (3, 70.0), (2, 50.0)]
+
+    assert board.update_pairs({"ETH_USD": 30.0}) == 1
+    assert board.top(3) == [(2, 150.0), (1, 100.0), (3, 70.0)]
+    assert board.position(3) == 3
+
+    # Инкрементальный результат совпадает с полной сборкой
+    full = Leaderboard("USD")
+    pairs = dict(PAIRS, ETH_USD=30.0)
+    full.load(_portfolios(), {k: {"rate": v} for k, v in pairs.items()})
+    assert full.top(3) == board.top(3)
+
+
+def test_base_rate_change_revalues_everyone():
+    board = _board("EUR")
+    assert board.top(1) == [(1, 50.0)]
+
+    assert board.update_pairs({"EUR_USD": 4.0}) == 3
+    assert board.top(3) == [(1, 25.0), (3, 17.5), (2, 12.5)]
+
+
+def test_sync_pairs_applies_only_differences():
+    board = _board()
+    assert board.sync_pairs(dict(PAIRS)) == 0
+    assert board.sync_pairs(dict(PAIRS, BTC_USD=1.0)) == 1
+    assert board.top(1) == [(3, 70.0)]
+
+
+def test_own_writes_update_board_without_reload(alice, set_rates, monkeypatch):
+    set_rates({"BTC_USD": 100.0, "ETH_USD": 10.0})
+    alice.buy("BTC", 1)
+    assert alice.leaderboard("USD")["rows"] == [(1, "alice", 100.0)]
+
+    loads = []
+    real_load = Leaderboard.load
+    monkeypatch.setattr(
+        Leaderboard, "load", lambda self, *a: loads.append(1) or real_load(self, *a)
+    )
+    alice.buy("ETH", 2)
+    event = RatesChangedEvent(2, frozenset({"BTC_USD"}), moves={"BTC_USD": (100, 50)})
+    alice.update_leaderboards(event)
+
+    # Курс из события, портфель из своей записи: полной сборки нет
+    board = alice.leaderboard("USD")
+    assert board["rows"] == [(1, "alice", 70.0)] and board["me"] == 1
+    assert loads == []
+
+
+def test_foreign_portfolio_write_forces_rebuild(alice, set_rates, monkeypatch):
+    set_rates({"BTC_USD": 100.0})
+    alice.buy("BTC", 1)
+    assert alice.leaderboard("USD")["total_users"] == 1
+
+    # Другой процесс дописал портфель: mtime файла больше не наш
+    records = alice._db.read(alice._db.portfolios_path)
+    records.append({"user_id": 2, "wallets": {"BTC": {"balance": 3.0}}})
+    alice._db.write(alice._db.portfolios_path, records)
+    _written_later(alice._db.portfolios_path)
+
+    board = alice.leaderboard("USD")
+    assert board["total_users"] == 2
+    assert board["rows"][0] == (1, "#2", 300.0)
+    assert board["me"] == 2
+
+
+def test_foreign_rates_write_is_synced(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+    alice.buy("BTC", 1)
+    assert alice.leaderboard("USD")["rows"][0][2] == 100.0
+
+    set_rates({"BTC_USD": 250.0})
+    _written_later(alice._db.rates_path)
+    assert alice.leaderboard("USD")["rows"][0][2] == 250.0
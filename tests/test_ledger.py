@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from valutatrade_hub.infra.ledger import TradeLedger
+
+
+def _trade(uid: int, ts: str, side: str = "buy", amount: float = 1.0) -> dict:
+    return {"ts": ts, "user_id": uid, "side": side, "currency": "BTC", "amount": amount}
+
+
+def test_index_offsets_point_at_user_records(tmp_path):
+    ledger = TradeLedger(tmp_path)
+    ledger.create()
+    ledger.append(
+        [_trade(1, "2024-01-01T00:00:01"), _trade(2, "2024-01-01T00:00:02")]
+    )
+    # Новый экземпляр продолжает нумерацию по хвосту файла
+    seqs = TradeLedger(tmp_path).append(
+        [_trade(1, "2024-01-01T00:00:03"), _trade(1, "2024-01-01T00:00:04")]
+    )
+    assert seqs == [3, 4]
+
+    offsets = array("q")
+    offsets.frombytes((tmp_path / "idx" / "1.idx").read_bytes())
+    lines = {pos: rec for pos, rec in ledger.iter_from()}
+    assert [lines[off]["seq"] for off in offsets] == [1, 3, 4]
+    assert all(lines[off]["user_id"] == 1 for off in offsets)
+
+    assert [e["seq"] for e in ledger.user_entries(1)] == [1, 3, 4]
+    assert [e["seq"] for e in ledger.user_entries(2)] == [2]
+    assert list(ledger.user_entries(3)) == []
+
+
+def test_since_seeks_by_index(tmp_path):
+    ledger = TradeLedger(tmp_path)
+    ledger.append([_trade(1, f"2024-01-01T00:00:{s:02d}") for s in range(10)])
+
+    since = [e["seq"] for e in ledger.user_entries(1, "2024-01-01T00:00:07")]
+    assert since == [8, 9, 10]
+    assert list(ledger.user_entries(1, "2024-01-02T00:00:00")) == []
+
+
+def test_snapshot_offset_resumes_replay(tmp_path):
+    ledger = TradeLedger(tmp_path, snapshot_every=2)
+    seqs = ledger.append([_trade(1, "t1", amount=2.0), _trade(1, "t2", "sell")])
+    ledger.maybe_snapshot(seqs[-1])
+    snap = ledger.load_snapshot()
+    assert snap["seq"] == 2
+    assert snap["offset"] == ledger.path.stat().st_size
+
+    ledger.append([_trade(1, "t3", amount=0.5)])
+    assert ledger.rebuild_portfolios() == [
+        {"user_id": 1, "wallets": {"BTC": {"balance": 1.5}}}
+    ]
+
+
+def test_history_is_visible_only_to_its_owner(alice):
+    assert alice.trade_history(username="alice")["username"] == "alice"
+    alice.register("bob", "secret")
+    with pytest.raises(PermissionError):
+        alice.trade_history(username="bob")
+    with pytest.raises(PermissionError):
+        alice.profit_and_loss(username="bob")
+
+    alice.logout()
+    with pytest.raises(PermissionError):
+        alice.trade_history()
+
+
+def test_concurrent_create_writes_opening_once(tmp_path):
+    # Отдельные экземпляры — отдельные flock, как у разных процессов
+    opening = [_trade(uid, "t0") for uid in range(1, 6)]
+    ledgers = [TradeLedger(tmp_path) for _ in range(4)]
+    with ThreadPoolExecutor(len(ledgers)) as pool:
+        created = list(pool.map(lambda lg: lg.create(iter(opening)), ledgers))
+
+    assert created.count(True) == 1
+    assert [e["seq"] for _, e in ledgers[0].iter_from()] == [1, 2, 3, 4, 5]
+
+
+def test_maybe_snapshot_reads_snapshot_only_after_foreign_write(tmp_path, monkeypatch):
+    ledger = TradeLedger(tmp_path, snapshot_every=3)
+    other = TradeLedger(tmp_path, snapshot_every=3)
+    loads = []
+    real_load = TradeLedger.load_snapshot
+
+    def counting_load(self):
+        loads.append(self)
+        return real_load(self)
+
+    monkeypatch.setattr(TradeLedger, "load_snapshot", counting_load)
+    for i in range(6):
+        ledger.maybe_snapshot(ledger.append([_trade(1, f"t{i}")])[-1])
+    # Разбор снимка — только внутри write_snapshot (replay), не на каждой сделке
+    assert loads == [ledger, ledger]
+
+    other.write_snapshot()
+    loads.clear()
+    ledger.maybe_snapshot(7)
+    ledger.maybe_snapshot(7)
+    assert loads == [ledger]
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from valutatrade_hub.parser_service.offline_clients import (
+    RecordingClient,
+    ReplayClient,
+)
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class StubClient:
+    SOURCE = "CoinGecko"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def fetch_rates(self):
+        self.calls += 1
+        rates = {"BTC_USD": 100.0 + self.calls}
+        return rates, {"source": self.SOURCE, "status_code": 200}
+
+
+def test_recorded_update_replays_the_same_responses(tmp_path):
+    record = tmp_path / "replay.jsonl"
+    storage = RatesStorage(tmp_path / "rates.json", tmp_path / "exchange_rates.json")
+    stub = StubClient()
+    updater = RatesUpdater(clients=[RecordingClient(stub, record)], storage=storage)
+    updater.run_update()
+    updater.run_update()
+
+    replay = ReplayClient(record)
+    assert replay.SOURCE == "CoinGecko"
+    assert [replay.fetch_rates()[0] for _ in range(2)] == [
+        {"BTC_USD": 101.0},
+        {"BTC_USD": 102.0},
+    ]
+    assert stub.calls == 2
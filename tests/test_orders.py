@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from valutatrade_hub.parser_service.events import RatesChangedEvent
+
+
+def _move(pair: str, old: float, new: float) -> RatesChangedEvent:
+    return RatesChangedEvent(1, frozenset([pair]), moves={pair: (old, new)})
+
+
+def _status(usecases) -> dict[int, str]:
+    return {o["id"]: o["status"] for o in usecases.list_orders()}
+
+
+def test_crossed_orders_fill_and_update_portfolio(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+    buy = alice.place_order("buy", "BTC", 95, 2)
+    far = alice.place_order("buy", "BTC", 80, 1)
+    sell = alice.place_order("sell", "BTC", 120, 5)
+
+    done = alice.match_orders(_move("BTC_USD", 100, 94))
+    assert [(o["id"], o["fill_rate"]) for o in done] == [(buy["id"], 94.0)]
+
+    # Продажа больше баланса отклоняется, а не уводит кошелёк в минус
+    done = alice.match_orders(_move("BTC_USD", 94, 125))
+    assert [(o["id"], o["status"]) for o in done] == [(sell["id"], "rejected")]
+    assert _status(alice) == {
+        buy["id"]: "filled",
+        far["id"]: "open",
+        sell["id"]: "rejected",
+    }
+    assert alice.show_portfolio("USD")["rows"][0][:2] == ("BTC", 2.0)
+    assert [t["order_id"] for t in alice.trade_history()["rows"]] == [buy["id"]]
+
+
+def test_order_closed_by_another_process_is_not_filled(alice):
+    order = alice.place_order("buy", "BTC", 95, 1)
+    alice._get_order_book()
+
+    # Другой процесс отменил заявку после того, как книга была построена
+    orders = alice._db.read(alice._db.orders_path)
+    orders[0]["status"] = "cancelled"
+    alice._db.write(alice._db.orders_path, orders)
+
+    assert alice.match_orders(_move("BTC_USD", 100, 90)) == []
+    assert _status(alice) == {order["id"]: "cancelled"}
+    assert alice.show_portfolio("USD")["rows"] == []
+
+
+def test_stale_book_entry_is_skipped_under_lock(alice):
+    order = alice.place_order("buy", "BTC", 95, 1)
+    book = alice._get_order_book()
+
+    # Файл меняется уже после проверки mtime: статус перечитывается
+    orders = alice._db.read(alice._db.orders_path)
+    orders[0]["status"] = "filled"
+    alice._db.write(alice._db.orders_path, orders)
+    alice._orders_seen = alice._mtime_ns(alice._db.orders_path)
+
+    assert alice.match_orders(_move("BTC_USD", 100, 90)) == []
+    assert _status(alice) == {order["id"]: "filled"}
+    assert len(book) == 0
+
+
+def test_orders_placed_elsewhere_are_matched(alice):
+    alice.match_orders(_move("BTC_USD", 100, 99))
+    orders = [
+        {
+            "id": 7,
+            "user_id": 1,
+            "pair": "BTC_USD",
+            "currency": "BTC",
+            "side": "buy",
+            "limit": 95.0,
+            "amount": 1.0,
+            "status": "open",
+        }
+    ]
+    alice._db.write(alice._db.orders_path, orders)
+
+    done = alice.match_orders(_move("BTC_USD", 99, 90))
+    assert [o["id"] for o in done] == [7]
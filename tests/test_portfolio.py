@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.parser_service.history import HistoryStore
+
+
+def test_buy_and_sell_update_wallets(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+
+    res = alice.buy("BTC", 2)
+    assert res["estimated_cost"] == 200.0
+    alice.sell("BTC", 0.5)
+
+    data = alice.show_portfolio("USD")
+    assert data["rows"] == [("BTC", 1.5, 150.0)]
+    assert data["total"] == 150.0
+
+
+def test_sell_without_wallet_or_funds(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+    with pytest.raises(ValueError, match="нет кошелька"):
+        alice.sell("BTC", 1)
+
+    alice.buy("BTC", 1)
+    with pytest.raises(InsufficientFundsError):
+        alice.sell("BTC", 2)
+    assert alice.show_portfolio("USD")["rows"] == [("BTC", 1.0, 100.0)]
+
+
+def test_portfolio_record_keeps_storage_layout(alice, set_rates):
+    set_rates({"BTC_USD": 100.0})
+    alice.buy("BTC", 1)
+    records = alice._db.read(alice._db.portfolios_path)
+    assert records == [{"user_id": 1, "wallets": {"BTC": {"balance": 1.0}}}]
+
+
+def test_portfolio_at_crosses_daily_bars_through_usd(alice, set_rates, tmp_path):
+    set_rates({"BTC_USD": 100.0})
+    alice.buy("BTC", 2)
+
+    at = int(time.time()) + 3 * 86400
+    day = at - at % 86400 - 2 * 86400
+    history = HistoryStore(tmp_path / "history", retention_seconds={"raw": None})
+    history.append(
+        [
+            {"pair": "BTC_USD", "ts": day + 10, "rate": 120.0},
+            {"pair": "EUR_USD", "ts": day + 10, "rate": 1.2},
+        ]
+    )
+    history.maintain(now=at)
+
+    # Сырых точек за сутки нет, прямой пары BTC_EUR тоже — кросс по дневным барам
+    at_iso = datetime.fromtimestamp(at, timezone.utc).isoformat()
+    data = alice.show_portfolio_at(at_iso, history, base="EUR")
+    assert data["rows"] == [("BTC", 2.0, pytest.approx(200.0))]
+
+
+def test_portfolio_curve_rejects_too_many_points(alice, tmp_path):
+    history = HistoryStore(tmp_path / "history")
+    with pytest.raises(ValueError, match="--step"):
+        alice.portfolio_curve(
+            "2024-01-01T00:00:00Z", history, step="1s", until="2024-02-01T00:00:00Z"
+        )
+
+
+# Процесс CLI в миниатюре: свой каталог данных, N покупок подряд
+BUYER = """
+import sys
+from valutatrade_hub.infra.settings import SettingsLoader
+SettingsLoader()._cache.update(DATA_DIR=sys.argv[1], STORAGE_DURABILITY="none")
+from valutatrade_hub.core import usecases
+usecases.login("alice", "secret")
+for _ in range(int(sys.argv[2])):
+    usecases.buy("BTC", 1)
+"""
+
+
+def test_concurrent_buys_from_processes_are_not_lost(alice, set_rates, data_dir):
+    set_rates({"BTC_USD": 100.0})
+    env = {"PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    cmd = [sys.executable, "-c", BUYER, str(data_dir), "40"]
+    procs = [subprocess.Popen(cmd, env=env) for _ in range(2)]
+    assert [p.wait() for p in procs] == [0, 0]
+
+    assert alice.show_portfolio("USD")["rows"] == [("BTC", 80.0, 8000.0)]
+    assert len(alice.trade_history()["rows"]) == 80
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from valutatrade_hub.core.exceptions import RateLimitExceededError
+from valutatrade_hub.parser_service import rate_limiter
+from valutatrade_hub.parser_service.rate_limiter import TokenBucketLimiter
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Процесс-клиент: пытается взять токен n раз, печатает число удач
+CHILD = """
+import sys
+from valutatrade_hub.parser_service.rate_limiter import TokenBucketLimiter
+
+limiter = TokenBucketLimiter(sys.argv[1], "CoinGecko", 60, 0)
+print(sum(limiter.try_acquire() == 0.0 for _ in range(int(sys.argv[2]))))
+"""
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+        self.sleeps: list[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    fake = SimpleNamespace(time=c.time, monotonic=c.time, sleep=c.sleep)
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return c
+
+
+def test_budget_is_shared_through_state_file(tmp_path, clock):
+    a = TokenBucketLimiter(tmp_path, "CoinGecko", 2, 0.5)
+    b = TokenBucketLimiter(tmp_path, "CoinGecko", 2, 0.5)
+
+    assert a.try_acquire() == 0.0
+    assert b.try_acquire() == 0.0
+    # Бюджет исчерпан на двоих: токен дольётся через 1 / 0.5 с
+    assert a.try_acquire() == pytest.approx(2.0)
+
+    clock.now += 2.0
+    assert b.try_acquire() == 0.0
+
+
+def test_refill_is_capped_by_capacity(tmp_path, clock):
+    limiter = TokenBucketLimiter(tmp_path, "CoinGecko", 2, 1.0)
+    assert limiter.try_acquire(2) == 0.0
+
+    clock.now += 3600
+    assert limiter.try_acquire(2) == 0.0
+    assert limiter.try_acquire() == pytest.approx(1.0)
+
+
+def test_penalize_blocks_until_retry_after(tmp_path, clock):
+    limiter = TokenBucketLimiter(tmp_path, "CoinGecko", 5, 1.0)
+    limiter.penalize(retry_after=30)
+
+    with pytest.raises(RateLimitExceededError) as err:
+        limiter.acquire(max_wait=10)
+    assert err.value.retry_after == pytest.approx(30)
+    assert clock.sleeps == []
+
+    limiter.acquire(max_wait=60)
+    assert clock.sleeps == [pytest.approx(30)]
+
+
+def test_processes_never_overspend_the_budget(tmp_path):
+    env = {"PYTHONPATH": str(ROOT)}
+    cmd = [sys.executable, "-c", CHILD, str(tmp_path), "50"]
+    procs = [
+        subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True)
+        for _ in range(2)
+    ]
+    granted = [int(p.communicate()[0]) for p in procs]
+
+    assert sum(granted) == 60
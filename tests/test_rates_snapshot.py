@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+
+from valutatrade_hub.infra.rates_snapshot import (
+    RatesSnapshotReader,
+    write_rates_snapshot,
+)
+
+AT = "2024-01-01T00:00:00Z"
+EPOCH = 1704067200
+
+
+def _snapshot(**rates: float) -> dict:
+    pairs = {
+        pair: {"rate": rate, "updated_at": AT, "source": "CoinGecko"}
+        for pair, rate in rates.items()
+    }
+    return {"pairs": pairs, "last_refresh": AT}
+
+
+def test_lookup_by_binary_search(tmp_path):
+    path = tmp_path / "rates.bin"
+    write_rates_snapshot(path, _snapshot(BTC_USD=100.0, ETH_USD=10.0, EUR_USD=1.1))
+    reader = RatesSnapshotReader(path)
+
+    assert reader.lookup("ETH_USD") == (10.0, EPOCH, "CoinGecko")
+    assert reader.lookup("BTC_USD")[0] == 100.0
+    assert reader.lookup("XRP_USD") is None
+    assert reader.lookup("TOOLONG_PAIR") is None
+    assert reader.last_refresh() == EPOCH
+
+
+def test_replaced_file_is_remapped_old_map_stays_valid(tmp_path):
+    path = tmp_path / "rates.bin"
+    write_rates_snapshot(path, _snapshot(BTC_USD=100.0))
+    reader = RatesSnapshotReader(path)
+    assert reader.lookup("BTC_USD")[0] == 100.0
+    old = reader._mapped
+
+    # Атомарная подмена: новый inode
+    write_rates_snapshot(path, _snapshot(BTC_USD=200.0, ETH_USD=10.0))
+    assert reader.lookup("BTC_USD")[0] == 200.0
+    assert reader.lookup("ETH_USD")[0] == 10.0
+    assert reader._mapped is not old
+    # Держатель старого отображения дочитывает прежнюю версию
+    assert old.count == 1 and old.key_at(0).rstrip(b"\0") == b"BTC_USD"
+
+
+def test_same_inode_rewrite_is_noticed_by_mtime(tmp_path):
+    path = tmp_path / "rates.bin"
+    other = tmp_path / "other.bin"
+    write_rates_snapshot(path, _snapshot(BTC_USD=100.0))
+    write_rates_snapshot(other, _snapshot(BTC_USD=300.0))
+    reader = RatesSnapshotReader(path)
+    assert reader.lookup("BTC_USD")[0] == 100.0
+    first = reader._mapped
+
+    # Перезапись на месте тем же размером: inode и размер прежние
+    ino = path.stat().st_ino
+    with path.open("r+b") as f:
+        f.write(other.read_bytes())
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert path.stat().st_ino == ino
+
+    assert reader.lookup("BTC_USD")[0] == 300.0
+    assert reader._mapped is not first
+
+
+def test_missing_or_broken_file_falls_back(tmp_path):
+    path = tmp_path / "rates.bin"
+    reader = RatesSnapshotReader(path)
+    assert not reader.available()
+    assert reader.lookup("BTC_USD") is None
+
+    path.write_bytes(b"not a snapshot at all, definitely")
+    assert reader.lookup("BTC_USD") is None
+
+    write_rates_snapshot(path, _snapshot(BTC_USD=5.0))
+    assert reader.available()
+    assert reader.lookup("BTC_USD")[0] == 5.0
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.redundancy import (
+    LatencyTracker,
+    RedundantFetcher,
+    combine_quorum,
+)
+
+
+class FakeClient:
+    # Отвечает заданными курсами; block — ждать события, fail — упасть
+    def __init__(
+        self,
+        source: str,
+        rate: float = 100.0,
+        block: threading.Event | None = None,
+        fail: bool = False,
+    ) -> None:
+        self.SOURCE = source
+        self._rate = rate
+        self._block = block
+        self._fail = fail
+
+    def fetch_rates(self):
+        if self._block is not None:
+            self._block.wait(5)
+        if self._fail:
+            raise ApiRequestError(f"{self.SOURCE}: 500")
+        return {"BTC_USD": self._rate}, {"source": self.SOURCE, "request_ms": 1}
+
+
+def _fetcher(group, mode, **kwargs) -> RedundantFetcher:
+    kwargs.setdefault("hedge_default_delay", 0.05)
+    kwargs.setdefault("hedge_min_delay", 0.01)
+    return RedundantFetcher([group], mode=mode, latency=LatencyTracker(), **kwargs)
+
+
+def _fetch(fetcher: RedundantFetcher, previous=None):
+    ((_, rates, meta, error),) = list(fetcher.fetch_all(previous or {}))
+    if error is not None:
+        raise error
+    return rates, meta
+
+
+def test_quorum_drops_outlier_with_three_sources():
+    answers = [("A", {"P": 100.0}), ("B", {"P": 101.0}), ("C", {"P": 150.0})]
+    rates, outliers, disputed = combine_quorum(answers, {}, 0.02)
+    assert rates == {"P": 100.5}
+    assert outliers == {"P": ["C"]}
+    assert disputed == []
+
+
+def test_two_sources_agree_or_dispute():
+    agree = [("A", {"P": 100.0}), ("B", {"P": 101.0})]
+    assert combine_quorum(agree, {}, 0.02) == ({"P": 100.5}, {}, [])
+
+    apart = [("A", {"P": 100.0}), ("B", {"P": 110.0})]
+    # Кто врёт, не определить: ближе к прошлому курсу, без него — основной
+    assert combine_quorum(apart, {"P": 109.0}, 0.02) == ({"P": 110.0}, {}, ["P"])
+    assert combine_quorum(apart, {}, 0.02) == ({"P": 100.0}, {}, ["P"])
+
+
+def test_quorum_fetch_marks_partial_without_fake_status():
+    group = [FakeClient("A", 100.0), FakeClient("B", fail=True), FakeClient("C", 102)]
+    rates, meta = _fetch(_fetcher(group, "quorum", quorum=3))
+    assert rates == {"BTC_USD": 101.0}
+    assert meta["status_code"] == 200
+    assert meta["partial"] is True
+    assert meta["provider"] == "A+C"
+
+    _, meta = _fetch(_fetcher(group[:1] + group[2:], "quorum", quorum=3))
+    assert meta["partial"] is False
+
+
+def test_hedged_uses_backup_when_primary_stalls():
+    stall = threading.Event()
+    try:
+        group = [FakeClient("Primary", 100.0, block=stall), FakeClient("Backup", 99)]
+        rates, meta = _fetch(_fetcher(group, "hedged"))
+    finally:
+        stall.set()
+    assert rates == {"BTC_USD": 99}
+    assert meta["source"] == "Primary"
+    assert meta["provider"] == "Backup"
+    assert meta["hedged"] is True
+
+
+def test_hedged_prefers_fast_primary_and_survives_its_failure():
+    group = [FakeClient("Primary", 100.0), FakeClient("Backup", 99.0)]
+    _, meta = _fetch(_fetcher(group, "hedged", hedge_default_delay=5.0))
+    assert (meta["provider"], meta["hedged"]) == ("Primary", False)
+
+    group = [FakeClient("Primary", fail=True), FakeClient("Backup", 99.0)]
+    rates, meta = _fetch(_fetcher(group, "hedged", hedge_default_delay=5.0))
+    assert rates == {"BTC_USD": 99.0}
+    assert meta["provider"] == "Backup"
+
+
+def test_whole_group_failure_is_reported():
+    group = [FakeClient("A", fail=True), FakeClient("B", fail=True)]
+    with pytest.raises(ApiRequestError):
+        _fetch(_fetcher(group, "hedged"))
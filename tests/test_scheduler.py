@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from valutatrade_hub.parser_service.history import epoch_to_iso
+from valutatrade_hub.parser_service.scheduler import (
+    AdaptiveScheduler,
+    PollGroup,
+    next_interval,
+)
+
+T0 = 1_700_000_000
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = float(T0)
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class Market:
+    # Хранилище и обновлятор сразу: опрос источника пишет его пары в снимок.
+    # "Fast" колеблется на 1% за опрос, "Calm" стоит на месте
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.pairs: dict[str, dict] = {}
+        self.polls: list[str] = []
+
+    def load_snapshot(self) -> dict:
+        return {"pairs": self.pairs}
+
+    def load_history(self, since=None) -> list[dict]:
+        return []
+
+    def run_update(self, only_source=None) -> dict:
+        self.polls.append(only_source)
+        pair = "BTC_USD" if only_source == "Fast" else "EUR_USD"
+        rate = 1.0
+        if only_source == "Fast" and self.polls.count("Fast") % 2:
+            rate = 1.01
+        self.pairs[pair] = {
+            "rate": rate,
+            "updated_at": epoch_to_iso(int(self.clock.now)),
+            "source": only_source,
+        }
+        return {}
+
+
+class Elector:
+    def __init__(self, leader: bool) -> None:
+        self.is_leader = leader
+        self.heartbeat_seconds = 5.0
+
+
+def _scheduler(clock: Clock, market: Market, elector=None) -> AdaptiveScheduler:
+    groups = [PollGroup("Fast", 10, 3600), PollGroup("Calm", 10, 3600)]
+    return AdaptiveScheduler(
+        market,
+        market,
+        groups,
+        target_move=0.002,
+        window_seconds=600,
+        clock=clock,
+        sleep=clock.sleep,
+        elector=elector,
+    )
+
+
+def test_next_interval_bounds():
+    group = PollGroup("S", 60, 3600, budget_floor=120)
+    assert next_interval(group, None, 0.002) == 120
+    assert next_interval(group, 0.0, 0.002) == 3600
+    # Ожидаемое движение vol * sqrt(t) = target
+    assert next_interval(group, 0.002 / 20, 0.002) == 400
+
+    group.interval = 400
+    assert next_interval(group, 1.0, 0.002) == 200
+    assert next_interval(group, 0.0, 0.002) == 800
+
+
+def test_volatile_source_is_polled_more_often():
+    clock = Clock()
+    market = Market(clock)
+    scheduler = _scheduler(clock, market)
+    while clock.now < T0 + 4 * 3600:
+        scheduler.step()
+        clock.sleep(scheduler._wait())
+
+    fast, calm = scheduler.groups
+    assert fast.interval == fast.floor
+    assert calm.interval == calm.max_interval
+    # Затишье растягивает интервал вдвое за опрос — десяток опросов за 4 часа
+    assert market.polls.count("Calm") < 15
+    assert market.polls.count("Fast") > 50 * market.polls.count("Calm")
+
+
+def test_follower_tracks_schedule_without_polling():
+    clock = Clock()
+    market = Market(clock)
+    market.run_update("Fast")
+    market.polls.clear()
+    scheduler = _scheduler(clock, market, Elector(leader=False))
+
+    clock.sleep(30)
+    assert scheduler.step() == []
+    assert market.polls == []
+    fast, calm = scheduler.groups
+    # Срок опроса — от обновления лидера, а не от момента чтения снимка
+    assert fast.next_due == T0 + fast.interval
+    assert calm.next_due == calm.interval
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.infra.sessions import SessionStore
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return SessionStore(tmp_path / "sessions", ttl_seconds=60, clock=clock)
+
+
+def test_issued_token_verifies(store, clock):
+    token = store.issue(7, "alice")
+    assert store.verify(token) == (7, "alice")
+    # Другой процесс с тем же каталогом принимает токен
+    assert SessionStore(store._root, clock=clock).verify(token) == (7, "alice")
+
+
+def test_tampered_token_is_rejected(store):
+    token = store.issue(7, "alice")
+    body, sig = token.split(".")
+    forged = store.issue(8, "mallory").split(".")[0]
+    with pytest.raises(ValueError, match="Недействительная"):
+        store.verify(f"{forged}.{sig}")
+    with pytest.raises(ValueError, match="Недействительная"):
+        store.verify(f"{body}.{'0' * 64}")
+    # Имя пользователя вместо токена не принимается
+    with pytest.raises(ValueError, match="Недействительная"):
+        store.verify("alice")
+
+
+def test_token_expires(store, clock):
+    token = store.issue(7, "alice")
+    clock.now += 59
+    assert store.verify(token) == (7, "alice")
+    clock.now += 1
+    with pytest.raises(ValueError, match="истекла"):
+        store.verify(token)
+
+
+def test_revoke_and_reissue_invalidate_old_token(store):
+    old = store.issue(7, "alice")
+    new = store.issue(7, "alice")
+    with pytest.raises(ValueError, match="отозвана"):
+        store.verify(old)
+
+    assert store.revoke("alice")
+    with pytest.raises(ValueError):
+        store.verify(new)
+    assert not store.revoke("alice")
+
+
+def test_secret_is_created_once_and_validated(store, tmp_path):
+    store.issue(7, "alice")
+    secret = tmp_path / "sessions" / ".secret"
+    assert len(secret.read_bytes()) == 32
+    assert [p.name for p in secret.parent.glob("*.tmp")] == []
+
+    secret.write_bytes(b"short")
+    with pytest.raises(ValueError, match="повреждён"):
+        SessionStore(tmp_path / "sessions").issue(7, "alice")
+
+
+def test_resume_session_takes_token_only(alice):
+    message = alice.login("alice", "secret", remember=True)
+    token = message.rsplit("\n", 1)[1]
+    alice._current_user_id = alice._current_username = None
+
+    with pytest.raises(ValueError):
+        alice.resume_session("alice")
+    assert alice.resume_session(token) == "alice"
+
+    alice.logout()
+    with pytest.raises(ValueError):
+        alice.resume_session(token)
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import os
 import shlex
+import sys
+import threading
+import time
+from pathlib import Path
 
 from prettytable import PrettyTable
 
@@ -11,12 +16,34 @@ from ..core.exceptions import (
     CurrencyNotFoundError,
     InsufficientFundsError,
 )
+from ..core.utils import parse_iso
 from ..infra.settings import SettingsLoader
 from ..logging_config import setup_logging
-from ..parser_service.api_clients import CoinGeckoClient, ExchangeRateApiClient
+from ..parser_service.backfill import Backfiller
+from ..parser_service.background import BackgroundUpdater
 from ..parser_service.config import ParserConfig
-from ..parser_service.storage import RatesStorage
-from ..parser_service.updater import RatesUpdater
+from ..parser_service.events import RatesVersionWatcher, rates_bus
+from ..parser_service.factory import make_clients, make_storage, make_updater
+from ..parser_service.history import epoch_to_iso
+from ..profiling import CommandProfiler
+
+# Профилировщик команд; включается --profile при запуске или командой profile
+_profiler = CommandProfiler(
+    SettingsLoader().get("PROFILE_DIR"),
+    sample_rate=SettingsLoader().get("PROFILE_SAMPLE_RATE", 0.1),
+    max_files=SettingsLoader().get("PROFILE_MAX_FILES", 500),
+)
+
+
+# Флаги без значения: "update-rates --background", "login ... --session"
+_FLAGS = {"background", "session"}
+
+# Токен сессии для разовых запусков (вместо --session <токен>)
+SESSION_ENV = "VALUTATRADE_SESSION"
+
+# Команды и обработчики событий курсов меняют общее состояние usecases;
+# фоновое обновление не должно пересекаться с командой из приглашения
+_command_lock = threading.RLock()
 
 
 def _parse_args(tokens: list[str]) -> dict[str, str]:
@@ -27,6 +54,10 @@ def _parse_args(tokens: list[str]) -> dict[str, str]:
         t = tokens[i]
         if t.startswith("--"):
             key = t[2:]
+            if key in _FLAGS and (i + 1 >= len(tokens) or tokens[i + 1][:2] == "--"):
+                args[key] = "yes"
+                i += 1
+                continue
             if i + 1 >= len(tokens):
                 raise ValueError(f"Не задано значение для {t}")
             args[key] = tokens[i + 1]
@@ -58,12 +89,567 @@ def _print_portfolio(data: dict) -> None:
     print(f"ИТОГО: {total:,.2f} {base}")
 
 
+def _subcommand(tokens: list[str]) -> str:
+    # Позиционная подкоманда: "alert add --currency BTC ..."
+    if len(tokens) > 1 and not tokens[1].startswith("--"):
+        return tokens[1]
+    return ""
+
+
+def _print_alerts(alerts: list[dict]) -> None:
+    if not alerts:
+        print("Алертов нет.")
+        return
+    table = PrettyTable()
+    table.field_names = ["ID", "PAIR", "CONDITION", "STATUS"]
+    for a in alerts:
+        status = "active"
+        if a.get("triggered_at"):
+            status = f"triggered {a['triggered_at']} @ {a['triggered_rate']}"
+        condition = f"{a['direction']} {a['threshold']}"
+        table.add_row([a["id"], a["pair"], condition, status])
+    print(table)
+
+
+def _print_orders(orders: list[dict]) -> None:
+    if not orders:
+        print("Заявок нет.")
+        return
+    table = PrettyTable()
+    table.field_names = ["ID", "SIDE", "PAIR", "LIMIT", "AMOUNT", "STATUS"]
+    for o in orders:
+        status = o["status"]
+        if status == "filled":
+            status = f"filled {o['filled_at']} @ {o['fill_rate']}"
+        table.add_row([o["id"], o["side"], o["pair"], o["limit"], o["amount"], status])
+    print(table)
+
+
+def _print_history(data: dict) -> None:
+    rows = data["rows"]
+    if not rows:
+        print(f"Сделок пользователя '{data['username']}' нет.")
+        return
+    table = PrettyTable()
+    table.field_names = ["SEQ", "TIME", "SIDE", "CURRENCY", "AMOUNT", "RATE", "ORDER"]
+    for e in rows:
+        table.add_row(
+            [
+                e["seq"],
+                e["ts"],
+                e["side"],
+                e["currency"],
+                f"{e['amount']:.4f}",
+                "-" if e.get("rate") is None else f"{e['rate']} {e['base']}",
+                e.get("order_id") or "",
+            ]
+        )
+    print(f"История сделок '{data['username']}':")
+    print(table)
+
+
+def _print_pnl(data: dict) -> None:
+    base = data["base"]
+    if not data["rows"]:
+        print(f"Сделок в {base} у '{data['username']}' нет.")
+        return
+    table = PrettyTable()
+    table.field_names = ["Currency", "Position", f"Realized ({base})", "Unrealized"]
+    for code, qty, realized, unrealized in data["rows"]:
+        table.add_row([code, f"{qty:.4f}", f"{realized:,.2f}", f"{unrealized:,.2f}"])
+    print(f"P&L пользователя '{data['username']}' (база: {base}):")
+    print(table)
+    print(
+        f"Реализовано: {data['realized']:,.2f} {base}, "
+        f"нереализовано: {data['unrealized']:,.2f} {base}"
+    )
+
+
+def _print_curve(data: dict) -> None:
+    base = data["base"]
+    table = PrettyTable()
+    table.field_names = ["TIME (UTC)", f"Value ({base})"]
+    for ts, value, complete in data["points"]:
+        mark = "" if complete else " *"
+        table.add_row([epoch_to_iso(ts), f"{value:,.2f}{mark}"])
+    print(f"Кривая портфеля '{data['username']}' (база: {base}):")
+    print(table)
+    if not all(p[2] for p in data["points"]):
+        print("* — для части валют нет исторического курса на этот момент")
+
+
+def _print_leaderboard(data: dict) -> None:
+    base = data["base"]
+    if not data["rows"]:
+        print("Рейтинг пуст.")
+        return
+    table = PrettyTable()
+    table.field_names = ["#", "User", f"Value ({base})"]
+    for place, name, value in data["rows"]:
+        table.add_row([place, name, f"{value:,.2f}"])
+    print(f"Рейтинг портфелей (база: {base}, пользователей: {data['total_users']}):")
+    print(table)
+    if data.get("me"):
+        print(f"Ваше место: {data['me']}")
+
+
+def _print_update_result(res: dict) -> None:
+    print(
+        "Update successful. Total pairs in cache: "
+        f"{res['total_pairs']}. Updated: {res['updated_pairs']}. "
+        f"Last refresh: {res['last_refresh']}"
+    )
+    if res.get("throttled"):
+        print(
+            "Лимит запросов исчерпан, курсы взяты из кеша: "
+            + ", ".join(res["throttled"])
+        )
+
+
+def _on_background_done(res: dict | None, err: Exception | None) -> None:
+    # Вызывается из рабочего потока: печатаем итог и заново выводим приглашение
+    print()
+    if err is not None:
+        print(f"[фон] Обновление курсов не удалось: {err}")
+    else:
+        print("[фон] ", end="")
+        _print_update_result(res)
+    print("> ", end="", flush=True)
+
+
+# Фоновое обновление курсов внутри процесса CLI
+_background = BackgroundUpdater(make_updater, _on_background_done)
+
+
+def _on_rates_changed(event) -> None:
+    # Событие может прийти из фонового потока — сериализуем с командами
+    with _command_lock:
+        _handle_rates_changed(event)
+
+
+def _poll_rates_version(watcher: RatesVersionWatcher) -> None:
+    # Курсы обновил другой процесс (планировщик): рейтинги пересчитывают
+    # только изменённые пары вместо сверки всего снимка
+    event = watcher.poll()
+    if event is not None:
+        with _command_lock:
+            usecases.apply_external_rates(event)
+
+
+def _handle_rates_changed(event) -> None:
+    # Уведомляем о сработавших алертах и исполненных заявках текущего пользователя
+    me = usecases._current_user_id
+    triggered, orders = usecases.handle_rates_changed(event)
+    for a in triggered:
+        if a["user_id"] == me:
+            print(
+                f"[ALERT #{a['id']}] {a['pair']} {a['direction']} "
+                f"{a['threshold']}: курс {a['triggered_rate']}"
+            )
+    for o in orders:
+        if o["user_id"] == me:
+            print(
+                f"[ORDER #{o['id']}] {o['side']} {o['amount']} {o['pair']}: "
+                f"{o['status']} {o['fill_rate'] or o['reason']}"
+            )
+
+
+def _run_command(cmd: str, tokens: list[str], args: dict[str, str]) -> None:
+    # Выполнение одной команды REPL
+    if cmd == "register":
+        msg = usecases.register(
+            username=args.get("username", ""),
+            password=args.get("password", ""),
+        )
+        print(msg)
+
+    elif cmd == "login":
+        msg = usecases.login(
+            username=args.get("username", ""),
+            password=args.get("password", ""),
+            remember="session" in args,
+        )
+        print(msg)
+
+    elif cmd == "logout":
+        print(usecases.logout())
+
+    elif cmd == "show-portfolio":
+        base = args.get("base", "USD")
+        if args.get("at"):
+            data = usecases.show_portfolio_at(
+                at=args["at"],
+                history=make_storage(ParserConfig()).history,
+                base=base,
+            )
+            print(f"На момент {data['at']}:")
+        else:
+            data = usecases.show_portfolio(base=base)
+        _print_portfolio(data)
+
+    elif cmd == "portfolio-curve":
+        if not args.get("since"):
+            raise ValueError("Укажите --since (ISO-время)")
+        data = usecases.portfolio_curve(
+            since=args["since"],
+            history=make_storage(ParserConfig()).history,
+            step=args.get("step", "1h"),
+            until=args.get("until"),
+            base=args.get("base", "USD"),
+        )
+        _print_curve(data)
+
+    elif cmd == "buy":
+        res = usecases.buy(
+            currency_code=args.get("currency", ""),
+            amount=args.get("amount"),
+            base=args.get("base", "USD"),
+        )
+        print(
+            f"Покупка выполнена: {res['amount']:.4f} {res['currency']} "
+            f"по курсу {res['rate']:.6f} {res['base']}/{res['currency']}"
+        )
+        print(
+            "Оценочная стоимость покупки: "
+            f"{res['estimated_cost']:,.2f} {res['base']}"
+        )
+
+    elif cmd == "sell":
+        res = usecases.sell(
+            currency_code=args.get("currency", ""),
+            amount=args.get("amount"),
+            base=args.get("base", "USD"),
+        )
+        print(
+            f"Продажа выполнена: {res['amount']:.4f} {res['currency']} "
+            f"по курсу {res['rate']:.6f} {res['base']}/{res['currency']}"
+        )
+        print(
+            "Оценочная выручка: "
+            f"{res['estimated_revenue']:,.2f} {res['base']}"
+        )
+
+    elif cmd == "get-rate":
+        res = usecases.get_rate(
+            from_code=args.get("from", ""),
+            to_code=args.get("to", ""),
+        )
+        print(
+            f"Курс {res['from']}→{res['to']}: {res['rate']} "
+            f"(обновлено: {res.get('updated_at')})"
+        )
+
+    elif cmd == "update-rates":
+        only = args.get("source")  # coingecko / exchangerate-api
+        # --record <файл>: ответы API дописываются в JSONL для ReplayClient
+        record = Path(args["record"]) if args.get("record") else None
+
+        if _background.running:
+            print("Обновление курсов уже выполняется в фоне")
+            return
+        if args.get("background", "").lower() in {"yes", "true", "1"}:
+            if record is not None:
+                raise ValueError("--record выполняется только без --background")
+            # Сеть — в рабочем потоке, приглашение не блокируется
+            _background.start(only_source=only)
+            print("Обновление курсов запущено в фоне")
+            return
+
+        _print_update_result(make_updater(record).run_update(only_source=only))
+
+    elif cmd == "backfill":
+        if not args.get("pairs") or not args.get("since"):
+            raise ValueError("Укажите --pairs BTC_USD,ETH_USD и --since 2025-01-01")
+        since = int(parse_iso(args["since"]).timestamp())
+        until = int(
+            parse_iso(args["until"]).timestamp() if args.get("until") else time.time()
+        )
+        if since >= until:
+            raise ValueError("--since должно быть раньше --until")
+        cfg = ParserConfig()
+        backfiller = Backfiller(
+            make_clients(cfg),
+            make_storage(cfg),
+            Path(cfg.BACKFILL_CHECKPOINT_PATH),
+            workers=int(args.get("workers", cfg.BACKFILL_WORKERS)),
+            flush_points=cfg.BACKFILL_FLUSH_POINTS,
+            max_wait=cfg.BACKFILL_MAX_WAIT_SECONDS,
+        )
+
+        def progress(st: dict) -> None:
+            done = st["skipped"] + st["fetched"] + st["failed"]
+            print(f"\r  чанков {done}/{st['chunks']}, точек {st['points']}", end="")
+
+        res = backfiller.run(args["pairs"].split(","), since, until, progress)
+        print(
+            f"\rBackfill: чанков {res['chunks']} (уже было {res['skipped']}, "
+            f"скачано {res['fetched']}, ошибок {res['failed']}), "
+            f"новых точек {res['added']}"
+        )
+        if res["unsupported"]:
+            print("Нет источника истории для: " + ", ".join(res["unsupported"]))
+        if res["throttled"] or res["failed"]:
+            print(
+                f"Задание не завершено"
+                f"{' (лимит ' + res['throttled'] + ')' if res['throttled'] else ''}"
+                ": повторите ту же команду — готовые чанки пропускаются"
+            )
+
+    elif cmd == "show-rates":
+        cfg = ParserConfig()
+        storage = make_storage(cfg)
+
+        snap = storage.load_snapshot()
+        pairs = snap.get("pairs", {})
+        last_refresh = snap.get("last_refresh")
+
+        if not pairs:
+            print(
+                "Локальный кеш курсов пуст. Выполните 'update-rates', "
+                "чтобы загрузить данные."
+            )
+            return
+
+        currency = args.get("currency")
+        top = args.get("top")
+
+        items = list(pairs.items())
+
+        if currency:
+            cur = currency.strip().upper()
+            items = [
+                (k, v)
+                for k, v in items
+                if k.startswith(cur + "_") or k.endswith("_" + cur)
+            ]
+            if not items:
+                print(f"Курс для '{cur}' не найден в кеше.")
+                return
+
+        if top:
+            try:
+                n = int(top)
+            except ValueError as err:
+                raise ValueError("--top должен быть числом") from err
+
+            items.sort(
+                key=lambda kv: float(kv[1].get("rate", 0.0)),
+                reverse=True,
+            )
+            items = items[:n]
+        else:
+            items.sort(key=lambda kv: kv[0])
+
+        print(f"Rates from cache (last refresh: {last_refresh}):")
+
+        table = PrettyTable()
+        table.field_names = ["PAIR", "RATE", "UPDATED_AT", "SOURCE"]
+        for k, v in items:
+            table.add_row(
+                [k, v.get("rate"), v.get("updated_at"), v.get("source")]
+            )
+        print(table)
+
+    elif cmd == "alert":
+        sub = _subcommand(tokens)
+        if sub == "add":
+            if "above" in args:
+                direction, threshold = "above", args["above"]
+            elif "below" in args:
+                direction, threshold = "below", args["below"]
+            else:
+                raise ValueError("Укажите --above или --below")
+            a = usecases.add_alert(
+                currency_code=args.get("currency", ""),
+                threshold=threshold,
+                direction=direction,
+                base=args.get("base", "USD"),
+            )
+            print(
+                f"Алерт #{a['id']} создан: {a['pair']} "
+                f"{a['direction']} {a['threshold']}"
+            )
+        elif sub == "list":
+            _print_alerts(usecases.list_alerts())
+        elif sub == "remove":
+            usecases.remove_alert(args.get("id"))
+            print(f"Алерт #{args.get('id')} удалён")
+        else:
+            raise ValueError("Использование: alert add|list|remove")
+
+    elif cmd == "order":
+        sub = _subcommand(tokens)
+        if sub == "place":
+            o = usecases.place_order(
+                side=args.get("side", ""),
+                currency_code=args.get("currency", ""),
+                limit=args.get("limit"),
+                amount=args.get("amount"),
+                base=args.get("base", "USD"),
+            )
+            print(
+                f"Заявка #{o['id']} размещена: {o['side']} {o['amount']} "
+                f"{o['currency']} по {o['limit']} {o['pair']}"
+            )
+        elif sub == "list":
+            _print_orders(usecases.list_orders())
+        elif sub == "cancel":
+            usecases.cancel_order(args.get("id"))
+            print(f"Заявка #{args.get('id')} отменена")
+        else:
+            raise ValueError("Использование: order place|list|cancel")
+
+    elif cmd == "history":
+        data = usecases.trade_history(
+            username=args.get("user"),
+            since=args.get("since"),
+        )
+        _print_history(data)
+
+    elif cmd == "pnl":
+        data = usecases.profit_and_loss(
+            username=args.get("user"),
+            base=args.get("base", "USD"),
+        )
+        _print_pnl(data)
+
+    elif cmd == "rebuild-portfolios":
+        write = args.get("write", "no").lower() in {"yes", "true", "1"}
+        portfolios = usecases.rebuild_portfolios(write=write)
+        print(
+            f"Восстановлено портфелей из журнала: {len(portfolios)}"
+            + (" (записано в portfolios.json)" if write else "")
+        )
+
+    elif cmd == "leaderboard":
+        try:
+            top = int(args.get("top", "10"))
+        except ValueError as err:
+            raise ValueError("--top должен быть числом") from err
+        data = usecases.leaderboard(base=args.get("base", "USD"), top=top)
+        _print_leaderboard(data)
+
+    elif cmd == "report":
+        if not args.get("out"):
+            raise ValueError("Укажите --out (путь к CSV)")
+        res = usecases.portfolio_report(
+            bases=args.get("bases", "USD"),
+            out=args["out"],
+            chunk_size=args.get("chunk", 5000),
+            workers=args.get("workers"),
+            progress=lambda n, rss: print(
+                f"\rОбработано: {n} пользователей, RSS {rss:.1f} МБ",
+                end="",
+                flush=True,
+            ),
+        )
+        print(
+            f"\nОтчёт записан: {res['out']} "
+            f"({res['users']} пользователей, базы: {', '.join(res['bases'])})"
+        )
+
+    elif cmd in ("import-users", "import-portfolios"):
+        if not args.get("file"):
+            raise ValueError("Укажите --file (csv, jsonl или json)")
+        if cmd == "import-users":
+            res = usecases.import_users(args["file"])
+        else:
+            res = usecases.import_portfolios(args["file"])
+        print(f"Импортировано: {res['imported']}, пропущено: {res['skipped']}")
+        for line in res["errors"]:
+            print(f"  {line}")
+
+    elif cmd == "export":
+        if not args.get("out"):
+            raise ValueError("Укажите --out (csv или jsonl)")
+        what = args.get("what", "portfolios")
+        n = usecases.export_data(what=what, out=args["out"])
+        print(f"Выгружено записей ({what}): {n} → {args['out']}")
+
+    elif cmd == "migrate-storage":
+        # Перенос старой истории курсов и (с --codec) перекодирование хранилищ
+        moved = make_storage(ParserConfig()).import_legacy_history()
+        if moved:
+            print(f"История курсов: перенесено {moved} записей в сегменты")
+        if args.get("codec"):
+            for name, before, after in usecases.migrate_storage(args["codec"]):
+                print(f"{name}: {before:,} → {after:,} байт")
+            print(f"Кодек хранилищ: {args['codec'].strip().lower()}")
+        elif not moved:
+            print("Нечего переносить. Кодек хранилищ: --codec json-pretty|json|marshal")
+
+    elif cmd == "profile":
+        # profile cpu|mem|off [--sample 0.1] — переключатель в REPL
+        mode = _subcommand(tokens)
+        if mode not in ("cpu", "mem", "off", ""):
+            raise ValueError("Использование: profile cpu|mem|off [--sample 0.1]")
+        if mode:
+            _profiler.configure(mode, args.get("sample"))
+        if _profiler.mode is None:
+            print("Профилирование выключено")
+        else:
+            print(
+                f"Профилирование: {_profiler.mode}, "
+                f"доля {_profiler.sample_rate:g}"
+            )
+
+    else:
+        print(f"Неизвестная команда: {cmd}")
+        _print_help()
+
+
+def _execute(tokens: list[str]) -> bool:
+    # Одна команда с обработкой ошибок; False — команда завершилась ошибкой
+    try:
+        cmd = tokens[0]
+        args = _parse_args(tokens[1:])
+
+        # --session <токен> (или VALUTATRADE_SESSION) — вход без login
+        session = None
+        if cmd != "login":
+            session = args.pop("session", None)
+            if session is None and usecases._current_user_id is None:
+                session = os.environ.get(SESSION_ENV)
+        if session == "yes":
+            raise ValueError("Укажите --session <токен>")
+
+        # --profile cpu|mem у команды — разовый профиль без выборки
+        once = args.pop("profile", None)
+        with _command_lock:
+            if session:
+                usecases.resume_session(session)
+            _profiler.run(cmd, _run_command, cmd, tokens, args, force_mode=once)
+        return True
+    except InsufficientFundsError as e:
+        print(e)
+
+    except CurrencyNotFoundError as e:
+        print(e)
+        codes = supported_codes()
+        hint = ", ".join(codes[:20])
+        if len(codes) > 20:
+            hint += f" … (всего {len(codes)})"
+        print("Подсказка: поддерживаемые коды:", hint)
+        print("Команда: get-rate --from USD --to BTC")
+
+    except ApiRequestError as e:
+        print(e)
+        print("Повторите позже или выполните 'update-rates' для обновления кеша.")
+
+    except Exception as e:
+        print(e)
+    return False
+
+
 def _print_help() -> None:
     # Подсказка
     print(
         "ValutaTrade Hub CLI. Команды: "
         "register/login/show-portfolio/buy/sell/get-rate/"
-        "update-rates/show-rates, exit."
+        "update-rates/show-rates/alert add|list|remove/"
+        "order place|list|cancel/history/pnl/rebuild-portfolios/"
+        "portfolio-curve/leaderboard/report/import-users/"
+        "import-portfolios/export/migrate-storage/profile/logout/backfill, exit."
     )
 
 
@@ -75,6 +661,32 @@ def main() -> None:
         level=settings.get("LOG_LEVEL", "INFO"),
     )
 
+    rates_bus.subscribe(_on_rates_changed)
+
+    # python main.py [--profile cpu|mem [--profile-sample 0.1]] [команда ...]
+    argv = sys.argv[1:]
+    split = 0
+    while split < len(argv) and argv[split].startswith("--"):
+        split += 2
+    startup, command = _parse_args(argv[:split]), argv[split:]
+    if startup.get("profile"):
+        _profiler.configure(startup["profile"], startup.get("profile-sample"))
+        if not command:
+            print(
+                f"Профилирование: {_profiler.mode}, доля "
+                f"{_profiler.sample_rate:g}, отчёты в {settings.get('PROFILE_DIR')}"
+            )
+
+    if command:
+        # Разовый запуск: project buy --currency BTC --amount 0.1 --session <токен>
+        sys.exit(0 if _execute(command) else 1)
+
+    auto = ParserConfig().AUTO_REFRESH_SECONDS
+    if auto > 0:
+        _background.start_auto(auto)
+        print(f"Автообновление курсов в фоне каждые {auto} с")
+
+    watcher = RatesVersionWatcher(make_storage(ParserConfig()).version_file)
     _print_help()
 
     while True:
@@ -92,172 +704,8 @@ def main() -> None:
 
         try:
             tokens = shlex.split(raw)
-            cmd = tokens[0]
-            args = _parse_args(tokens[1:])
-
-            if cmd == "register":
-                msg = usecases.register(
-                    username=args.get("username", ""),
-                    password=args.get("password", ""),
-                )
-                print(msg)
-
-            elif cmd == "login":
-                msg = usecases.login(
-                    username=args.get("username", ""),
-                    password=args.get("password", ""),
-                )
-                print(msg)
-
-            elif cmd == "show-portfolio":
-                base = args.get("base", "USD")
-                data = usecases.show_portfolio(base=base)
-                _print_portfolio(data)
-
-            elif cmd == "buy":
-                res = usecases.buy(
-                    currency_code=args.get("currency", ""),
-                    amount=args.get("amount"),
-                    base=args.get("base", "USD"),
-                )
-                print(
-                    f"Покупка выполнена: {res['amount']:.4f} {res['currency']} "
-                    f"по курсу {res['rate']:.6f} {res['base']}/{res['currency']}"
-                )
-                print(
-                    "Оценочная стоимость покупки: "
-                    f"{res['estimated_cost']:,.2f} {res['base']}"
-                )
-
-            elif cmd == "sell":
-                res = usecases.sell(
-                    currency_code=args.get("currency", ""),
-                    amount=args.get("amount"),
-                    base=args.get("base", "USD"),
-                )
-                print(
-                    f"Продажа выполнена: {res['amount']:.4f} {res['currency']} "
-                    f"по курсу {res['rate']:.6f} {res['base']}/{res['currency']}"
-                )
-                print(
-                    "Оценочная выручка: "
-                    f"{res['estimated_revenue']:,.2f} {res['base']}"
-                )
-
-            elif cmd == "get-rate":
-                res = usecases.get_rate(
-                    from_code=args.get("from", ""),
-                    to_code=args.get("to", ""),
-                )
-                print(
-                    f"Курс {res['from']}→{res['to']}: {res['rate']} "
-                    f"(обновлено: {res.get('updated_at')})"
-                )
-
-            elif cmd == "update-rates":
-                only = args.get("source")  # coingecko / exchangerate-api
-
-                cfg = ParserConfig()
-                storage = RatesStorage(
-                    rates_path=cfg.rates_path,
-                    history_path=cfg.history_path,
-                )
-
-                clients = [
-                    CoinGeckoClient(
-                        cfg.COINGECKO_URL,
-                        cfg.CRYPTO_ID_MAP,
-                        timeout=cfg.REQUEST_TIMEOUT,
-                    ),
-                    ExchangeRateApiClient(
-                        cfg.EXCHANGERATE_API_URL,
-                        cfg.EXCHANGERATE_API_KEY,
-                        cfg.BASE_FIAT_CURRENCY,
-                        timeout=cfg.REQUEST_TIMEOUT,
-                    ),
-                ]
-                updater = RatesUpdater(clients=clients, storage=storage)
-                res = updater.run_update(only_source=only)
-
-                print(
-                    "Update successful. Total pairs in cache: "
-                    f"{res['total_pairs']}. Updated: {res['updated_pairs']}. "
-                    f"Last refresh: {res['last_refresh']}"
-                )
-
-            elif cmd == "show-rates":
-                cfg = ParserConfig()
-                storage = RatesStorage(
-                    rates_path=cfg.rates_path,
-                    history_path=cfg.history_path,
-                )
-
-                snap = storage.load_snapshot()
-                pairs = snap.get("pairs", {})
-                last_refresh = snap.get("last_refresh")
-
-                if not pairs:
-                    print(
-                        "Локальный кеш курсов пуст. Выполните 'update-rates', "
-                        "чтобы загрузить данные."
-                    )
-                    continue
-
-                currency = args.get("currency")
-                top = args.get("top")
-
-                items = list(pairs.items())
-
-                if currency:
-                    cur = currency.strip().upper()
-                    items = [
-                        (k, v)
-                        for k, v in items
-                        if k.startswith(cur + "_") or k.endswith("_" + cur)
-                    ]
-                    if not items:
-                        print(f"Курс для '{cur}' не найден в кеше.")
-                        continue
-
-                if top:
-                    try:
-                        n = int(top)
-                    except ValueError as err:
-                        raise ValueError("--top должен быть числом") from err
-
-                    items.sort(
-                        key=lambda kv: float(kv[1].get("rate", 0.0)),
-                        reverse=True,
-                    )
-                    items = items[:n]
-                else:
-                    items.sort(key=lambda kv: kv[0])
-
-                print(f"Rates from cache (last refresh: {last_refresh}):")
-
-                table = PrettyTable()
-                table.field_names = ["PAIR", "RATE", "UPDATED_AT", "SOURCE"]
-                for k, v in items:
-                    table.add_row(
-                        [k, v.get("rate"), v.get("updated_at"), v.get("source")]
-                    )
-                print(table)
-
-            else:
-                print(f"Неизвестная команда: {cmd}")
-                _print_help()
-
-        except InsufficientFundsError as e:
-            print(e)
-
-        except CurrencyNotFoundError as e:
-            print(e)
-            print("Подсказка: поддерживаемые коды:", ", ".join(supported_codes()))
-            print("Команда: get-rate --from USD --to BTC")
-
-        except ApiRequestError as e:
-            print(e)
-            print("Повторите позже или выполните 'update-rates' для обновления кеша.")
-
-        except Exception as e:
+        except ValueError as e:
             print(e)
+            continue
+        _poll_rates_version(watcher)
+        _execute(tokens)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+
+ABOVE = "above"
+BELOW = "below"
+
+
+class _PairBook:
+    # Пороги одной пары: отсортированные массивы + параллельные id
+    __slots__ = ("above", "above_ids", "below", "below_ids")
+
+    def __init__(self) -> None:
+        self.above: list[float] = []
+        self.above_ids: list[int] = []
+        self.below: list[float] = []
+        self.below_ids: list[int] = []
+
+    def _side(self, direction: str) -> tuple[list[float], list[int]]:
+        if direction == ABOVE:
+            return self.above, self.above_ids
+        return self.below, self.below_ids
+
+    def add(self, direction: str, threshold: float, alert_id: int) -> None:
+        thr, ids = self._side(direction)
+        i = bisect_right(thr, threshold)
+        thr.insert(i, threshold)
+        ids.insert(i, alert_id)
+
+    def remove(self, direction: str, threshold: float, alert_id: int) -> bool:
+        thr, ids = self._side(direction)
+        i = bisect_left(thr, threshold)
+        while i < len(thr) and thr[i] == threshold:
+            if ids[i] == alert_id:
+                del thr[i]
+                del ids[i]
+                return True
+            i += 1
+        return False
+
+    def cross(self, old: float, new: float) -> list[int]:
+        # Срабатывают только пороги между old и new: O(log n + hits)
+        if new > old:
+            thr, ids = self.above, self.above_ids
+            i, j = bisect_right(thr, old), bisect_right(thr, new)
+        elif new < old:
+            thr, ids = self.below, self.below_ids
+            i, j = bisect_left(thr, new), bisect_left(thr, old)
+        else:
+            return []
+        fired = ids[i:j]
+        del thr[i:j]
+        del ids[i:j]
+        return fired
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+
+class AlertEngine:
+    """
+    Индекс активных алертов по парам.
+    above срабатывает, когда курс растёт и пересекает порог (old < thr <= new),
+    below — когда падает (new <= thr < old). Сработавший алерт снимается.
+    """
+
+    def __init__(self) -> None:
+        self._books: dict[str, _PairBook] = {}
+        self._index: dict[int, tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def load(self, alerts: list[dict]) -> None:
+        # Активные алерты из alerts.json: одна сортировка на сторону пары
+        groups: dict[tuple[str, str], list[tuple[float, int]]] = {}
+        index: dict[int, tuple[str, str, float]] = {}
+        for a in alerts:
+            if a.get("triggered_at") is not None:
+                continue
+            pair = str(a["pair"]).upper()
+            direction = a["direction"]
+            threshold = float(a["threshold"])
+            groups.setdefault((pair, direction), []).append((threshold, int(a["id"])))
+            index[int(a["id"])] = (pair, direction, threshold)
+
+        books: dict[str, _PairBook] = {}
+        for (pair, direction), items in groups.items():
+            items.sort()
+            thr, ids = books.setdefault(pair, _PairBook())._side(direction)
+            thr.extend(t for t, _ in items)
+            ids.extend(i for _, i in items)
+
+        with self._lock:
+            self._books = books
+            self._index = index
+
+    def add(self, alert: dict) -> None:
+        alert_id = int(alert["id"])
+        pair = str(alert["pair"]).upper()
+        direction = alert["direction"]
+        if direction not in (ABOVE, BELOW):
+            raise ValueError("direction должен быть 'above' или 'below'")
+        threshold = float(alert["threshold"])
+        with self._lock:
+            self._books.setdefault(pair, _PairBook()).add(
+                direction, threshold, alert_id
+            )
+            self._index[alert_id] = (pair, direction, threshold)
+
+    def remove(self, alert_id: int) -> bool:
+        with self._lock:
+            key = self._index.pop(int(alert_id), None)
+            if key is None:
+                return False
+            pair, direction, threshold = key
+            return self._books[pair].remove(direction, threshold, int(alert_id))
+
+    def on_move(self, pair: str, old: float | None, new: float) -> list[int]:
+        # id сработавших алертов при движении курса old -> new
+        if old is None:
+            return []
+        with self._lock:
+            book = self._books.get(pair)
+            if book is None:
+                return []
+            fired = book.cross(float(old), float(new))
+            for alert_id in fired:
+                self._index.pop(alert_id, None)
+            return fired
+
+    def on_moves(
+        self, moves: dict[str, tuple[float | None, float]]
+    ) -> dict[int, tuple[str, float]]:
+        # Пакет движений -> {alert_id: (pair, новый курс)}
+        out: dict[int, tuple[str, float]] = {}
+        for pair, (old, new) in moves.items():
+            for alert_id in self.on_move(pair, old, new):
+                out[alert_id] = (pair, float(new))
+        return out
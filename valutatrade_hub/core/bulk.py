@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import csv
+import json
+import secrets
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from ..infra.jsonstream import iter_json_array
+from .models import _hash_password, _validate_password
+from .utils import validate_currency_code
+
+USER_FIELDS = ("user_id", "username", "hashed_password", "salt", "registration_date")
+PORTFOLIO_FIELDS = ("user_id", "username", "currency", "balance")
+
+
+def _file_format(path: Path) -> str:
+    # Формат по расширению: csv, jsonl (ndjson) или json-массив
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix == ".json":
+        return "json"
+    raise ValueError(f"Неподдерживаемый формат файла: {path} (csv, jsonl, json)")
+
+
+def read_rows(path: Path) -> Iterator[tuple[int, dict]]:
+    # (номер записи, словарь) по одной, без загрузки файла целиком
+    path = Path(path)
+    if not path.exists():
+        raise ValueError(f"Файл не найден: {path}")
+    fmt = _file_format(path)
+    if fmt == "json":
+        for n, row in enumerate(iter_json_array(path), start=1):
+            yield n, row
+        return
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    yield n, json.loads(line)
+
+
+def parse_user(row: dict) -> dict:
+    # Запись пользователя: пароль хешируется, готовый hashed_password+salt берётся
+    username = str(row.get("username") or "").strip()
+    if not username:
+        raise ValueError("пустой username")
+    hashed = str(row.get("hashed_password") or "").strip()
+    salt = str(row.get("salt") or "").strip()
+    if not (hashed and salt):
+        password = _validate_password(str(row.get("password") or ""))
+        salt = secrets.token_hex(4)
+        hashed = _hash_password(password, salt)
+    reg = str(row.get("registration_date") or "").strip()
+    return {
+        "username": username,
+        "hashed_password": hashed,
+        "salt": salt,
+        "registration_date": reg or datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def parse_balance(row: dict) -> tuple[str, float]:
+    # (код валюты из реестра, баланс >= 0)
+    code = validate_currency_code(str(row.get("currency") or ""))
+    try:
+        balance = float(row.get("balance"))
+    except (TypeError, ValueError) as err:
+        raise ValueError("'balance' должен быть числом") from err
+    if balance < 0 or balance != balance:
+        raise ValueError("'balance' не может быть отрицательным")
+    return code, balance
+
+
+def write_rows(path: Path, fields: tuple[str, ...], rows: Iterable[dict]) -> int:
+    # Потоковая выгрузка в csv или jsonl
+    path = Path(path)
+    fmt = _file_format(path)
+    if fmt == "json":
+        raise ValueError("Для выгрузки используйте .csv или .jsonl")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                n += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(_pick(row, fields), ensure_ascii=False) + "\n")
+                n += 1
+    tmp.replace(path)
+    return n
+
+
+def _pick(row: dict, fields: tuple[str, ...]) -> dict[str, Any]:
+    return {k: row.get(k) for k in fields}
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import json
+import sys
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from pathlib import Path
 
+from ..infra.settings import SettingsLoader
 from .exceptions import CurrencyNotFoundError
 
 
@@ -63,6 +68,7 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     algorithm: str
     market_cap: float
+    coingecko_id: str | None = None
 
     def __post_init__(self) -> None:
         super().__post_init__()
@@ -81,49 +87,105 @@ class CryptoCurrency(Currency):
         )
 
 
-# Мини-реестр валют
-_REGISTRY: dict[str, Currency] = {
-    "USD": FiatCurrency(
-        name="US Dollar",
-        code="USD",
-        issuing_country="United States",
-    ),
-    "EUR": FiatCurrency(
-        name="Euro",
-        code="EUR",
-        issuing_country="Eurozone",
-    ),
-    "RUB": FiatCurrency(
-        name="Russian Ruble",
-        code="RUB",
-        issuing_country="Russia",
-    ),
-    "BTC": CryptoCurrency(
-        name="Bitcoin",
-        code="BTC",
-        algorithm="SHA-256",
-        market_cap=1.12e12,
-    ),
-    "ETH": CryptoCurrency(
-        name="Ethereum",
-        code="ETH",
-        algorithm="Ethash",
-        market_cap=4.50e11,
-    ),
-}
+# Реестр валют: грузится из файла один раз на процесс.
+# Ключи — канонические коды и алиасы (интернированные строки),
+# значения — общие объекты Currency.
+_REGISTRY: dict[str, Currency] | None = None
+_CODES: tuple[str, ...] = ()
+_LOCK = threading.Lock()
 
 
-def get_currency(code: str) -> Currency:
-    # Фабрика валют по коду
+def _registry_path() -> Path:
+    return Path(SettingsLoader().get("CURRENCIES_PATH"))
+
+
+def _build_registry(path: Path) -> dict[str, Currency]:
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    registry: dict[str, Currency] = {}
+    aliases: list[tuple[str, Currency]] = []
+
+    def _add(cur: Currency, entry: dict) -> None:
+        code = sys.intern(cur.code)
+        if code in registry:
+            raise ValueError(f"Дубликат кода валюты в реестре: {code}")
+        registry[code] = cur
+        for alias in entry.get("aliases", ()):
+            aliases.append((sys.intern(str(alias).strip().upper()), cur))
+
+    for entry in raw.get("fiat", ()):
+        _add(
+            FiatCurrency(
+                name=entry["name"],
+                code=entry["code"],
+                issuing_country=entry["issuing_country"],
+            ),
+            entry,
+        )
+    for entry in raw.get("crypto", ()):
+        _add(
+            CryptoCurrency(
+                name=entry["name"],
+                code=entry["code"],
+                algorithm=entry["algorithm"],
+                market_cap=entry.get("market_cap", 0.0),
+                coingecko_id=entry.get("coingecko_id"),
+            ),
+            entry,
+        )
+
+    # Алиасы не перекрывают настоящие коды
+    for alias, cur in aliases:
+        registry.setdefault(alias, cur)
+    return registry
+
+
+def _load_registry() -> dict[str, Currency]:
+    global _REGISTRY, _CODES
+    with _LOCK:
+        if _REGISTRY is None:
+            registry = _build_registry(_registry_path())
+            _CODES = tuple(sorted({c.code for c in registry.values()}))
+            _REGISTRY = registry
+        return _REGISTRY
+
+
+def _lookup_slow(code: str) -> Currency:
+    # Нормализация только при промахе быстрого пути
     if not isinstance(code, str):
         raise CurrencyNotFoundError(str(code))
     c = code.strip().upper()
-    cur = _REGISTRY.get(c)
+    cur = (_REGISTRY or _load_registry()).get(c)
     if cur is None:
         raise CurrencyNotFoundError(c)
     return cur
 
 
+def get_currency(code: str) -> Currency:
+    # Фабрика валют по коду или алиасу (O(1), без аллокаций при попадании)
+    registry = _REGISTRY or _load_registry()
+    try:
+        cur = registry.get(code)
+    except TypeError:
+        cur = None
+    if cur is not None:
+        return cur
+    return _lookup_slow(code)
+
+
 def supported_codes() -> list[str]:
     # Список поддерживаемых кодов
-    return sorted(_REGISTRY.keys())
+    if _REGISTRY is None:
+        _load_registry()
+    return list(_CODES)
+
+
+def coingecko_ids(codes: tuple[str, ...] | None = None) -> dict[str, str]:
+    # Тикер -> coin id CoinGecko для криптовалют реестра
+    registry = _REGISTRY or _load_registry()
+    wanted = _CODES if codes is None else [get_currency(c).code for c in codes]
+    out: dict[str, str] = {}
+    for code in wanted:
+        cur = registry[code]
+        if isinstance(cur, CryptoCurrency) and cur.coingecko_id:
+            out[code] = cur.coingecko_id
+    return out
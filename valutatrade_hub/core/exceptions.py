@@ -26,3 +26,14 @@ class ApiRequestError(Exception):
     def __init__(self, reason: str) -> None:
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
         self.reason = reason
+
+
+class RateLimitExceededError(ApiRequestError):
+    """Исчерпан бюджет запросов к внешнему API"""
+
+    def __init__(self, source: str, retry_after: float) -> None:
+        super().__init__(
+            f"{source}: исчерпан лимит запросов, повтор через {retry_after:.0f} с"
+        )
+        self.source = source
+        self.retry_after = retry_after
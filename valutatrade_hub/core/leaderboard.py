@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, insort
+from typing import Iterable
+
+from .utils import cross_rate
+
+
+class Leaderboard:
+    """
+    Инкрементальный рейтинг стоимости портфелей в одной базовой валюте.
+
+    _holders: валюта -> пользователи, у которых она есть (обратный индекс);
+    _ranked: отсортированный список (-value, user_id) для top-N срезом.
+    Сделка пересчитывает одного пользователя, изменение курса — только
+    держателей затронутой валюты.
+    """
+
+    def __init__(self, base: str) -> None:
+        self.base = base.upper()
+        self._pairs: dict[str, float] = {}
+        self._rates: dict[str, float | None] = {}
+        self._holdings: dict[int, dict[str, float]] = {}
+        self._holders: dict[str, set[int]] = {}
+        self._values: dict[int, float] = {}
+        self._ranked: list[tuple[float, int]] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _rate(self, code: str) -> float | None:
+        if code not in self._rates:
+            self._rates[code] = cross_rate(self._pairs, code, self.base)
+        return self._rates[code]
+
+    def _score(self, user_id: int) -> float:
+        total = 0.0
+        for code, bal in self._holdings.get(user_id, {}).items():
+            rate = self._rate(code)
+            if rate is not None:
+                total += bal * rate
+        return total
+
+    def _rank(self, user_id: int) -> None:
+        old = self._values.get(user_id)
+        if old is not None:
+            i = bisect_left(self._ranked, (-old, user_id))
+            if i < len(self._ranked) and self._ranked[i] == (-old, user_id):
+                del self._ranked[i]
+        value = self._score(user_id)
+        self._values[user_id] = value
+        insort(self._ranked, (-value, user_id))
+
+    def load(self, portfolios: Iterable[dict], pairs: dict[str, dict]) -> None:
+        # Полная сборка: один sort вместо поштучных вставок
+        with self._lock:
+            self._pairs = {k: float(v["rate"]) for k, v in pairs.items()}
+            self._rates = {}
+            self._holdings = {}
+            self._holders = {}
+            for p in portfolios:
+                uid = int(p["user_id"])
+                wallets = {
+                    c: float(w.get("balance", 0.0))
+                    for c, w in (p.get("wallets") or {}).items()
+                }
+                self._holdings[uid] = wallets
+                for code in wallets:
+                    self._holders.setdefault(code, set()).add(uid)
+            self._values = {uid: self._score(uid) for uid in self._holdings}
+            self._ranked = sorted((-v, uid) for uid, v in self._values.items())
+
+    def update_user(self, user_id: int, wallets: dict) -> None:
+        # Сделка изменила портфель одного пользователя
+        uid = int(user_id)
+        new = {c: float(w.get("balance", 0.0)) for c, w in wallets.items()}
+        with self._lock:
+            for code in self._holdings.get(uid, {}):
+                if code not in new:
+                    self._holders.get(code, set()).discard(uid)
+            for code in new:
+                self._holders.setdefault(code, set()).add(uid)
+            self._holdings[uid] = new
+            self._rank(uid)
+
+    def update_pairs(self, changed: dict[str, float]) -> int:
+        # Новые курсы пар; пересчитываем только держателей затронутых валют
+        with self._lock:
+            self._pairs.update({k: float(v) for k, v in changed.items()})
+            codes: set[str] = set()
+            for pair in changed:
+                a, b = pair.split("_", 1)
+                if {a, b} == {self.base, "USD"}:
+                    # Курс базы к USD меняет все кроссы
+                    codes.update(self._holders)
+                    continue
+                if b in (self.base, "USD"):
+                    codes.add(a)
+                if a in (self.base, "USD"):
+                    codes.add(b)
+            codes.discard(self.base)
+
+            users: set[int] = set()
+            for code in codes:
+                old = self._rates.pop(code, None)
+                if self._rate(code) != old:
+                    users.update(self._holders.get(code, ()))
+            if len(users) * 8 > len(self._ranked):
+                # Затронута большая доля — дешевле пересортировать целиком
+                for uid in users:
+                    self._values[uid] = self._score(uid)
+                self._ranked = sorted((-v, u) for u, v in self._values.items())
+            else:
+                for uid in users:
+                    self._rank(uid)
+            return len(users)
+
+    def sync_pairs(self, pairs: dict[str, float]) -> int:
+        # Полный набор курсов: применяем только отличающиеся пары
+        with self._lock:
+            diff = {k: v for k, v in pairs.items() if self._pairs.get(k) != v}
+        return self.update_pairs(diff) if diff else 0
+
+    def top(self, n: int) -> list[tuple[int, float]]:
+        with self._lock:
+            return [(uid, -neg) for neg, uid in self._ranked[: max(0, int(n))]]
+
+    def position(self, user_id: int) -> int | None:
+        # Место пользователя (с 1) или None
+        with self._lock:
+            value = self._values.get(int(user_id))
+            if value is None:
+                return None
+            return bisect_left(self._ranked, (-value, int(user_id))) + 1
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import hashlib
 from datetime import datetime
-from typing import Dict
+from types import MappingProxyType
+from typing import Dict, Mapping
 
 from .exceptions import InsufficientFundsError
 
@@ -26,6 +27,14 @@ def _hash_password(password: str, salt: str) -> str:
 
 
 class User:
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_salt",
+        "_registration_date",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -82,6 +91,8 @@ class User:
 
 
 class Wallet:
+    __slots__ = ("_currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0) -> None:
         self._currency_code = _validate_non_empty_str(
             currency_code,
@@ -126,6 +137,8 @@ class Wallet:
 
 
 class Portfolio:
+    __slots__ = ("_user_id", "_wallets")
+
     def __init__(self, user_id: int, wallets: Dict[str, Wallet] | None = None) -> None:
         # Портфель хранит кошельки пользователя
         self._user_id = int(user_id)
@@ -136,9 +149,27 @@ class Portfolio:
         return self._user_id
 
     @property
-    def wallets(self) -> Dict[str, Wallet]:
-        # Отдаём копию, чтобы не ломали исходник
-        return dict(self._wallets)
+    def wallets(self) -> Mapping[str, Wallet]:
+        # Read-only представление без копирования
+        return MappingProxyType(self._wallets)
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "Portfolio":
+        # Из записи portfolios.json
+        wallets = {
+            str(code).upper(): Wallet(code, float(w.get("balance", 0.0)))
+            for code, w in (raw.get("wallets") or {}).items()
+        }
+        return cls(int(raw["user_id"]), wallets)
+
+    def to_dict(self) -> dict:
+        # В формат portfolios.json
+        return {
+            "user_id": self._user_id,
+            "wallets": {
+                code: {"balance": w.balance} for code, w in self._wallets.items()
+            },
+        }
 
     def add_currency(self, currency_code: str) -> Wallet:
         # Создаём кошелёк, если его нет
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import heapq
+import threading
+
+BUY = "buy"
+SELL = "sell"
+
+
+class _PairBook:
+    # buy — max-heap по limit, sell — min-heap; (ключ, id) для стабильности
+    __slots__ = ("buys", "sells")
+
+    def __init__(self) -> None:
+        self.buys: list[tuple[float, int]] = []
+        self.sells: list[tuple[float, int]] = []
+
+
+class OrderBook:
+    """
+    Лимитные заявки по парам.
+    buy исполняется, когда курс опустился до limit (rate <= limit),
+    sell — когда поднялся до limit (rate >= limit).
+    Отмена ленивая: id помечается и выбрасывается при извлечении из кучи,
+    поэтому сопоставление стоит O(k log n) по числу пересечённых заявок.
+    """
+
+    def __init__(self) -> None:
+        self._books: dict[str, _PairBook] = {}
+        self._open: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def load(self, orders: list[dict]) -> None:
+        # Открытые заявки из orders.json: heapify вместо поштучных push
+        books: dict[str, _PairBook] = {}
+        open_ids: set[int] = set()
+        for o in orders:
+            if o.get("status") != "open":
+                continue
+            book = books.setdefault(str(o["pair"]).upper(), _PairBook())
+            limit = float(o["limit"])
+            oid = int(o["id"])
+            if o["side"] == BUY:
+                book.buys.append((-limit, oid))
+            else:
+                book.sells.append((limit, oid))
+            open_ids.add(oid)
+        for book in books.values():
+            heapq.heapify(book.buys)
+            heapq.heapify(book.sells)
+        with self._lock:
+            self._books = books
+            self._open = open_ids
+
+    def add(self, order: dict) -> None:
+        side = order["side"]
+        if side not in (BUY, SELL):
+            raise ValueError("side должен быть 'buy' или 'sell'")
+        limit = float(order["limit"])
+        oid = int(order["id"])
+        with self._lock:
+            book = self._books.setdefault(str(order["pair"]).upper(), _PairBook())
+            if side == BUY:
+                heapq.heappush(book.buys, (-limit, oid))
+            else:
+                heapq.heappush(book.sells, (limit, oid))
+            self._open.add(oid)
+
+    def cancel(self, order_id: int) -> bool:
+        with self._lock:
+            if int(order_id) not in self._open:
+                return False
+            self._open.discard(int(order_id))
+            return True
+
+    def match(self, pair: str, rate: float) -> list[int]:
+        # id заявок, пересечённых курсом rate
+        rate = float(rate)
+        filled: list[int] = []
+        with self._lock:
+            book = self._books.get(pair)
+            if book is None:
+                return filled
+            buys, sells = book.buys, book.sells
+            while buys and -buys[0][0] >= rate:
+                _, oid = heapq.heappop(buys)
+                if oid in self._open:
+                    self._open.discard(oid)
+                    filled.append(oid)
+            while sells and sells[0][0] <= rate:
+                _, oid = heapq.heappop(sells)
+                if oid in self._open:
+                    self._open.discard(oid)
+                    filled.append(oid)
+        return filled
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+import sys
+from array import array
+from typing import Iterable, Iterator
+
+from .models import Portfolio, Wallet
+from .utils import cross_rate
+
+
+class PortfolioTable:
+    """
+    Все кошельки всех пользователей в параллельных массивах:
+    user_ids (int64), currency_idx (int32), balances (float64).
+    Нужна для массовых задач, где объекты Portfolio/Wallet слишком дорогие.
+    """
+
+    __slots__ = ("user_ids", "currency_idx", "balances", "_codes", "_code_index")
+
+    def __init__(self, codes: Iterable[str] | None = None) -> None:
+        self.user_ids = array("q")
+        self.currency_idx = array("i")
+        self.balances = array("d")
+        self._codes: list[str] = []
+        self._code_index: dict[str, int] = {}
+        for code in codes or ():
+            self.code_index(code)
+
+    def __len__(self) -> int:
+        return len(self.balances)
+
+    @property
+    def codes(self) -> tuple[str, ...]:
+        return tuple(self._codes)
+
+    def code_index(self, code: str) -> int:
+        # Индекс валюты (добавляем при первом появлении)
+        code = sys.intern(code.strip().upper())
+        idx = self._code_index.get(code)
+        if idx is None:
+            idx = len(self._codes)
+            self._codes.append(code)
+            self._code_index[code] = idx
+        return idx
+
+    def append(self, user_id: int, currency_code: str, balance: float) -> None:
+        self.user_ids.append(int(user_id))
+        self.currency_idx.append(self.code_index(currency_code))
+        self.balances.append(float(balance))
+
+    def extend_records(self, portfolios: Iterable[dict]) -> int:
+        # Записи portfolios.json -> строки таблицы
+        added = 0
+        for p in portfolios:
+            uid = int(p["user_id"])
+            for code, w in (p.get("wallets") or {}).items():
+                self.append(uid, code, float(w.get("balance", 0.0)))
+                added += 1
+        return added
+
+    @classmethod
+    def from_records(cls, portfolios: Iterable[dict]) -> "PortfolioTable":
+        table = cls()
+        table.extend_records(portfolios)
+        return table
+
+    def rate_vector(self, base: str, rates: dict[str, float]) -> array:
+        # Курс каждой валюты к base; NaN, если курса нет
+        base = base.strip().upper()
+        vec = array("d")
+        for code in self._codes:
+            r = cross_rate(rates, code, base)
+            vec.append(math.nan if r is None else r)
+        return vec
+
+    def valuate(
+        self,
+        base: str,
+        rates: dict[str, float],
+        strict: bool = True,
+    ) -> dict[int, float]:
+        # Стоимость всех портфелей в base за один проход по массивам
+        vec = self.rate_vector(base, rates)
+        if strict:
+            used = set(self.currency_idx)
+            missing = [self._codes[i] for i in used if math.isnan(vec[i])]
+            if missing:
+                raise ValueError(
+                    f"Не удалось получить курс для {', '.join(sorted(missing))}"
+                    f"→{base.upper()}"
+                )
+
+        totals: dict[int, float] = {}
+        get = totals.get
+        rows = zip(self.user_ids, self.currency_idx, self.balances, strict=True)
+        for uid, idx, bal in rows:
+            value = bal * vec[idx]
+            if value != value:  # NaN в нестрогом режиме пропускаем
+                value = 0.0
+            totals[uid] = get(uid, 0.0) + value
+        return totals
+
+    def rows(self, user_id: int) -> Iterator[tuple[str, float]]:
+        # (код, баланс) одного пользователя
+        uid = int(user_id)
+        for i, u in enumerate(self.user_ids):
+            if u == uid:
+                yield self._codes[self.currency_idx[i]], self.balances[i]
+
+    def to_portfolio(self, user_id: int) -> Portfolio:
+        wallets = {code: Wallet(code, bal) for code, bal in self.rows(user_id)}
+        return Portfolio(user_id, wallets)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import csv
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+from ..infra.jsonstream import iter_chunks
+from .portfolio_table import PortfolioTable
+
+try:  # POSIX
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+# Снимок курсов, общий для всех задач процесса-воркера
+_worker_pairs: dict[str, float] = {}
+_worker_bases: tuple[str, ...] = ()
+
+
+def _init_worker(pairs: dict[str, float], bases: tuple[str, ...]) -> None:
+    # Снимок курсов передаётся в воркер один раз, а не с каждым куском
+    global _worker_pairs, _worker_bases
+    _worker_pairs = pairs
+    _worker_bases = bases
+
+
+def value_chunk(
+    chunk: list[dict],
+    pairs: dict[str, float] | None = None,
+    bases: tuple[str, ...] | None = None,
+) -> list[tuple[int, list[float], bool]]:
+    # Кусок портфелей -> (user_id, [стоимость в каждой базе], полнота курсов)
+    pairs = _worker_pairs if pairs is None else pairs
+    bases = _worker_bases if bases is None else bases
+    table = PortfolioTable.from_records(chunk)
+
+    incomplete: set[int] = set()
+    by_base = []
+    for base in bases:
+        vec = table.rate_vector(base, pairs)
+        missing = {i for i, r in enumerate(vec) if math.isnan(r)}
+        if missing:
+            for uid, idx in zip(table.user_ids, table.currency_idx, strict=True):
+                if idx in missing:
+                    incomplete.add(uid)
+        by_base.append(table.valuate(base, pairs, strict=False))
+
+    rows = []
+    for p in chunk:
+        uid = int(p["user_id"])
+        rows.append((uid, [v.get(uid, 0.0) for v in by_base], uid not in incomplete))
+    return rows
+
+
+def _rss_mb() -> float:
+    # Пиковый RSS процесса (Linux: КБ, macOS: байты); без resource — 0
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_report(
+    portfolios: Iterable[dict],
+    pairs: dict[str, float],
+    bases: tuple[str, ...],
+    out_path: Path,
+    chunk_size: int = 5000,
+    workers: int | None = None,
+    progress: Callable[[int, float], None] | None = None,
+) -> int:
+    """
+    Оценка всех портфелей в нескольких базах с записью CSV по мере готовности.
+    Портфели читаются потоком, в работе не больше 2*workers кусков,
+    поэтому память ограничена независимо от числа пользователей.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_inflight = workers * 2
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+
+    done = 0
+    chunks = iter_chunks(portfolios, chunk_size)
+    with (
+        tmp.open("w", newline="", encoding="utf-8") as f,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(pairs, bases),
+        ) as pool,
+    ):
+        writer = csv.writer(f)
+        writer.writerow(["user_id", *(f"value_{b}" for b in bases), "complete"])
+
+        inflight: deque[Future] = deque()
+
+        def drain_one() -> None:
+            nonlocal done
+            rows = inflight.popleft().result()
+            for uid, values, complete in rows:
+                writer.writerow([uid, *(f"{v:.2f}" for v in values), int(complete)])
+            done += len(rows)
+            if progress is not None:
+                progress(done, _rss_mb())
+
+        # Порядок строк совпадает с порядком в portfolios.json
+        for chunk in chunks:
+            inflight.append(pool.submit(value_chunk, chunk))
+            if len(inflight) >= max_inflight:
+                drain_one()
+        while inflight:
+            drain_one()
+
+    tmp.replace(out_path)
+    return done
@@ -1,14 +1,36 @@
 from __future__ import annotations
 
+import logging
 import secrets
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterable
 
 from ..decorators import log_action
 from ..infra.database import DatabaseManager
+from ..infra.ledger import TradeLedger
+from ..infra.rates_snapshot import RatesSnapshotReader
+from ..infra.sessions import SessionStore
 from ..infra.settings import SettingsLoader
-from .exceptions import ApiRequestError
-from .models import Wallet, _hash_password
-from .utils import is_rate_fresh, make_pair, validate_amount, validate_currency_code
+from . import bulk
+from .alerts import ABOVE, BELOW, AlertEngine
+from .exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+)
+from .leaderboard import Leaderboard
+from .models import Portfolio, _hash_password
+from .orders import BUY, SELL, OrderBook
+from .report import run_report
+from .utils import (
+    is_epoch_fresh,
+    is_rate_fresh,
+    make_pair,
+    parse_duration,
+    parse_iso,
+    validate_amount,
+    validate_currency_code,
+)
 
 # Сессия в памяти
 _current_user_id: int | None = None
@@ -17,6 +39,33 @@ _current_username: str | None = None
 _db = DatabaseManager()
 _settings = SettingsLoader()
 
+# Индекс активных алертов и mtime alerts.json, по которому он построен
+_alert_engine: AlertEngine | None = None
+_alerts_seen: int | None = None
+# Книга лимитных заявок и mtime orders.json, по которому она построена
+_order_book: OrderBook | None = None
+_orders_seen: int | None = None
+
+# Рейтинги по базовым валютам и mtime файлов, которые в них уже учтены
+_leaderboards: dict[str, Leaderboard] = {}
+_lb_seen: dict[str, int | None] = {}
+_usernames: tuple[int | None, dict[int, str]] = (None, {})
+
+# Бинарный снимок курсов (mmap), если Parser Service его опубликовал
+_rates_bin = RatesSnapshotReader(_db.rates_bin_path)
+
+# Сохранённые сессии для коротких процессов (login --session)
+_sessions = SessionStore(
+    _db.data_dir / "sessions",
+    ttl_seconds=float(_settings.get("SESSION_TTL_SECONDS", 12 * 3600)),
+)
+
+# Журнал сделок
+_ledger = TradeLedger(
+    _db.ledger_dir,
+    snapshot_every=int(_settings.get("LEDGER_SNAPSHOT_EVERY", 1000)),
+)
+
 
 def _next_user_id(users: list[dict]) -> int:
     if not users:
@@ -24,30 +73,75 @@ def _next_user_id(users: list[dict]) -> int:
     return max(int(u["user_id"]) for u in users) + 1
 
 
-def _find_user_by_username(users: list[dict], username: str) -> dict | None:
+def _find_user_by_username(users: Iterable[dict], username: str) -> dict | None:
     for u in users:
         if u.get("username") == username:
             return u
     return None
 
 
-def _load_portfolio(user_id: int) -> dict | None:
-    portfolios = _db.read(_db.portfolios_path)
-    for p in portfolios:
+def _load_portfolio(user_id: int) -> Portfolio | None:
+    for p in _db.iter_records(_db.portfolios_path):
         if int(p.get("user_id")) == int(user_id):
-            return p
+            return Portfolio.from_dict(p)
     return None
 
 
-def _save_portfolio(user_id: int, wallets: dict) -> None:
+def _save_portfolio(portfolio: Portfolio) -> None:
+    # Вызывается под _db.lock(_db.portfolios_path) вместе с чтением портфеля
+    record = portfolio.to_dict()
+    fresh = _lb_is_fresh(_db.portfolios_path)
     portfolios = _db.read(_db.portfolios_path)
     for p in portfolios:
-        if int(p.get("user_id")) == int(user_id):
-            p["wallets"] = wallets
-            _db.write(_db.portfolios_path, portfolios)
-            return
-    portfolios.append({"user_id": user_id, "wallets": wallets})
+        if int(p.get("user_id")) == portfolio.user_id:
+            p["wallets"] = record["wallets"]
+            break
+    else:
+        portfolios.append(record)
     _db.write(_db.portfolios_path, portfolios)
+    _lb_portfolios_written(fresh, {portfolio.user_id: record["wallets"]})
+
+
+def _trade_entry(
+    user_id: int,
+    side: str,
+    code: str,
+    amount: float,
+    base: str,
+    rate: float | None,
+    order_id: int | None = None,
+) -> dict:
+    return {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "user_id": int(user_id),
+        "side": side,
+        "currency": code,
+        "amount": float(amount),
+        "base": base,
+        "rate": rate,
+        "order_id": order_id,
+    }
+
+
+def _open_ledger() -> None:
+    # Журнала ещё нет, а портфели есть — открываем его текущими остатками.
+    # Быстрая проверка без блокировок; окончательная — в create под
+    # блокировкой журнала, остатки читаются под блокировкой портфелей
+    if _ledger.path.exists():
+        return
+    with _db.lock(_db.portfolios_path):
+        _ledger.create(
+            _trade_entry(p["user_id"], "opening", code, float(w["balance"]), code, 1.0)
+            for p in _db.iter_records(_db.portfolios_path)
+            for code, w in (p.get("wallets") or {}).items()
+            if float(w.get("balance", 0.0)) > 0
+        )
+
+
+def _record_trades(entries: list[dict]) -> None:
+    seqs = _ledger.append(entries)
+    if seqs:
+        _ledger.maybe_snapshot(seqs[-1])
 
 
 @log_action("REGISTER")
@@ -58,26 +152,27 @@ def register(username: str, password: str) -> str:
     if len(password) < 4:
         raise ValueError("Пароль должен быть не короче 4 символов")
 
-    users = _db.read(_db.users_path)
-    if _find_user_by_username(users, username) is not None:
-        raise ValueError(f"Имя пользователя '{username}' уже занято")
-
-    user_id = _next_user_id(users)
     salt = secrets.token_hex(4)
     hashed = _hash_password(password, salt)
+    with _db.lock(_db.users_path):
+        users = _db.read(_db.users_path)
+        if _find_user_by_username(users, username) is not None:
+            raise ValueError(f"Имя пользователя '{username}' уже занято")
 
-    users.append(
-        {
-            "user_id": user_id,
-            "username": username,
-            "hashed_password": hashed,
-            "salt": salt,
-            "registration_date": datetime.now().isoformat(timespec="seconds"),
-        }
-    )
-    _db.write(_db.users_path, users)
+        user_id = _next_user_id(users)
+        users.append(
+            {
+                "user_id": user_id,
+                "username": username,
+                "hashed_password": hashed,
+                "salt": salt,
+                "registration_date": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+        _db.write(_db.users_path, users)
 
-    _save_portfolio(user_id, wallets={})
+    with _db.lock(_db.portfolios_path):
+        _save_portfolio(Portfolio(user_id))
 
     return (
         f"Пользователь '{username}' зарегистрирован (id={user_id}). "
@@ -86,9 +181,8 @@ def register(username: str, password: str) -> str:
 
 
 @log_action("LOGIN")
-def login(username: str, password: str) -> str:
-    users = _db.read(_db.users_path)
-    user = _find_user_by_username(users, username)
+def login(username: str, password: str, remember: bool = False) -> str:
+    user = _find_user_by_username(_db.iter_records(_db.users_path), username)
     if user is None:
         raise ValueError(f"Пользователь '{username}' не найден")
 
@@ -100,9 +194,35 @@ def login(username: str, password: str) -> str:
     _current_user_id = int(user["user_id"])
     _current_username = username
 
+    if remember:
+        token = _sessions.issue(_current_user_id, username)
+        return (
+            f"Вы вошли как '{username}'. Токен сессии для следующих запусков "
+            f"(--session или VALUTATRADE_SESSION):\n{token}"
+        )
     return f"Вы вошли как '{username}'"
 
 
+def resume_session(token: str) -> str:
+    # Вход по токену сессии: подпись, срок и отзыв, без users.json.
+    # Только сам токен — имя пользователя сессию не открывает
+    global _current_user_id, _current_username
+    _current_user_id, _current_username = _sessions.verify(token)
+    return _current_username
+
+
+@log_action("LOGOUT")
+def logout() -> str:
+    # Выход с отзывом сохранённой сессии
+    global _current_user_id, _current_username
+    require_login()
+    username = _current_username
+    _sessions.revoke(username)
+    _current_user_id = None
+    _current_username = None
+    return f"Вы вышли из '{username}'"
+
+
 def require_login() -> None:
     if _current_user_id is None:
         raise PermissionError("Сначала выполните login")
@@ -132,6 +252,22 @@ def get_rate(from_code: str, to_code: str) -> dict:
     ttl = int(_settings.get("RATES_TTL_SECONDS", 300))
     key = make_pair(f, t)
 
+    # Быстрый путь: бинарный поиск в mmap-снимке, свежесть — сравнение чисел
+    hit = _rates_bin.lookup(key)
+    if hit is not None:
+        rate, updated, source = hit
+        if not is_epoch_fresh(updated, ttl):
+            raise ApiRequestError("Данные в кеше устарели. Выполните 'update-rates'.")
+        return {
+            "from": f,
+            "to": t,
+            "rate": rate,
+            "updated_at": datetime.fromtimestamp(updated, timezone.utc)
+            .isoformat()
+            .replace("+00:00", "Z"),
+            "source": source,
+        }
+
     data = _db.read(_db.rates_path)
     pairs = data.get("pairs", {}) if isinstance(data, dict) else {}
     entry = pairs.get(key) if isinstance(pairs, dict) else None
@@ -156,30 +292,34 @@ def get_rate(from_code: str, to_code: str) -> dict:
 @log_action("BUY", verbose=True)
 def buy(currency_code: str, amount, base: str = "USD") -> dict:
     require_login()
+    _open_ledger()
 
     code = validate_currency_code(currency_code)  # CurrencyNotFoundError
     amt = validate_amount(amount)
     base = validate_currency_code(base)
 
-    raw = _load_portfolio(_current_user_id) or {
-        "user_id": _current_user_id,
-        "wallets": {},
-    }
-    wallets = raw["wallets"]
-
-    if code not in wallets:
-        wallets[code] = {"balance": 0.0}
+    # Чтение и запись портфеля под одной блокировкой: иначе сделки
+    # параллельных процессов затирают друг друга
+    with _db.lock(_db.portfolios_path):
+        portfolio = _load_portfolio(_current_user_id) or Portfolio(_current_user_id)
+        w = portfolio.get_wallet(code) or portfolio.add_currency(code)
 
-    before = float(wallets[code]["balance"])
-    w = Wallet(currency_code=code, balance=before)
-    w.deposit(amt)
-    after = w.balance
-    wallets[code]["balance"] = after
+        before = w.balance
+        w.deposit(amt)
+        after = w.balance
 
-    _save_portfolio(_current_user_id, wallets)
+        _save_portfolio(portfolio)
 
-    # Оценка стоимости
-    rate_info = get_rate(code, base)
+        # Оценка стоимости; сделка попадает в журнал, даже если курс недоступен.
+        # Запись журнала — после записи портфеля и под той же блокировкой
+        rate = None
+        try:
+            rate_info = get_rate(code, base)
+            rate = rate_info["rate"]
+        finally:
+            _record_trades(
+                [_trade_entry(_current_user_id, "buy", code, amt, base, rate)]
+            )
     est = amt * rate_info["rate"]
 
     return {
@@ -195,31 +335,38 @@ def buy(currency_code: str, amount, base: str = "USD") -> dict:
 @log_action("SELL", verbose=True)
 def sell(currency_code: str, amount, base: str = "USD") -> dict:
     require_login()
+    _open_ledger()
 
     code = validate_currency_code(currency_code)
     amt = validate_amount(amount)
     base = validate_currency_code(base)
 
-    raw = _load_portfolio(_current_user_id)
-    if raw is None or not raw.get("wallets") or code not in raw["wallets"]:
-        raise ValueError(
-            f"У вас нет кошелька '{code}'. "
-            "Добавьте валюту: она создаётся автоматически "
-            "при первой покупке."
-        )
-
-    wallets = raw["wallets"]
-    before = float(wallets[code]["balance"])
+    with _db.lock(_db.portfolios_path):
+        portfolio = _load_portfolio(_current_user_id)
+        w = portfolio.get_wallet(code) if portfolio is not None else None
+        if w is None:
+            raise ValueError(
+                f"У вас нет кошелька '{code}'. "
+                "Добавьте валюту: она создаётся автоматически "
+                "при первой покупке."
+            )
 
-    w = Wallet(currency_code=code, balance=before)
-    w.withdraw(amt)  # может бросить InsufficientFundsError
-    after = w.balance
-    wallets[code]["balance"] = after
+        before = w.balance
+        w.withdraw(amt)  # может бросить InsufficientFundsError
+        after = w.balance
 
-    _save_portfolio(_current_user_id, wallets)
+        _save_portfolio(portfolio)
 
-    # Оценка выручки
-    rate_info = get_rate(code, base)
+        # Оценка выручки; сделка попадает в журнал, даже если курс недоступен.
+        # Запись журнала — после записи портфеля и под той же блокировкой
+        rate = None
+        try:
+            rate_info = get_rate(code, base)
+            rate = rate_info["rate"]
+        finally:
+            _record_trades(
+                [_trade_entry(_current_user_id, "sell", code, amt, base, rate)]
+            )
     est = amt * rate_info["rate"]
 
     return {
@@ -236,8 +383,8 @@ def show_portfolio(base: str = "USD") -> dict:
     require_login()
     base = validate_currency_code(base)
 
-    raw = _load_portfolio(_current_user_id)
-    if raw is None or not raw.get("wallets"):
+    portfolio = _load_portfolio(_current_user_id)
+    if portfolio is None or not portfolio.wallets:
         return {
             "username": _current_username,
             "base": base,
@@ -245,13 +392,12 @@ def show_portfolio(base: str = "USD") -> dict:
             "total": 0.0,
         }
 
-    wallets = raw["wallets"]
     rows = []
     total = 0.0
 
-    for code, payload in wallets.items():
+    for code, wallet in portfolio.wallets.items():
         code = validate_currency_code(code)
-        bal = float(payload.get("balance", 0.0))
+        bal = wallet.balance
 
         if code == base:
             value_base = bal
@@ -263,3 +409,798 @@ def show_portfolio(base: str = "USD") -> dict:
         total += value_base
 
     return {"username": _current_username, "base": base, "rows": rows, "total": total}
+
+
+def _get_alert_engine() -> AlertEngine:
+    # Перестраиваем индекс, если alerts.json менял другой процесс
+    global _alert_engine, _alerts_seen
+    mtime = _mtime_ns(_db.alerts_path)
+    if _alert_engine is None or mtime != _alerts_seen:
+        engine = AlertEngine()
+        engine.load(_db.read(_db.alerts_path))
+        _alert_engine, _alerts_seen = engine, mtime
+    return _alert_engine
+
+
+def _write_alerts(alerts: list[dict]) -> None:
+    # Своя запись не требует перестройки индекса
+    global _alerts_seen
+    _db.write(_db.alerts_path, alerts)
+    _alerts_seen = _mtime_ns(_db.alerts_path)
+
+
+@log_action("ALERT_ADD")
+def add_alert(
+    currency_code: str,
+    threshold,
+    direction: str,
+    base: str = "USD",
+) -> dict:
+    require_login()
+
+    code = validate_currency_code(currency_code)
+    base = validate_currency_code(base)
+    if code == base:
+        raise ValueError("Валюта алерта и база должны различаться")
+    direction = str(direction).strip().lower()
+    if direction not in (ABOVE, BELOW):
+        raise ValueError("Укажите --above или --below")
+    thr = validate_amount(threshold)
+
+    with _db.lock(_db.alerts_path):
+        engine = _get_alert_engine()
+        alerts = _db.read(_db.alerts_path)
+        alert = {
+            "id": max((int(a["id"]) for a in alerts), default=0) + 1,
+            "user_id": _current_user_id,
+            "pair": make_pair(code, base),
+            "direction": direction,
+            "threshold": thr,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "triggered_at": None,
+            "triggered_rate": None,
+        }
+        alerts.append(alert)
+        _write_alerts(alerts)
+        engine.add(alert)
+    return alert
+
+
+def list_alerts() -> list[dict]:
+    require_login()
+    alerts = _db.read(_db.alerts_path)
+    return [a for a in alerts if int(a["user_id"]) == _current_user_id]
+
+
+@log_action("ALERT_REMOVE")
+def remove_alert(alert_id) -> None:
+    require_login()
+    try:
+        aid = int(alert_id)
+    except (TypeError, ValueError) as err:
+        raise ValueError("--id должен быть числом") from err
+
+    with _db.lock(_db.alerts_path):
+        engine = _get_alert_engine()
+        alerts = _db.read(_db.alerts_path)
+        kept = [
+            a
+            for a in alerts
+            if not (int(a["id"]) == aid and int(a["user_id"]) == _current_user_id)
+        ]
+        if len(kept) == len(alerts):
+            raise ValueError(f"Алерт #{aid} не найден")
+        _write_alerts(kept)
+        engine.remove(aid)
+
+
+def on_rates_changed(event) -> list[dict]:
+    # Подписчик шины курсов: помечаем сработавшие алерты одной записью
+    moves = getattr(event, "moves", {})
+    if not moves:
+        return []
+
+    ts = datetime.now().isoformat(timespec="seconds")
+    with _db.lock(_db.alerts_path):
+        fired = _get_alert_engine().on_moves(moves)
+        if not fired:
+            return []
+        alerts = _db.read(_db.alerts_path)
+        triggered = []
+        for a in alerts:
+            hit = fired.get(int(a["id"]))
+            # Уже сработавший (в другом процессе) алерт не перезаписываем
+            if hit is None or a.get("triggered_at") is not None:
+                continue
+            a["triggered_at"] = ts
+            a["triggered_rate"] = hit[1]
+            triggered.append(a)
+        if triggered:
+            _write_alerts(alerts)
+
+    logger = logging.getLogger(__name__)
+    for a in triggered:
+        logger.info(
+            f"{ts} ALERT user_id={a['user_id']} pair={a['pair']} "
+            f"{a['direction']} {a['threshold']} rate={a['triggered_rate']}"
+        )
+    return triggered
+
+
+def _get_order_book() -> OrderBook:
+    # Перестраиваем книгу, если orders.json менял другой процесс
+    global _order_book, _orders_seen
+    mtime = _mtime_ns(_db.orders_path)
+    if _order_book is None or mtime != _orders_seen:
+        book = OrderBook()
+        book.load(_db.read(_db.orders_path))
+        _order_book, _orders_seen = book, mtime
+    return _order_book
+
+
+def _write_orders(orders: list[dict]) -> None:
+    # Своя запись не требует перестройки книги
+    global _orders_seen
+    _db.write(_db.orders_path, orders)
+    _orders_seen = _mtime_ns(_db.orders_path)
+
+
+@log_action("ORDER_PLACE")
+def place_order(
+    side: str,
+    currency_code: str,
+    limit,
+    amount,
+    base: str = "USD",
+) -> dict:
+    require_login()
+
+    side = str(side).strip().lower()
+    if side not in (BUY, SELL):
+        raise ValueError("--side должен быть buy или sell")
+    code = validate_currency_code(currency_code)
+    base = validate_currency_code(base)
+    if code == base:
+        raise ValueError("Валюта заявки и база должны различаться")
+    lim = validate_amount(limit)
+    amt = validate_amount(amount)
+
+    with _db.lock(_db.orders_path):
+        book = _get_order_book()
+        orders = _db.read(_db.orders_path)
+        order = {
+            "id": max((int(o["id"]) for o in orders), default=0) + 1,
+            "user_id": _current_user_id,
+            "pair": make_pair(code, base),
+            "currency": code,
+            "side": side,
+            "limit": lim,
+            "amount": amt,
+            "status": "open",
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "filled_at": None,
+            "fill_rate": None,
+            "reason": None,
+        }
+        orders.append(order)
+        _write_orders(orders)
+        book.add(order)
+    return order
+
+
+def list_orders() -> list[dict]:
+    require_login()
+    orders = _db.read(_db.orders_path)
+    return [o for o in orders if int(o["user_id"]) == _current_user_id]
+
+
+@log_action("ORDER_CANCEL")
+def cancel_order(order_id) -> None:
+    require_login()
+    try:
+        oid = int(order_id)
+    except (TypeError, ValueError) as err:
+        raise ValueError("--id должен быть числом") from err
+
+    with _db.lock(_db.orders_path):
+        book = _get_order_book()
+        orders = _db.read(_db.orders_path)
+        for o in orders:
+            if int(o["id"]) == oid and int(o["user_id"]) == _current_user_id:
+                if o["status"] != "open":
+                    raise ValueError(f"Заявка #{oid} уже {o['status']}")
+                o["status"] = "cancelled"
+                _write_orders(orders)
+                book.cancel(oid)
+                return
+    raise ValueError(f"Заявка #{oid} не найдена")
+
+
+def match_orders(event) -> list[dict]:
+    # Подписчик шины курсов: исполняем пересечённые заявки пакетно
+    moves = getattr(event, "moves", {})
+    if not moves:
+        return []
+
+    _open_ledger()
+    ts = datetime.now().isoformat(timespec="seconds")
+    done: list[dict] = []
+    fills: list[dict] = []
+    # Статус перечитывается под той же блокировкой, что и запись исполнения:
+    # заявку, отменённую или исполненную другим процессом, не трогаем
+    with _db.lock(_db.orders_path):
+        book = _get_order_book()
+        crossed: dict[int, float] = {}
+        for pair, (_, new) in moves.items():
+            for oid in book.match(pair, new):
+                crossed[oid] = float(new)
+        if not crossed:
+            return []
+
+        # Порядок блокировок: заявки, затем портфели
+        with _db.lock(_db.portfolios_path):
+            fresh = _lb_is_fresh(_db.portfolios_path)
+            orders = _db.read(_db.orders_path)
+            records = _db.read(_db.portfolios_path)
+            by_user = {int(p["user_id"]): p for p in records}
+            portfolios: dict[int, Portfolio] = {}
+            for o in sorted(orders, key=lambda x: int(x["id"])):
+                rate = crossed.get(int(o["id"]))
+                # Закрытые заявки (отменены другим процессом) книга уже выкинула
+                if rate is None or o.get("status") != "open":
+                    continue
+                uid = int(o["user_id"])
+                portfolio = portfolios.get(uid)
+                if portfolio is None:
+                    raw = by_user.get(uid)
+                    portfolio = Portfolio.from_dict(raw) if raw else Portfolio(uid)
+                    portfolios[uid] = portfolio
+                code = o["currency"]
+                w = portfolio.get_wallet(code) or portfolio.add_currency(code)
+                try:
+                    if o["side"] == BUY:
+                        w.deposit(o["amount"])
+                    else:
+                        w.withdraw(o["amount"])
+                except InsufficientFundsError as e:
+                    o["status"] = "rejected"
+                    o["reason"] = str(e)
+                    done.append(o)
+                    continue
+                o["status"] = "filled"
+                o["filled_at"] = ts
+                o["fill_rate"] = rate
+                done.append(o)
+                base = o["pair"].split("_", 1)[1]
+                fills.append(
+                    _trade_entry(uid, o["side"], code, o["amount"], base, rate, o["id"])
+                )
+
+            if done:
+                # Одна запись портфелей и заявок на весь пакет исполнений
+                changed = {}
+                for uid, portfolio in portfolios.items():
+                    record = portfolio.to_dict()
+                    if uid in by_user:
+                        by_user[uid]["wallets"] = record["wallets"]
+                    else:
+                        records.append(record)
+                    changed[uid] = record["wallets"]
+                _db.write(_db.portfolios_path, records)
+                _lb_portfolios_written(fresh, changed)
+                _write_orders(orders)
+                _record_trades(fills)
+
+    logger = logging.getLogger(__name__)
+    for o in done:
+        logger.info(
+            f"{ts} ORDER_{o['status'].upper()} user_id={o['user_id']} "
+            f"order_id={o['id']} {o['side']} {o['amount']} {o['pair']} "
+            f"limit={o['limit']} rate={o['fill_rate']}"
+        )
+    return done
+
+
+def handle_rates_changed(event) -> tuple[list[dict], list[dict]]:
+    # Все подписчики курсов разом — для CLI и для процесса планировщика:
+    # (сработавшие алерты, исполненные или отклонённые заявки)
+    triggered = on_rates_changed(event)
+    update_leaderboards(event)
+    return triggered, match_orders(event)
+
+
+def _resolve_user_id(username: str | None) -> tuple[int, str]:
+    # Сделки и P&L видны только их владельцу: --user лишь уточняет себя
+    require_login()
+    if username and username != _current_username:
+        raise PermissionError("Можно смотреть только собственные сделки")
+    return _current_user_id, _current_username
+
+
+def trade_history(username: str | None = None, since: str | None = None) -> dict:
+    uid, name = _resolve_user_id(username)
+    if since:
+        # Нормализуем к формату ts журнала (локальное время без зоны)
+        since = parse_iso(since).astimezone().replace(tzinfo=None)
+        since = since.isoformat(timespec="seconds")
+    rows = [e for e in _ledger.user_entries(uid, since) if e["side"] != "opening"]
+    return {"username": name, "rows": rows}
+
+
+def profit_and_loss(username: str | None = None, base: str = "USD") -> dict:
+    # Средняя цена покупки: реализованный и нереализованный P&L в base
+    uid, name = _resolve_user_id(username)
+    base = validate_currency_code(base)
+
+    positions: dict[str, dict[str, float]] = {}
+    for e in _ledger.user_entries(uid):
+        if e["side"] == "opening" or e.get("base") != base or e.get("rate") is None:
+            continue
+        pos = positions.setdefault(
+            e["currency"], {"qty": 0.0, "cost": 0.0, "realized": 0.0}
+        )
+        amt, rate = float(e["amount"]), float(e["rate"])
+        if e["side"] == "buy":
+            pos["qty"] += amt
+            pos["cost"] += amt * rate
+        else:
+            avg = pos["cost"] / pos["qty"] if pos["qty"] > 0 else rate
+            sold = min(amt, pos["qty"])
+            pos["realized"] += sold * (rate - avg)
+            pos["qty"] -= sold
+            pos["cost"] -= sold * avg
+
+    rows = []
+    total_realized = total_unrealized = 0.0
+    for code, pos in sorted(positions.items()):
+        unrealized = 0.0
+        if pos["qty"] > 0:
+            unrealized = pos["qty"] * get_rate(code, base)["rate"] - pos["cost"]
+        rows.append((code, pos["qty"], pos["realized"], unrealized))
+        total_realized += pos["realized"]
+        total_unrealized += unrealized
+
+    return {
+        "username": name,
+        "base": base,
+        "rows": rows,
+        "realized": total_realized,
+        "unrealized": total_unrealized,
+    }
+
+
+def rebuild_portfolios(write: bool = False) -> list[dict]:
+    # Портфели из журнала сделок + снимка
+    if not write:
+        return _ledger.rebuild_portfolios()
+    with _db.lock(_db.portfolios_path):
+        portfolios = _ledger.rebuild_portfolios()
+        _db.write(_db.portfolios_path, portfolios)
+    return portfolios
+
+
+# Предел точек кривой: мелкий шаг на длинном интервале не должен съесть память
+_CURVE_MAX_POINTS = 10_000
+
+
+def _ledger_epoch(ts: str) -> int:
+    # ts журнала — локальное время без зоны
+    return int(datetime.fromisoformat(ts).timestamp())
+
+
+def _holdings_at(user_id: int, times: list[int]) -> list[dict[str, float]]:
+    # Остатки на отсортированной сетке времени за один проход по журналу
+    entries = list(_ledger.user_entries(user_id))
+    if not entries:
+        portfolio = _load_portfolio(user_id) or Portfolio(user_id)
+        now = {c: w.balance for c, w in portfolio.wallets.items()}
+        return [now for _ in times]
+
+    epochs = [_ledger_epoch(e["ts"]) for e in entries]
+    out: list[dict[str, float]] = []
+    state: dict[str, float] = {}
+    i = 0
+    for t in times:
+        while i < len(entries) and epochs[i] <= t:
+            e = entries[i]
+            delta = float(e["amount"]) * (-1 if e["side"] == "sell" else 1)
+            state[e["currency"]] = state.get(e["currency"], 0.0) + delta
+            i += 1
+        out.append({c: b for c, b in state.items() if b > 0})
+    return out
+
+
+def _rates_on_grid(
+    history, code: str, base: str, times: list[int], resolution: int
+) -> list[float | None]:
+    # Курс code→base на сетке: прямая пара или кросс через USD
+    if code == base:
+        return [1.0] * len(times)
+    since = times[0] - max(resolution, 86400)
+    until = times[-1]
+
+    direct = history.series(make_pair(code, base), since, until, resolution)
+    if len(direct):
+        return direct.sample(times)
+
+    to_usd = history.series(make_pair(code, "USD"), since, until, resolution)
+    values = to_usd.sample(times)
+    if base == "USD":
+        return values
+    base_usd = history.series(make_pair(base, "USD"), since, until, resolution)
+    return [
+        a / b if a is not None and b else None
+        for a, b in zip(values, base_usd.sample(times), strict=True)
+    ]
+
+
+def _rate_at(history, code: str, base: str, t: int) -> float | None:
+    # Курс на момент t по всей истории (дневные бары): прямая пара или кросс через USD
+    rate = history.rate_at(make_pair(code, base), t)
+    if rate is not None:
+        return rate
+    to_usd = 1.0 if code == "USD" else history.rate_at(make_pair(code, "USD"), t)
+    base_usd = 1.0 if base == "USD" else history.rate_at(make_pair(base, "USD"), t)
+    if to_usd is None or not base_usd:
+        return None
+    return to_usd / base_usd
+
+
+def show_portfolio_at(at: str, history, base: str = "USD") -> dict:
+    # Стоимость портфеля на момент at по исторической цене
+    require_login()
+    base = validate_currency_code(base)
+    t = int(parse_iso(at).timestamp())
+
+    holdings = _holdings_at(_current_user_id, [t])[0]
+    rows = []
+    total = 0.0
+    for code, bal in sorted(holdings.items()):
+        if code == base:
+            rate = 1.0
+        else:
+            rate = _rates_on_grid(history, code, base, [t], 0)[0]
+            if rate is None:
+                # В окне сырых точек пусто — берём дневные бары за всю историю
+                rate = _rate_at(history, code, base, t)
+        if rate is None:
+            raise ApiRequestError(f"Нет исторического курса {code}→{base} на {at}")
+        rows.append((code, bal, bal * rate))
+        total += bal * rate
+
+    return {
+        "username": _current_username,
+        "base": base,
+        "rows": rows,
+        "total": total,
+        "at": at,
+    }
+
+
+def portfolio_curve(
+    since: str,
+    history,
+    step: str = "1h",
+    until: str | None = None,
+    base: str = "USD",
+) -> dict:
+    # Кривая стоимости портфеля: одна выборка ряда на валюту, без поиска на точку
+    require_login()
+    base = validate_currency_code(base)
+    step_s = parse_duration(step)
+    start = int(parse_iso(since).timestamp())
+    end = int(parse_iso(until).timestamp() if until else datetime.now().timestamp())
+    if end < start:
+        raise ValueError("--until раньше --since")
+    count = (end - start) // step_s + 1
+    if count > _CURVE_MAX_POINTS:
+        raise ValueError(
+            f"Слишком мелкий --step: {count} точек, максимум {_CURVE_MAX_POINTS}"
+        )
+    times = list(range(start, end + 1, step_s))
+
+    holdings = _holdings_at(_current_user_id, times)
+    codes = sorted({c for h in holdings for c in h})
+    grids = {c: _rates_on_grid(history, c, base, times, step_s) for c in codes}
+
+    points = []
+    for k, t in enumerate(times):
+        value = 0.0
+        complete = True
+        for code, bal in holdings[k].items():
+            rate = grids[code][k]
+            if rate is None:
+                complete = False
+                continue
+            value += bal * rate
+        points.append((t, value, complete))
+
+    return {"username": _current_username, "base": base, "points": points}
+
+
+def _mtime_ns(path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _lb_is_fresh(path) -> bool:
+    # Рейтинги видели последнюю версию файла (никто другой не писал)
+    return bool(_leaderboards) and _lb_seen.get(str(path)) == _mtime_ns(path)
+
+
+def _lb_portfolios_written(fresh: bool, changed: dict[int, dict]) -> None:
+    # Наша запись портфелей: пересчитываем только изменённых пользователей
+    if not _leaderboards:
+        return
+    if not fresh:
+        # Файл менял другой процесс — полная пересборка при следующем запросе
+        _lb_seen.pop(str(_db.portfolios_path), None)
+        return
+    for board in _leaderboards.values():
+        for uid, wallets in changed.items():
+            board.update_user(uid, wallets)
+    _lb_seen[str(_db.portfolios_path)] = _mtime_ns(_db.portfolios_path)
+
+
+def _rates_pairs() -> dict[str, dict]:
+    data = _db.read(_db.rates_path)
+    pairs = data.get("pairs", {}) if isinstance(data, dict) else {}
+    return pairs if isinstance(pairs, dict) else {}
+
+
+def _lb_sync() -> None:
+    # Догоняем изменения файлов, сделанные другими процессами
+    p_path, r_path = _db.portfolios_path, _db.rates_path
+    if _lb_seen.get(str(p_path)) != _mtime_ns(p_path):
+        pairs = _rates_pairs()
+        for board in _leaderboards.values():
+            board.load(_db.iter_records(p_path), pairs)
+        _lb_seen[str(p_path)] = _mtime_ns(p_path)
+        _lb_seen[str(r_path)] = _mtime_ns(r_path)
+        return
+    if _lb_seen.get(str(r_path)) != _mtime_ns(r_path):
+        pairs = {k: float(v["rate"]) for k, v in _rates_pairs().items()}
+        for board in _leaderboards.values():
+            board.sync_pairs(pairs)
+        _lb_seen[str(r_path)] = _mtime_ns(r_path)
+
+
+def update_leaderboards(event) -> int:
+    # Подписчик шины курсов: пересчёт только держателей изменённых валют
+    if not _leaderboards:
+        return 0
+    changed = {pair: new for pair, (_, new) in getattr(event, "moves", {}).items()}
+    return sum(board.update_pairs(changed) for board in _leaderboards.values())
+
+
+def apply_external_rates(event) -> int:
+    # Курсы записал другой процесс (событие RatesVersionWatcher): новые курсы
+    # пар события берём из mmap-снимка, rates.json целиком не разбираем
+    r_path = _db.rates_path
+    if not _leaderboards or _lb_seen.get(str(r_path)) is None:
+        return 0
+    mtime = _mtime_ns(r_path)
+    hits = {} if event.full else {p: _rates_bin.lookup(p) for p in event.pairs}
+    if event.full or None in hits.values():
+        # Пропущены версии или пары нет в снимке — полная сверка при запросе
+        _lb_seen.pop(str(r_path), None)
+        return 0
+    changed = {pair: hit[0] for pair, hit in hits.items()}
+    n = sum(board.update_pairs(changed) for board in _leaderboards.values())
+    _lb_seen[str(r_path)] = mtime
+    return n
+
+
+def _username_map() -> dict[int, str]:
+    global _usernames
+    mtime = _mtime_ns(_db.users_path)
+    if _usernames[0] != mtime:
+        users = _db.iter_records(_db.users_path)
+        _usernames = (mtime, {int(u["user_id"]): u["username"] for u in users})
+    return _usernames[1]
+
+
+def leaderboard(base: str = "USD", top: int = 10) -> dict:
+    base = validate_currency_code(base)
+    if base not in _leaderboards:
+        _leaderboards[base] = Leaderboard(base)
+        # Новая база: полная сборка через sync
+        _lb_seen.pop(str(_db.portfolios_path), None)
+    _lb_sync()
+
+    board = _leaderboards[base]
+    names = _username_map()
+    rows = [
+        (i + 1, names.get(uid, f"#{uid}"), value)
+        for i, (uid, value) in enumerate(board.top(top))
+    ]
+    me = board.position(_current_user_id) if _current_user_id else None
+    return {"base": base, "rows": rows, "me": me, "total_users": len(board)}
+
+
+def portfolio_report(
+    bases: str,
+    out: str,
+    chunk_size=5000,
+    workers=None,
+    progress=None,
+) -> dict:
+    # Оценка всех портфелей в нескольких базах по одному снимку курсов
+    codes = tuple(
+        dict.fromkeys(validate_currency_code(b) for b in bases.split(",") if b)
+    )
+    if not codes:
+        raise ValueError("Укажите хотя бы одну базовую валюту в --bases")
+    try:
+        chunk_size = int(chunk_size)
+        workers = int(workers) if workers else None
+    except (TypeError, ValueError) as err:
+        raise ValueError("--chunk и --workers должны быть числами") from err
+    if chunk_size <= 0 or (workers is not None and workers <= 0):
+        raise ValueError("--chunk и --workers должны быть положительными")
+
+    pairs = {k: float(v["rate"]) for k, v in _rates_pairs().items()}
+    users = run_report(
+        _db.iter_records(_db.portfolios_path),
+        pairs,
+        codes,
+        out,
+        chunk_size=chunk_size,
+        workers=workers,
+        progress=progress,
+    )
+    return {"users": users, "bases": codes, "out": out}
+
+
+# --- массовый импорт и выгрузка ---
+
+_IMPORT_MAX_ERRORS = 20
+
+
+def _import_error(report: dict, n: int, err: Exception) -> None:
+    report["skipped"] += 1
+    if len(report["errors"]) < _IMPORT_MAX_ERRORS:
+        report["errors"].append(f"запись {n}: {err}")
+
+
+def import_users(path: str) -> dict:
+    # users.json и portfolios.json переписываются один раз, потоково
+    report = {"imported": 0, "skipped": 0, "errors": []}
+    names: set[str] = set()
+    last_id = 0
+    with (
+        _db.lock(_db.users_path),
+        _db.lock(_db.portfolios_path),
+        _db.array_writer(_db.users_path) as users_out,
+        _db.array_writer(_db.portfolios_path) as portfolios_out,
+    ):
+        for u in _db.iter_records(_db.users_path):
+            names.add(u["username"])
+            last_id = max(last_id, int(u["user_id"]))
+            users_out.write(u)
+        for p in _db.iter_records(_db.portfolios_path):
+            portfolios_out.write(p)
+
+        for n, row in bulk.read_rows(path):
+            try:
+                user = bulk.parse_user(row)
+                if user["username"] in names:
+                    raise ValueError(f"имя '{user['username']}' уже занято")
+            except (ValueError, TypeError) as err:
+                _import_error(report, n, err)
+                continue
+            last_id += 1
+            names.add(user["username"])
+            users_out.write({"user_id": last_id, **user})
+            portfolios_out.write({"user_id": last_id, "wallets": {}})
+            report["imported"] += 1
+    return report
+
+
+def _merge_portfolios(updates: dict[int, dict[str, float]]) -> list[dict]:
+    # Один потоковый проход по portfolios.json; возвращает записи журнала.
+    # Вызывается под блокировкой портфелей
+    entries: list[dict] = []
+    pending = dict(updates)
+
+    def apply(uid: int, wallets: dict) -> dict:
+        for code, balance in pending.pop(uid).items():
+            old = float(wallets.get(code, {}).get("balance", 0.0))
+            wallets[code] = {"balance": balance}
+            if balance != old:
+                entries.append(
+                    _trade_entry(uid, "opening", code, balance - old, code, 1.0)
+                )
+        return wallets
+
+    with _db.array_writer(_db.portfolios_path) as out:
+        for p in _db.iter_records(_db.portfolios_path):
+            uid = int(p["user_id"])
+            if uid in pending:
+                p["wallets"] = apply(uid, p.get("wallets") or {})
+            out.write(p)
+        for uid in sorted(pending):
+            out.write({"user_id": uid, "wallets": apply(uid, {})})
+    return entries
+
+
+def import_portfolios(path: str, batch_size: int = 200_000) -> dict:
+    # Строки (user_id|username, currency, balance) задают остаток кошелька
+    report = {"imported": 0, "skipped": 0, "errors": [], "users": 0}
+    ids: set[int] = set()
+    by_name: dict[str, int] = {}
+    for u in _db.iter_records(_db.users_path):
+        ids.add(int(u["user_id"]))
+        by_name[u["username"]] = int(u["user_id"])
+
+    _open_ledger()
+    touched: set[int] = set()
+    updates: dict[int, dict[str, float]] = {}
+    rows = 0
+
+    def flush() -> None:
+        nonlocal rows
+        if updates:
+            with _db.lock(_db.portfolios_path):
+                _record_trades(_merge_portfolios(updates))
+            updates.clear()
+            rows = 0
+
+    for n, row in bulk.read_rows(path):
+        try:
+            name = str(row.get("username") or "").strip()
+            if name:
+                if name not in by_name:
+                    raise ValueError(f"пользователь '{name}' не найден")
+                uid = by_name[name]
+            else:
+                uid = int(row.get("user_id"))
+                if uid not in ids:
+                    raise ValueError(f"пользователь id={uid} не найден")
+            code, balance = bulk.parse_balance(row)
+        except (ValueError, TypeError, CurrencyNotFoundError) as err:
+            _import_error(report, n, err)
+            continue
+        updates.setdefault(uid, {})[code] = balance
+        touched.add(uid)
+        report["imported"] += 1
+        rows += 1
+        if rows >= batch_size:
+            # Ограничиваем память: большой файл сливается несколькими проходами
+            flush()
+    flush()
+    report["users"] = len(touched)
+    return report
+
+
+def _export_portfolio_rows():
+    names = _username_map()
+    for p in _db.iter_records(_db.portfolios_path):
+        uid = int(p["user_id"])
+        for code, w in (p.get("wallets") or {}).items():
+            yield {
+                "user_id": uid,
+                "username": names.get(uid, ""),
+                "currency": code,
+                "balance": float(w.get("balance", 0.0)),
+            }
+
+
+def export_data(what: str, out: str) -> int:
+    # Потоковая выгрузка в csv/jsonl в формате, пригодном для import-*
+    if what == "users":
+        rows = _db.iter_records(_db.users_path)
+        return bulk.write_rows(out, bulk.USER_FIELDS, rows)
+    if what == "portfolios":
+        return bulk.write_rows(out, bulk.PORTFOLIO_FIELDS, _export_portfolio_rows())
+    raise ValueError("--what должен быть 'users' или 'portfolios'")
+
+
+def migrate_storage(codec: str) -> list[tuple[str, int, int]]:
+    # Перекодировать хранилища; дальнейшие записи идут в новом кодеке
+    report = _db.migrate(codec)
+    # Файлы переписаны — рейтинги пересоберутся при следующем обращении
+    _lb_seen.clear()
+    return [(path.name, before, after) for path, before, after in report]
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+from ..infra.codecs import codec_for_dir, dump_file, load_file
+from ..infra.jsonstream import is_blank_file
 from .currencies import get_currency
-from .exceptions import CurrencyNotFoundError
 
 # Папка с JSON-данными
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
@@ -19,10 +20,7 @@ def ensure_data_files() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     def _ensure(path: Path, default_text: str) -> None:
-        if not path.exists():
-            path.write_text(default_text, encoding="utf-8")
-            return
-        if path.read_text(encoding="utf-8").strip() == "":
+        if not path.exists() or is_blank_file(path):
             path.write_text(default_text, encoding="utf-8")
 
     _ensure(USERS_PATH, "[]")
@@ -31,16 +29,13 @@ def ensure_data_files() -> None:
 
 
 def load_json(path: Path):
-    # Читаем JSON
-    return json.loads(path.read_text(encoding="utf-8"))
+    # Читаем хранилище; формат (JSON или бинарный) — по заголовку
+    return load_file(path)
 
 
 def save_json(path: Path, data) -> None:
-    # Пишем JSON
-    path.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    # Пишем в кодеке каталога данных
+    dump_file(path, data, codec_for_dir(path.parent))
 
 
 def now_iso() -> str:
@@ -53,12 +48,8 @@ def now_iso() -> str:
     )
 
 def validate_currency_code(code: str) -> str:
-    # Проверяем через реестр валют
-    try:
-        cur = get_currency(code)
-    except CurrencyNotFoundError:
-        raise
-    return cur.code
+    # Проверяем через реестр валют (CurrencyNotFoundError, если нет)
+    return get_currency(code).code
 
 
 def validate_amount(amount) -> float:
@@ -96,6 +87,51 @@ def is_rate_fresh(updated_at_iso: str, ttl_seconds: int) -> bool:
     return age <= ttl_seconds
 
 
+def is_epoch_fresh(updated_at: int, ttl_seconds: int) -> bool:
+    # Та же проверка TTL, но по целому epoch — без разбора строки
+    return updated_at >= 0 and time.time() - updated_at <= ttl_seconds
+
+
 def make_pair(from_code: str, to_code: str) -> str:
     # Ключ пары валют
     return f"{from_code}_{to_code}"
+
+
+def cross_rate(
+    rates: dict[str, float],
+    from_code: str,
+    to_code: str,
+    via: str = "USD",
+) -> float | None:
+    # Курс from→to: прямой, обратный или кросс через via
+    if from_code == to_code:
+        return 1.0
+    direct = rates.get(make_pair(from_code, to_code))
+    if direct is not None:
+        return float(direct)
+    inverse = rates.get(make_pair(to_code, from_code))
+    if inverse:
+        return 1.0 / float(inverse)
+    if via in (from_code, to_code):
+        return None
+    a = cross_rate(rates, from_code, via, via=via)
+    b = cross_rate(rates, to_code, via, via=via)
+    if a is None or not b:
+        return None
+    return a / b
+
+
+def parse_duration(value: str) -> int:
+    # "90", "15m", "1h", "1d" -> секунды
+    s = str(value).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if s and s[-1] in units:
+            seconds = int(float(s[:-1]) * units[s[-1]])
+        else:
+            seconds = int(float(s))
+    except ValueError as err:
+        raise ValueError(f"Некорректная длительность: '{value}'") from err
+    if seconds <= 0:
+        raise ValueError("Длительность должна быть положительной")
+    return seconds
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import marshal
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+from .settings import SettingsLoader
+
+# Бинарные форматы начинаются с заголовка: magic + id кодека.
+# JSON заголовка не имеет и распознаётся по первому значащему символу.
+_MAGIC = b"VTHB"
+_MARSHAL_VERSION = 4
+# Выбранный кодек каталога данных (пишет migrate-storage)
+CODEC_MARKER = "storage.codec"
+
+
+class StorageCodec(ABC):
+    """Сериализация хранилищ: имя, признак JSON и пара dumps/loads."""
+
+    name = ""
+    is_json = False
+
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        # Данные -> байты файла
+        raise NotImplementedError
+
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any:
+        # Байты файла -> данные
+        raise NotImplementedError
+
+
+class PrettyJsonCodec(StorageCodec):
+    # Исходный формат: indent=2, удобно читать глазами
+    name = "json-pretty"
+    is_json = True
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class CompactJsonCodec(PrettyJsonCodec):
+    # Тот же JSON без отступов и пробелов
+    name = "json"
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+
+class MarshalCodec(StorageCodec):
+    # Бинарный формат stdlib marshal (только dict/list/str/числа/None)
+    name = "marshal"
+    _header = _MAGIC + b"\x01"
+
+    def dumps(self, data: Any) -> bytes:
+        return self._header + marshal.dumps(data, _MARSHAL_VERSION)
+
+    def loads(self, raw: bytes) -> Any:
+        return marshal.loads(memoryview(raw)[len(self._header) :])
+
+
+CODECS: dict[str, StorageCodec] = {
+    c.name: c for c in (PrettyJsonCodec(), CompactJsonCodec(), MarshalCodec())
+}
+HEADER_SIZE = len(_MAGIC) + 1
+_BY_ID = {b"\x01": CODECS["marshal"]}
+
+
+def get_codec(name: str) -> StorageCodec:
+    codec = CODECS.get(str(name).strip().lower())
+    if codec is None:
+        raise ValueError(
+            f"Неизвестный кодек '{name}'. Доступны: {', '.join(CODECS)}"
+        )
+    return codec
+
+
+def detect_codec(head: bytes) -> StorageCodec | None:
+    # Кодек для чтения по первым байтам; JSON читается одинаково в обоих видах
+    if head.startswith(_MAGIC):
+        return _BY_ID.get(head[len(_MAGIC) : HEADER_SIZE])
+    if head.lstrip()[:1] in (b"[", b"{"):
+        return CODECS["json"]
+    return None
+
+
+def is_json_file(path: Path) -> bool:
+    # Можно ли читать файл потоково как JSON
+    try:
+        with Path(path).open("rb") as f:
+            return not f.read(len(_MAGIC)).startswith(_MAGIC)
+    except OSError:
+        return True
+
+
+def load_file(path: Path) -> Any:
+    raw = Path(path).read_bytes()
+    codec = detect_codec(raw[:4096])
+    if codec is None:
+        raise ValueError(f"{path}: неизвестный формат хранилища")
+    return codec.loads(raw)
+
+
+def fsync_dir(path: Path) -> None:
+    # Фиксируем rename на диске: fsync каталога (на Windows недоступно)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def new_tmp(path: Path) -> tuple[int, Path]:
+    # Уникальный временный файл рядом с path (тот же каталог — rename атомарен).
+    # Имя своё у каждой записи: параллельные процессы не подменяют чужой tmp
+    fd, name = tempfile.mkstemp(
+        dir=path.parent, prefix=path.name + ".", suffix=".tmp"
+    )
+    return fd, Path(name)
+
+
+def write_tmp(path: Path, raw: bytes, fsync: bool = False) -> Path:
+    # Первая половина атомарной записи: данные во временном файле рядом
+    fd, tmp = new_tmp(Path(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp
+
+
+def dump_file(
+    path: Path, data: Any, codec: StorageCodec, fsync: bool = False
+) -> int:
+    # Атомарная запись (tmp -> rename); fsync — переживает и сбой питания.
+    # Возвращает размер в байтах
+    path = Path(path)
+    raw = codec.dumps(data)
+    write_tmp(path, raw, fsync).replace(path)
+    if fsync:
+        fsync_dir(path.parent)
+    return len(raw)
+
+
+def codec_for_dir(data_dir: Path) -> StorageCodec:
+    # Кодек записи: маркер каталога, иначе STORAGE_CODEC из настроек
+    marker = Path(data_dir) / CODEC_MARKER
+    try:
+        return get_codec(marker.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return get_codec(SettingsLoader().get("STORAGE_CODEC", "json-pretty"))
+
+
+def set_dir_codec(data_dir: Path, codec: StorageCodec) -> None:
+    (Path(data_dir) / CODEC_MARKER).write_text(codec.name, encoding="utf-8")
+
+
+class BufferedArrayWriter:
+    """
+    Интерфейс JsonArrayWriter для кодеков без потоковой записи:
+    элементы копятся в памяти и пишутся одним dump_file при выходе.
+    """
+
+    def __init__(self, path: Path, codec: StorageCodec, fsync: bool = False) -> None:
+        self._path = Path(path)
+        self._codec = codec
+        self._fsync = fsync
+        self._items: list[Any] = []
+        self.count = 0
+
+    def __enter__(self) -> "BufferedArrayWriter":
+        return self
+
+    def write(self, item: Any) -> None:
+        self._items.append(item)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        items, self._items = self._items, []
+        if exc_type is None:
+            dump_file(self._path, items, self._codec, self._fsync)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+from .codecs import StorageCodec, fsync_dir, write_tmp
+
+# Уровни надёжности записи хранилищ:
+#   none  — tmp -> rename без fsync (переживает падение процесса, не ОС)
+#   fsync — fsync файла и каталога на каждую запись
+#   group — как fsync, но записи окна объединяются в один сброс
+DURABILITY_LEVELS = ("none", "fsync", "group")
+
+
+def commit_files(batch: dict[Path, tuple[Any, StorageCodec]]) -> None:
+    # Надёжная запись нескольких файлов: все tmp + fsync, затем rename
+    # и по одному fsync на каталог
+    tmps = [
+        (write_tmp(path, codec.dumps(data), fsync=True), path)
+        for path, (data, codec) in batch.items()
+    ]
+    for tmp, path in tmps:
+        tmp.replace(path)
+    for directory in {path.parent for path in batch}:
+        fsync_dir(directory)
+
+
+class GroupCommitter:
+    """
+    Групповая фиксация: первый писатель пакета становится лидером и
+    сбрасывает всё накопленное одним commit_files; пока идёт сброс, новые
+    записи копятся для следующего. Перед сбросом лидер ждёт до window,
+    пока в пакет не войдёт столько писателей, сколько было в прошлом:
+    при постоянной конкуренции окно собирает их в один fsync, одиночный
+    писатель (прошлый пакет из одного) сбрасывает сразу, а после всплеска
+    окно ждётся не больше одного раза.
+    Повторные записи того же файла в окне схлопываются до последней версии
+    и сериализуются один раз, при сбросе: данные после submit не меняют.
+    submit возвращается, когда данные писателя (или более новые) на диске;
+    ошибка сброса поднимается у всех писателей группы.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 0.002,
+        flush: Callable[[dict[Path, tuple[Any, StorageCodec]]], None] = commit_files,
+    ) -> None:
+        self._window = max(0.0, float(window_seconds))
+        self._flush = flush
+        lock = threading.Lock()
+        # Ведомые ждут сброса своего пакета, лидер — новых писателей в пакет
+        self._cond = threading.Condition(lock)
+        self._joined = threading.Condition(lock)
+        # Сбросы идут строго по очереди, чтобы старая версия не легла поверх новой
+        self._flush_lock = threading.Lock()
+        self._pending: dict[Path, tuple[Any, StorageCodec]] = {}
+        self._gen = 0
+        self._done = 0
+        self._leader = False
+        # Писатели текущего пакета и сколько их было в прошлом
+        self._queued = 0
+        self._expected = 1
+        self._errors: dict[int, BaseException] = {}
+        self.flushes = 0
+
+    def wait_pending(self, writers: int, timeout: float | None = None) -> bool:
+        # Ждём, пока в следующий сброс войдут writers писателей (тесты, бенчмарки)
+        with self._joined:
+            return self._joined.wait_for(lambda: self._queued >= writers, timeout)
+
+    def submit(self, path: Path, data: Any, codec: StorageCodec) -> None:
+        with self._cond:
+            self._pending[Path(path)] = (data, codec)
+            self._queued += 1
+            self._joined.notify_all()
+            gen = self._gen
+            leader = not self._leader
+            self._leader = True
+            if not leader:
+                while self._done <= gen:
+                    self._cond.wait()
+                self._raise(gen)
+                return
+        with self._flush_lock:
+            with self._cond:
+                if self._window:
+                    # Прошлый сброс закончен: добираем пакет до прошлого размера
+                    self._joined.wait_for(
+                        lambda: self._queued >= self._expected, self._window
+                    )
+                batch, self._pending = self._pending, {}
+                self._expected, self._queued = self._queued, 0
+                self._gen += 1
+                self._leader = False
+            error = None
+            try:
+                self._flush(batch)
+            except BaseException as e:
+                error = e
+            with self._cond:
+                if error is not None:
+                    self._errors[gen] = error
+                self._done = gen + 1
+                self.flushes += 1
+                self._cond.notify_all()
+        self._raise(gen)
+
+    def _raise(self, gen: int) -> None:
+        error = self._errors.get(gen)
+        if error is not None:
+            raise error
+
+
+class DurableWriter:
+    # Атомарная запись хранилищ с выбранным уровнем надёжности
+    def __init__(self, durability: str = "group", window_seconds: float = 0.002):
+        durability = str(durability).strip().lower()
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(
+                f"Неизвестный уровень надёжности '{durability}'. "
+                f"Доступны: {', '.join(DURABILITY_LEVELS)}"
+            )
+        self.durability = durability
+        self._group = GroupCommitter(window_seconds)
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, data: Any, codec: StorageCodec) -> None:
+        path = Path(path)
+        if self.durability == "group":
+            self._group.submit(path, data, codec)
+            return
+        # Общий .tmp на файл: потоки одного процесса пишут по очереди
+        with self._lock:
+            if self.durability == "fsync":
+                commit_files({path: (data, codec)})
+            else:
+                write_tmp(path, codec.dumps(data)).replace(path)
+
+    @property
+    def flushes(self) -> int:
+        return self._group.flushes
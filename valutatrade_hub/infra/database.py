@@ -1,10 +1,22 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 from ..infra.settings import SettingsLoader
+from .codecs import (
+    BufferedArrayWriter,
+    StorageCodec,
+    codec_for_dir,
+    dump_file,
+    get_codec,
+    is_json_file,
+    load_file,
+    set_dir_codec,
+)
+from .commit import DurableWriter
+from .filelock import FileLock
+from .jsonstream import JsonArrayWriter, is_blank_file, iter_json_array, read_json
 
 
 class DatabaseManager:
@@ -22,29 +34,100 @@ class DatabaseManager:
         # Пути к JSON
         data_dir = Path(self._settings.get("DATA_DIR"))
         data_dir.mkdir(parents=True, exist_ok=True)
+        self.data_dir = data_dir
+        # Кодек записи; чтение определяет формат по заголовку файла
+        self.codec: StorageCodec = codec_for_dir(data_dir)
+        # Надёжность записи: none, fsync или group (групповая фиксация)
+        self.writer = DurableWriter(
+            self._settings.get("STORAGE_DURABILITY", "group"),
+            float(self._settings.get("GROUP_COMMIT_WINDOW_MS", 2)) / 1000,
+        )
 
         self.users_path = data_dir / "users.json"
         self.portfolios_path = data_dir / "portfolios.json"
         self.rates_path = data_dir / "rates.json"
+        # Бинарный снимок курсов рядом с rates.json (пишет RatesStorage)
+        self.rates_bin_path = self.rates_path.with_suffix(".bin")
+        self.alerts_path = data_dir / "alerts.json"
+        self.orders_path = data_dir / "orders.json"
+        self.ledger_dir = data_dir / "ledger"
+        self._locks: dict[Path, FileLock] = {}
 
         self._ensure_file(self.users_path, "[]")
         self._ensure_file(self.portfolios_path, "[]")
         self._ensure_file(self.rates_path, "{}")
+        self._ensure_file(self.alerts_path, "[]")
+        self._ensure_file(self.orders_path, "[]")
+
+    def lock(self, path: Path) -> FileLock:
+        # Межпроцессная блокировка чтения-изменения-записи файла.
+        # Один экземпляр на путь: flock двух дескрипторов в процессе не делится
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks.setdefault(
+                path, FileLock(path.with_name(path.name + ".lock"))
+            )
+        return lock
 
     def _ensure_file(self, path: Path, default_text: str) -> None:
-        # Создаём файл или лечим пустой
-        if not path.exists():
-            path.write_text(default_text, encoding="utf-8")
-            return
-        if path.read_text(encoding="utf-8").strip() == "":
+        # Создаём файл или лечим пустой (без чтения файла целиком)
+        if not path.exists() or is_blank_file(path):
             path.write_text(default_text, encoding="utf-8")
 
+    @property
+    def store_paths(self) -> list[Path]:
+        # Файлы, которые обслуживает кодек (история и журнал — свои форматы)
+        return [
+            self.users_path,
+            self.portfolios_path,
+            self.rates_path,
+            self.alerts_path,
+            self.orders_path,
+        ]
+
     def read(self, path: Path) -> Any:
-        # Безопасное чтение JSON
-        text = path.read_text(encoding="utf-8").strip()
-        return json.loads(text)
+        # Весь документ в память; JSON-массив — поэлементно, без копии-строки.
+        # Для обхода больших массивов — iter_records
+        if is_json_file(path):
+            return read_json(path)
+        return load_file(path)
+
+    def iter_records(self, path: Path) -> Iterator[Any]:
+        # Записи массива по одной; JSON читается потоково
+        if is_json_file(path):
+            return iter_json_array(path)
+        return iter(load_file(path))
+
+    @property
+    def durable(self) -> bool:
+        return self.writer.durability != "none"
+
+    def set_durability(self, durability: str, window_ms: float | None = None) -> None:
+        window = self._settings.get("GROUP_COMMIT_WINDOW_MS", 2)
+        if window_ms is not None:
+            window = window_ms
+        self.writer = DurableWriter(durability, float(window) / 1000)
+
+    def array_writer(self, path: Path) -> JsonArrayWriter | BufferedArrayWriter:
+        # Потоковая перезапись массива в текущем кодеке
+        if self.codec.name == "json-pretty":
+            return JsonArrayWriter(path, fsync=self.durable)
+        if self.codec.name == "json":
+            return JsonArrayWriter(path, indent=None, fsync=self.durable)
+        return BufferedArrayWriter(path, self.codec, fsync=self.durable)
 
     def write(self, path: Path, data: Any) -> None:
-        # Запись JSON
-        text = json.dumps(data, ensure_ascii=False, indent=2)
-        path.write_text(text, encoding="utf-8")
+        # Атомарная запись в текущем кодеке с настроенной надёжностью
+        self.writer.write(path, data, self.codec)
+
+    def migrate(self, codec_name: str) -> list[tuple[Path, int, int]]:
+        # Перекодировать все хранилища; (файл, размер до, размер после)
+        codec = get_codec(codec_name)
+        report = []
+        for path in self.store_paths:
+            before = path.stat().st_size
+            after = dump_file(path, self.read(path), codec, fsync=self.durable)
+            report.append((path, before, after))
+        set_dir_codec(self.data_dir, codec)
+        self.codec = codec
+        return report
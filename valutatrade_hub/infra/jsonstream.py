@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+from .codecs import fsync_dir, new_tmp
+
+_WS = " \t\r\n"
+_END = _WS + ",]"
+
+
+def iter_json_array(path: Path, buffer_size: int = 1 << 16) -> Iterator[Any]:
+    # Элементы JSON-массива верхнего уровня по одному, без загрузки файла целиком
+    decoder = json.JSONDecoder()
+    with Path(path).open("r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        started = False
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(buffer_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            # Пропускаем пробелы и разделители
+            while True:
+                while pos < len(buf) and buf[pos] in _WS:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    break
+            if pos >= len(buf):
+                if started:
+                    raise ValueError(f"{path}: незакрытый JSON-массив")
+                return
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError(f"{path}: ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+            if ch == "]":
+                return
+            if ch == ",":
+                pos += 1
+                continue
+            # Декодируем элемент; если он обрезан границей буфера — дочитываем
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof or not fill():
+                        raise
+                    continue
+                if (
+                    not eof
+                    and buf[pos] not in '{["'
+                    and (end >= len(buf) or buf[end] not in _END)
+                ):
+                    # Число на границе буфера может быть неполным
+                    fill()
+                    continue
+                pos = end
+                yield item
+                break
+
+
+def read_json(path: Path, probe: int = 4096) -> Any:
+    # Массив верхнего уровня собираем поэлементно — без второй копии файла
+    # в виде строки; прочие документы (небольшие объекты) — json.load
+    with Path(path).open("rb") as f:
+        head = f.read(probe).lstrip()
+    if head.startswith(b"["):
+        return list(iter_json_array(path))
+    with Path(path).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_blank_file(path: Path, probe: int = 4096) -> bool:
+    # Файл пуст или из одних пробелов; читаем только до первого значащего байта
+    with Path(path).open("rb") as f:
+        while True:
+            chunk = f.read(probe)
+            if not chunk:
+                return True
+            if chunk.strip():
+                return False
+
+
+def iter_chunks(items: Iterator[Any], size: int) -> Iterator[list[Any]]:
+    # Группируем поток в списки по size элементов
+    chunk: list[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JsonArrayWriter:
+    """
+    Потоковая запись JSON-массива: indent=2 (как json-pretty) или компактно.
+    Пишет во временный файл и подменяет исходный только при успешном выходе
+    из контекста; исходный файл можно читать потоком, пока идёт запись.
+    """
+
+    def __init__(
+        self, path: Path, indent: int | None = 2, fsync: bool = False
+    ) -> None:
+        self._path = Path(path)
+        self._indent = indent
+        self._fsync = fsync
+        self._tmp: Path | None = None
+        self._f: TextIO | None = None
+        self.count = 0
+
+    def __enter__(self) -> "JsonArrayWriter":
+        fd, self._tmp = new_tmp(self._path)
+        self._f = os.fdopen(fd, "w", encoding="utf-8")
+        self._f.write("[")
+        return self
+
+    def write(self, item: Any) -> None:
+        sep = "," if self.count else ""
+        self.count += 1
+        if self._indent is None:
+            text = json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+            self._f.write(sep + text)
+            return
+        # Переводы строк внутри строк JSON экранированы, поэтому сдвиг безопасен
+        pad = " " * self._indent
+        text = json.dumps(item, ensure_ascii=False, indent=self._indent)
+        self._f.write(sep + "\n" + pad + text.replace("\n", "\n" + pad))
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        f, self._f = self._f, None
+        if exc_type is not None:
+            f.close()
+            self._tmp.unlink(missing_ok=True)
+            return
+        f.write("\n]" if self.count and self._indent is not None else "]")
+        if self._fsync:
+            f.flush()
+            os.fsync(f.fileno())
+        f.close()
+        self._tmp.replace(self._path)
+        if self._fsync:
+            fsync_dir(self._path.parent)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .filelock import FileLock
+from .jsonstream import iter_chunks
+
+
+class TradeLedger:
+    """
+    Append-only журнал сделок (JSON lines) с индексами смещений по пользователям.
+
+    data/ledger/trades.jsonl     — записи сделок, только дописываются;
+    data/ledger/idx/<uid>.idx    — int64-смещения записей пользователя;
+    data/ledger/snapshot.json    — периодический снимок портфелей + seq/offset.
+    """
+
+    def __init__(self, root: Path, snapshot_every: int = 1000) -> None:
+        self._root = Path(root)
+        self._path = self._root / "trades.jsonl"
+        self._idx_dir = self._root / "idx"
+        self._snapshot_path = self._root / "snapshot.json"
+        self._lock = FileLock(self._root / "ledger.lock")
+        self._snapshot_every = max(1, int(snapshot_every))
+        # (mtime_ns snapshot.json, его seq): maybe_snapshot не разбирает снимок
+        self._snapshot_seq: tuple[int | None, int] = (None, 0)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def create(self, opening: Iterable[dict] = ()) -> bool:
+        # Журнал (если его ещё нет) с начальными записями. Проверка и запись
+        # под одной блокировкой: два процесса не запишут открытие дважды
+        with self._lock:
+            if self._path.exists():
+                return False
+            self._idx_dir.mkdir(parents=True, exist_ok=True)
+            for batch in iter_chunks(opening, 10_000):
+                self._append(batch)
+            self._path.touch(exist_ok=True)
+        return True
+
+    def _idx_path(self, user_id: int) -> Path:
+        return self._idx_dir / f"{int(user_id)}.idx"
+
+    def _last_seq(self) -> int:
+        # seq последней записи: читаем только хвост файла
+        if not self._path.exists() or self._path.stat().st_size == 0:
+            return 0
+        with self._path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            chunk = b""
+            while pos > 0 and chunk.count(b"\n") < 2:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step) + chunk
+        last = chunk.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        return int(json.loads(last)["seq"])
+
+    def append(self, entries: Iterable[dict]) -> list[int]:
+        # Дописываем записи и индексы; возвращаем присвоенные seq
+        entries = list(entries)
+        if not entries:
+            return []
+        self._idx_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            return self._append(entries)
+
+    def _append(self, entries: list[dict]) -> list[int]:
+        seq = self._last_seq()
+        offsets: dict[int, array] = {}
+        seqs = []
+        with self._path.open("ab") as f:
+            f.seek(0, os.SEEK_END)
+            for e in entries:
+                seq += 1
+                record = dict(e, seq=seq)
+                line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                offsets.setdefault(int(e["user_id"]), array("q")).append(f.tell())
+                f.write(line.encode("utf-8") + b"\n")
+                seqs.append(seq)
+            f.flush()
+            os.fsync(f.fileno())
+        for uid, offs in offsets.items():
+            with self._idx_path(uid).open("ab") as f:
+                offs.tofile(f)
+        return seqs
+
+    def _read_at(self, f, offset: int) -> dict:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def user_entries(self, user_id: int, since: str | None = None) -> Iterator[dict]:
+        # Только записи пользователя — через его индекс смещений
+        idx_path = self._idx_path(user_id)
+        if not idx_path.exists() or not self._path.exists():
+            return
+        offsets = array("q")
+        offsets.frombytes(idx_path.read_bytes())
+        with self._path.open("rb") as f:
+            if since is not None:
+                # ts растёт вместе со смещением — ищем первую запись бинарно
+                lo, hi = 0, len(offsets)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if self._read_at(f, offsets[mid])["ts"] < since:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                offsets = offsets[lo:]
+            for off in offsets:
+                yield self._read_at(f, off)
+
+    def iter_from(self, offset: int = 0) -> Iterator[tuple[int, dict]]:
+        # Последовательное чтение журнала: (смещение, запись)
+        if not self._path.exists():
+            return
+        with self._path.open("rb") as f:
+            f.seek(offset)
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield pos, json.loads(line)
+
+    # --- снимки и пересборка портфелей ---
+
+    def load_snapshot(self) -> dict:
+        try:
+            return json.loads(self._snapshot_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"seq": 0, "offset": 0, "portfolios": {}}
+
+    def _replay(self) -> tuple[dict[str, dict[str, float]], int]:
+        # Снимок + записи после него -> {uid: {code: balance}}, seq
+        snap = self.load_snapshot()
+        state = {u: dict(w) for u, w in snap.get("portfolios", {}).items()}
+        seq = int(snap.get("seq", 0))
+        for _, e in self.iter_from(int(snap.get("offset", 0))):
+            wallets = state.setdefault(str(e["user_id"]), {})
+            delta = float(e["amount"])
+            if e["side"] == "sell":
+                delta = -delta
+            wallets[e["currency"]] = wallets.get(e["currency"], 0.0) + delta
+            seq = int(e["seq"])
+        return state, seq
+
+    def rebuild_portfolios(self) -> list[dict]:
+        # Портфели в формате portfolios.json, восстановленные из журнала
+        state, _ = self._replay()
+        return [
+            {
+                "user_id": int(uid),
+                "wallets": {c: {"balance": b} for c, b in w.items()},
+            }
+            for uid, w in sorted(state.items(), key=lambda x: int(x[0]))
+        ]
+
+    def write_snapshot(self) -> int:
+        # Снимок текущего состояния, чтобы пересборка не читала весь журнал
+        with self._lock:
+            state, seq = self._replay()
+            offset = self._path.stat().st_size if self._path.exists() else 0
+            data = {"seq": seq, "offset": offset, "portfolios": state}
+            tmp = self._snapshot_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self._snapshot_path)
+            self._snapshot_seq = (self._snapshot_path.stat().st_mtime_ns, seq)
+        return seq
+
+    def _snapshot_done(self) -> int:
+        # seq последнего снимка; snapshot.json разбирается, только если его
+        # переписал другой процесс
+        try:
+            mtime = self._snapshot_path.stat().st_mtime_ns
+        except OSError:
+            return 0
+        if self._snapshot_seq[0] != mtime:
+            self._snapshot_seq = (mtime, int(self.load_snapshot().get("seq", 0)))
+        return self._snapshot_seq[1]
+
+    def maybe_snapshot(self, last_seq: int) -> None:
+        # Периодический снимок каждые snapshot_every записей
+        if last_seq - self._snapshot_done() >= self._snapshot_every:
+            self.write_snapshot()
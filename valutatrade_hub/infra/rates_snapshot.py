@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .codecs import write_tmp
+
+# Заголовок: magic, версия, ширина ключа, число пар, размер блока источников,
+# last_refresh (epoch, -1 если нет)
+_MAGIC = b"VTRB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIIq")
+# Запись: rate float64, updated_at int64 (epoch), id источника int32 (-1 — нет)
+_RECORD = struct.Struct("<dqi4x")
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _iso_to_epoch(value) -> int:
+    # ISO-время (Z или смещение; без зоны — UTC) -> секунды epoch; -1 если нет
+    if not value:
+        return -1
+    dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def write_rates_snapshot(path: Path, snapshot: dict) -> int:
+    """
+    Бинарный снимок rates.json: заголовок, отсортированная таблица ключей
+    фиксированной ширины, записи фиксированной ширины, таблица источников.
+    Пишется во временный файл и подменяется атомарно.
+    """
+    path = Path(path)
+    pairs = snapshot.get("pairs") or {}
+    keys = sorted(k.encode("ascii") for k in pairs)
+    width = max((len(k) for k in keys), default=1)
+
+    sources: dict[str, int] = {}
+    records = bytearray()
+    for k in keys:
+        entry = pairs[k.decode("ascii")]
+        src = entry.get("source")
+        src_id = -1 if src is None else sources.setdefault(str(src), len(sources))
+        records += _RECORD.pack(
+            float(entry["rate"]), _iso_to_epoch(entry.get("updated_at")), src_id
+        )
+    src_block = "\n".join(sources).encode("utf-8")
+
+    keys_end = _HEADER.size + len(keys) * width
+    out = bytearray(_HEADER.size)
+    _HEADER.pack_into(
+        out,
+        0,
+        _MAGIC,
+        _VERSION,
+        width,
+        len(keys),
+        len(src_block),
+        _iso_to_epoch(snapshot.get("last_refresh")),
+    )
+    for k in keys:
+        out += k.ljust(width, b"\0")
+    out += b"\0" * (_align8(keys_end) - keys_end)
+    out += records
+    out += src_block
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_tmp(path, bytes(out), fsync=True).replace(path)
+    return len(keys)
+
+
+class _Mapped:
+    # Один открытый снимок: mmap + разобранный заголовок
+    __slots__ = (
+        "mm",
+        "ino",
+        "width",
+        "count",
+        "keys_off",
+        "rec_off",
+        "sources",
+        "last_refresh",
+    )
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as f:
+            st = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.ino = (st.st_ino, st.st_mtime_ns, st.st_size)
+        magic, version, width, count, src_size, last = _HEADER.unpack_from(self.mm)
+        if magic != _MAGIC or version != _VERSION:
+            self.mm.close()
+            raise ValueError(f"{path}: неизвестный формат снимка курсов")
+        self.width = width
+        self.count = count
+        self.keys_off = _HEADER.size
+        self.rec_off = _align8(self.keys_off + count * width)
+        src_off = self.rec_off + count * _RECORD.size
+        raw = self.mm[src_off : src_off + src_size].decode("utf-8")
+        self.sources = raw.split("\n") if raw else []
+        self.last_refresh = last
+
+    def key_at(self, i: int) -> bytes:
+        start = self.keys_off + i * self.width
+        return self.mm[start : start + self.width]
+
+
+class _KeyView:
+    # Последовательность ключей поверх mmap — для bisect без копирования таблицы
+    __slots__ = ("_m",)
+
+    def __init__(self, m: _Mapped) -> None:
+        self._m = m
+
+    def __len__(self) -> int:
+        return self._m.count
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._m.key_at(i)
+
+
+class RatesSnapshotReader:
+    """
+    Чтение бинарного снимка через mmap: бинарный поиск по таблице ключей,
+    без разбора JSON и ISO-строк. Подмена файла замечается по (inode, mtime),
+    старое отображение остаётся целым до переоткрытия.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = Path(path)
+        self._mapped: _Mapped | None = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> _Mapped | None:
+        try:
+            st = os.stat(self._path)
+        except OSError:
+            return None
+        sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if self._mapped is None or self._mapped.ino != sig:
+                try:
+                    self._mapped = _Mapped(self._path)
+                except (OSError, ValueError, struct.error):
+                    self._mapped = None
+            return self._mapped
+
+    def available(self) -> bool:
+        return self._current() is not None
+
+    def last_refresh(self) -> int | None:
+        m = self._current()
+        return None if m is None or m.last_refresh < 0 else m.last_refresh
+
+    def lookup(self, pair: str) -> tuple[float, int, str | None] | None:
+        # (rate, updated_at epoch, source) или None
+        m = self._current()
+        if m is None:
+            return None
+        key = pair.encode("ascii", "ignore")
+        if len(key) > m.width:
+            return None
+        key = key.ljust(m.width, b"\0")
+        i = bisect_left(_KeyView(m), key)
+        if i >= m.count or m.key_at(i) != key:
+            return None
+        rate, updated, src_id = _RECORD.unpack_from(
+            m.mm, m.rec_off + i * _RECORD.size
+        )
+        source = m.sources[src_id] if 0 <= src_id < len(m.sources) else None
+        return rate, updated, source
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import Callable
+
+from .codecs import write_tmp
+
+_SECRET_FILE = ".secret"
+_SECRET_SIZE = 32
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionStore:
+    """
+    Подписанные сессии для коротких процессов CLI.
+    Токен — base64(JSON {uid, user, exp, sid}) + "." + HMAC-SHA256 ключом
+    каталога сессий. Проверка: подпись, срок и совпадение с файлом сессии
+    пользователя (logout удаляет файл — токен отзывается). users.json
+    не читается.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ttl_seconds: float = 12 * 3600,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._root = Path(root)
+        self._ttl = float(ttl_seconds)
+        self._clock = clock
+        self._key: bytes | None = None
+
+    def _secret(self) -> bytes:
+        # Ключ подписи создаётся при первой сессии, доступ только владельцу
+        if self._key is None:
+            path = self._root / _SECRET_FILE
+            try:
+                key = path.read_bytes()
+            except FileNotFoundError:
+                key = self._create_secret(path)
+            if len(key) != _SECRET_SIZE:
+                raise ValueError(
+                    f"Ключ сессий {path} повреждён: удалите его и выполните "
+                    "login --session заново"
+                )
+            self._key = key
+        return self._key
+
+    def _create_secret(self, path: Path) -> bytes:
+        # Ключ пишется целиком во временный файл и появляется под своим
+        # именем атомарно (link), так что читатель не увидит его недописанным
+        self._root.mkdir(parents=True, exist_ok=True)
+        key = secrets.token_bytes(_SECRET_SIZE)
+        tmp = path.with_name(f"{path.name}.{secrets.token_hex(4)}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                # Другой процесс успел раньше — берём его ключ
+                return path.read_bytes()
+            return key
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _path(self, username: str) -> Path:
+        # Имя файла — логин, а если в нём есть служебные символы — его hex
+        if re.fullmatch(r"[\w.-]+", username):
+            name = username
+        else:
+            name = username.encode("utf-8").hex()
+        return self._root / f"{name}.session"
+
+    def _sign(self, body: str) -> str:
+        digest = hmac.new(self._secret(), body.encode("utf-8"), hashlib.sha256)
+        return digest.hexdigest()
+
+    def issue(self, user_id: int, username: str) -> str:
+        # Новый токен; файл сессии пользователя перезаписывается
+        payload = {
+            "uid": int(user_id),
+            "user": username,
+            "exp": int(self._clock() + self._ttl),
+            "sid": secrets.token_hex(8),
+        }
+        body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        token = f"{body}.{self._sign(body)}"
+        path = self._path(username)
+        # Временный файл создаётся с правами 0600 и уникальным именем
+        write_tmp(path, token.encode("ascii")).replace(path)
+        return token
+
+    def token_for(self, username: str) -> str:
+        try:
+            return self._path(username).read_text(encoding="ascii").strip()
+        except OSError:
+            raise ValueError(
+                f"Нет сохранённой сессии для '{username}'. "
+                "Выполните login --session"
+            ) from None
+
+    def verify(self, token: str) -> tuple[int, str]:
+        # (user_id, username) или ValueError
+        token = token.strip()
+        body, _, sig = token.partition(".")
+        expected = self._sign(body).encode("ascii")
+        if not body or not hmac.compare_digest(sig.encode("utf-8"), expected):
+            raise ValueError("Недействительная сессия")
+        try:
+            payload = json.loads(_unb64(body))
+        except ValueError:
+            raise ValueError("Недействительная сессия") from None
+        if payload["exp"] <= self._clock():
+            raise ValueError("Сессия истекла. Выполните login --session")
+        stored = self.token_for(payload["user"]).encode("ascii", "replace")
+        if not hmac.compare_digest(stored, token.encode("utf-8")):
+            raise ValueError("Сессия отозвана. Выполните login --session")
+        return int(payload["uid"]), payload["user"]
+
+    def revoke(self, username: str) -> bool:
+        try:
+            self._path(username).unlink()
+        except FileNotFoundError:
+            return False
+        return True
@@ -17,12 +17,25 @@ class SettingsLoader:
     def _load_defaults(self) -> None:
         # Базовые настройки
         root = Path(__file__).resolve().parents[2]
+        package = Path(__file__).resolve().parents[1]
         self._cache = {
             "DATA_DIR": str(root / "data"),
+            "CURRENCIES_PATH": str(package / "core" / "currencies.json"),
             "RATES_TTL_SECONDS": 300,  # 5 минут
             "DEFAULT_BASE": "USD",
             "LOG_PATH": str(root / "logs" / "actions.log"),
             "LOG_LEVEL": "INFO",
+            "LEDGER_SNAPSHOT_EVERY": 1000,  # снимок портфелей каждые N сделок
+            # Кодек хранилищ по умолчанию: json-pretty, json или marshal
+            "STORAGE_CODEC": "json-pretty",
+            # Надёжность записи хранилищ: none, fsync или group
+            "STORAGE_DURABILITY": "group",
+            "GROUP_COMMIT_WINDOW_MS": 2,  # окно групповой фиксации
+            "SESSION_TTL_SECONDS": 12 * 3600,  # срок сессии login --session
+            # Профилирование команд CLI (--profile cpu|mem)
+            "PROFILE_DIR": str(root / "logs" / "profiles"),
+            "PROFILE_SAMPLE_RATE": 0.1,  # доля профилируемых команд
+            "PROFILE_MAX_FILES": 500,
         }
 
     def get(self, key: str, default: Any = None) -> Any:
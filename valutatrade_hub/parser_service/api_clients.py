@@ -1,16 +1,94 @@
 from __future__ import annotations
 
+import json
+import random
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from time import perf_counter
 from typing import Any
 
 import requests
 
-from ..core.exceptions import ApiRequestError
+from ..core.exceptions import ApiRequestError, RateLimitExceededError
+from .rate_limiter import TokenBucketLimiter
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    # Retry-After в секундах (HTTP-date не поддерживаем)
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
 
 
 class BaseApiClient(ABC):
     # Единый интерфейс клиента
+    SOURCE = "Unknown"
+    # Самый длинный интервал исторических курсов в одном запросе (0 — нет)
+    HISTORY_CHUNK_SECONDS = 0
+
+    _limiter: TokenBucketLimiter | None = None
+    _limit_wait: float = 0.0
+
+    def use_limiter(self, limiter: TokenBucketLimiter, max_wait: float = 0.0) -> None:
+        # Общий бюджет запросов к источнику
+        self._limiter = limiter
+        self._limit_wait = float(max_wait)
+
+    def _take_token(self) -> None:
+        # Ждём токен или RateLimitExceededError без похода в сеть
+        if self._limiter is not None:
+            self._limiter.acquire(max_wait=self._limit_wait)
+
+    def calls_per_update(self) -> int:
+        # Сколько запросов (токенов) тратит один fetch_rates
+        return 1
+
+    def min_poll_interval(self) -> float:
+        # Самый частый опрос, который выдерживает бюджет запросов
+        if self._limiter is None or self._limiter.refill_per_second <= 0:
+            return 0.0
+        return self.calls_per_update() / self._limiter.refill_per_second
+
+    def _check_throttled(self, resp: requests.Response) -> None:
+        # 429 от сервера — сжигаем бюджет, чтобы другие процессы не долбили API
+        if resp.status_code != 429:
+            return
+        retry = _retry_after(resp)
+        if self._limiter is not None:
+            self._limiter.penalize(retry)
+        raise RateLimitExceededError(self.SOURCE, retry or 0.0)
+
+    def _get_json(
+        self, url: str, params: dict | None = None, timeout: float = 10
+    ) -> Any:
+        # GET с бюджетом запросов; сетевые ошибки и не-200 -> ApiRequestError
+        self._take_token()
+        try:
+            resp = requests.get(url, params=params, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            raise ApiRequestError(f"{self.SOURCE}: {e}") from e
+        self._check_throttled(resp)
+        if resp.status_code != 200:
+            raise ApiRequestError(f"{self.SOURCE}: status_code={resp.status_code}")
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise ApiRequestError(f"{self.SOURCE}: invalid JSON") from e
+
+    def history_groups(self, pairs: list[str]) -> list[list[str]]:
+        # Пары, которые этот источник отдаёт историей, сгруппированные
+        # по запросам: по умолчанию одна пара — один запрос
+        return []
+
+    def fetch_history(
+        self, pairs: list[str], start: int, end: int
+    ) -> dict[str, list[tuple[int, float]]]:
+        # {pair: [(epoch, rate), ...]} за [start, end)
+        raise ApiRequestError(f"{self.SOURCE}: исторические курсы недоступны")
+
     @abstractmethod
     def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
         """
@@ -22,20 +100,76 @@ class BaseApiClient(ABC):
 
 
 class CoinGeckoClient(BaseApiClient):
+    SOURCE = "CoinGecko"
+    # market_chart/range отдаёт часовые точки на интервалах до 90 дней
+    HISTORY_CHUNK_SECONDS = 30 * 86400
+
     def __init__(
         self,
         base_url: str,
         crypto_id_map: dict[str, str],
         timeout: int = 10,
+        chunk_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 2,
+        history_url: str | None = None,
+        retry_backoff: float = 0.5,
     ) -> None:
         self._base_url = base_url
+        self._history_url = history_url
         self._crypto_id_map = crypto_id_map
         self._timeout = timeout
+        self._chunk_size = max(1, int(chunk_size))
+        self._max_concurrency = max(1, int(max_concurrency))
+        self._max_retries = max(0, int(max_retries))
+        self._retry_backoff = max(0.0, float(retry_backoff))
 
-    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
-        # Формируем ids
-        ids = ",".join(self._crypto_id_map.values())
-        params = {"ids": ids, "vs_currencies": "usd"}
+    def _backoff(self, attempt: int) -> float:
+        # Экспоненциальная пауза с полным джиттером: параллельные процессы
+        # не повторяют упавшие куски синхронно
+        return random.uniform(0, self._retry_backoff * 2**attempt)
+
+    def _chunks(self) -> list[list[str]]:
+        # Делим ids на куски, чтобы не упираться в длину URL и лимиты
+        ids = list(dict.fromkeys(self._crypto_id_map.values()))
+        size = self._chunk_size
+        return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    def calls_per_update(self) -> int:
+        return max(1, len(self._chunks()))
+
+    def history_groups(self, pairs: list[str]) -> list[list[str]]:
+        # Эндпоинт истории — по одной монете к USD
+        if not self._history_url:
+            return []
+        return [
+            [p]
+            for p in pairs
+            if p.endswith("_USD") and p.split("_", 1)[0] in self._crypto_id_map
+        ]
+
+    def fetch_history(
+        self, pairs: list[str], start: int, end: int
+    ) -> dict[str, list[tuple[int, float]]]:
+        out: dict[str, list[tuple[int, float]]] = {}
+        for pair in pairs:
+            coin_id = self._crypto_id_map[pair.split("_", 1)[0]]
+            params = {"vs_currency": "usd", "from": int(start), "to": int(end) - 1}
+            data = self._get_json(
+                self._history_url.format(id=coin_id), params, self._timeout
+            )
+            points = []
+            for row in data.get("prices") or []:
+                try:
+                    points.append((int(row[0]) // 1000, float(row[1])))
+                except (TypeError, ValueError, IndexError):
+                    continue
+            out[pair] = [p for p in points if start <= p[0] < end]
+        return out
+
+    def _fetch_chunk(self, ids: list[str]) -> tuple[dict, dict[str, Any]]:
+        params = {"ids": ",".join(ids), "vs_currencies": "usd"}
+        self._take_token()
 
         t0 = perf_counter()
         try:
@@ -44,6 +178,7 @@ class CoinGeckoClient(BaseApiClient):
             raise ApiRequestError(f"CoinGecko: {e}") from e
         ms = int((perf_counter() - t0) * 1000)
 
+        self._check_throttled(resp)
         if resp.status_code != 200:
             raise ApiRequestError(f"CoinGecko: status_code={resp.status_code}")
 
@@ -52,23 +187,89 @@ class CoinGeckoClient(BaseApiClient):
         except ValueError as e:
             raise ApiRequestError("CoinGecko: invalid JSON") from e
 
+        info = {
+            "ids": len(ids),
+            "request_ms": ms,
+            "status_code": resp.status_code,
+            "etag": resp.headers.get("ETag"),
+        }
+        return data, info
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        chunks = self._chunks()
+        data: dict = {}
+        chunk_meta: list[dict[str, Any]] = [
+            {"chunk": i, "ids": len(c), "attempts": 0} for i, c in enumerate(chunks)
+        ]
+        errors: dict[int, str] = {}
+        throttled: RateLimitExceededError | None = None
+
+        t0 = perf_counter()
+        pending = list(range(len(chunks)))
+        workers = min(self._max_concurrency, len(chunks)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Повторяем только упавшие куски
+            for attempt in range(self._max_retries + 1):
+                if not pending:
+                    break
+                if attempt:
+                    time.sleep(self._backoff(attempt - 1))
+                futures = {
+                    pool.submit(self._fetch_chunk, chunks[i]): i for i in pending
+                }
+                pending = []
+                for fut in as_completed(futures):
+                    i = futures[fut]
+                    chunk_meta[i]["attempts"] += 1
+                    try:
+                        part, info = fut.result()
+                    except RateLimitExceededError as e:
+                        # Бюджет исчерпан — повтор только сожжёт квоту
+                        errors[i] = e.reason
+                        throttled = e
+                        continue
+                    except ApiRequestError as e:
+                        errors[i] = e.reason
+                        pending.append(i)
+                        continue
+                    errors.pop(i, None)
+                    chunk_meta[i].update(info)
+                    data.update(part)
+        ms = int((perf_counter() - t0) * 1000)
+
+        if chunks and len(errors) == len(chunks):
+            if throttled is not None:
+                raise throttled
+            raise ApiRequestError(next(iter(errors.values())))
+
         # Приводим к {"BTC_USD": rate}
         rates: dict[str, float] = {}
         for code, coin_id in self._crypto_id_map.items():
             if coin_id in data and "usd" in data[coin_id]:
                 rates[f"{code}_USD"] = float(data[coin_id]["usd"])
 
+        for i, reason in errors.items():
+            chunk_meta[i]["error"] = reason
+
         meta = {
             "source": "CoinGecko",
             "request_ms": ms,
-            "status_code": resp.status_code,
-            "etag": resp.headers.get("ETag"),
-            "raw": {"ids": ids, "vs": "usd"},
+            "status_code": 200,
+            # Часть кусков не пришла — курсы неполные, но сам ответ настоящий
+            "partial": bool(errors),
+            "etag": None,
+            "raw": {"ids": sum(len(c) for c in chunks), "vs": "usd"},
+            "chunks": chunk_meta,
+            "failed_chunks": sorted(errors),
         }
         return rates, meta
 
 
 class ExchangeRateApiClient(BaseApiClient):
+    SOURCE = "ExchangeRate-API"
+    # history/<base>/<Y>/<M>/<D> — один день на запрос, все валюты сразу
+    HISTORY_CHUNK_SECONDS = 86400
+
     def __init__(
         self,
         base_url: str,
@@ -81,6 +282,37 @@ class ExchangeRateApiClient(BaseApiClient):
         self._base_currency = base_currency
         self._timeout = timeout
 
+    def history_groups(self, pairs: list[str]) -> list[list[str]]:
+        # Один запрос на день закрывает все фиатные пары к базе
+        suffix = f"_{self._base_currency}"
+        group = [p for p in pairs if p.endswith(suffix)]
+        return [group] if group and self._api_key else []
+
+    def fetch_history(
+        self, pairs: list[str], start: int, end: int
+    ) -> dict[str, list[tuple[int, float]]]:
+        out: dict[str, list[tuple[int, float]]] = {p: [] for p in pairs}
+        day = start - start % 86400
+        while day < end:
+            d = datetime.fromtimestamp(day, tz=timezone.utc)
+            url = (
+                f"{self._base_url}/{self._api_key}/history/{self._base_currency}/"
+                f"{d.year}/{d.month}/{d.day}"
+            )
+            data = self._get_json(url, timeout=self._timeout)
+            if data.get("result") != "success":
+                raise ApiRequestError(
+                    f"ExchangeRate-API: result={data.get('result')}"
+                )
+            # Как и в fetch_rates: conversion_rates[<code>] -> <code>_<base>
+            rates = data.get("conversion_rates") or data.get("rates") or {}
+            for pair in pairs:
+                val = rates.get(pair.split("_", 1)[0])
+                if val is not None and day >= start:
+                    out[pair].append((day, float(val)))
+            day += 86400
+        return out
+
     def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
         if not self._api_key:
             raise ApiRequestError(
@@ -88,6 +320,7 @@ class ExchangeRateApiClient(BaseApiClient):
             )
 
         url = f"{self._base_url}/{self._api_key}/latest/{self._base_currency}"
+        self._take_token()
 
         t0 = perf_counter()
         try:
@@ -96,8 +329,9 @@ class ExchangeRateApiClient(BaseApiClient):
             raise ApiRequestError(f"ExchangeRate-API: {e}") from e
         ms = int((perf_counter() - t0) * 1000)
 
+        self._check_throttled(resp)
         if resp.status_code != 200:
-            # Частый кейс: 429 (лимит) или 403 (ключ)
+            # Частый кейс: 403 (ключ)
             raise ApiRequestError(f"ExchangeRate-API: status_code={resp.status_code}")
 
         try:
@@ -126,3 +360,87 @@ class ExchangeRateApiClient(BaseApiClient):
             "time_last_update_utc": data.get("time_last_update_utc"),
         }
         return rates, meta
+
+
+class BinanceClient(BaseApiClient):
+    # Резервный источник криптокурсов: пары к USDT (~USD), без ключа
+    SOURCE = "Binance"
+
+    def __init__(
+        self,
+        base_url: str,
+        crypto_codes: tuple[str, ...],
+        quote: str = "USDT",
+        timeout: int = 10,
+    ) -> None:
+        self._base_url = base_url
+        self._codes = tuple(crypto_codes)
+        self._quote = quote
+        self._timeout = timeout
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        symbols = {f"{c}{self._quote}": c for c in self._codes}
+        params = {"symbols": json.dumps(list(symbols), separators=(",", ":"))}
+        t0 = perf_counter()
+        data = self._get_json(self._base_url, params, self._timeout)
+        ms = int((perf_counter() - t0) * 1000)
+
+        rates: dict[str, float] = {}
+        for row in data if isinstance(data, list) else []:
+            code = symbols.get(str(row.get("symbol")))
+            try:
+                if code:
+                    rates[f"{code}_USD"] = float(row["price"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        meta = {
+            "source": self.SOURCE,
+            "request_ms": ms,
+            "status_code": 200,
+            "etag": None,
+            "raw": {"quote": self._quote, "symbols": len(symbols)},
+        }
+        return rates, meta
+
+
+class FrankfurterClient(BaseApiClient):
+    # Резервный источник фиатных курсов (ECB), без ключа; формат пар —
+    # как у ExchangeRate-API: rates[<code>] при базе USD -> <code>_USD
+    SOURCE = "Frankfurter"
+
+    def __init__(
+        self,
+        base_url: str,
+        base_currency: str,
+        currencies: tuple[str, ...],
+        timeout: int = 10,
+    ) -> None:
+        self._base_url = base_url
+        self._base_currency = base_currency
+        self._currencies = tuple(currencies)
+        self._timeout = timeout
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        params = {"from": self._base_currency}
+        if self._currencies:
+            params["to"] = ",".join(self._currencies)
+        t0 = perf_counter()
+        data = self._get_json(self._base_url, params, self._timeout)
+        ms = int((perf_counter() - t0) * 1000)
+
+        rates: dict[str, float] = {}
+        for to_code, val in (data.get("rates") or {}).items():
+            try:
+                rates[f"{to_code}_{self._base_currency}"] = float(val)
+            except (TypeError, ValueError):
+                continue
+
+        meta = {
+            "source": self.SOURCE,
+            "request_ms": ms,
+            "status_code": 200,
+            "etag": None,
+            "raw": {"base": self._base_currency, "date": data.get("date")},
+        }
+        return rates, meta
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from ..core.exceptions import ApiRequestError, RateLimitExceededError
+from .history import epoch_to_iso
+from .storage import RatesStorage
+
+
+@dataclass(frozen=True)
+class BackfillChunk:
+    # Один запрос истории: источник, пары и интервал [start, end)
+    client: object
+    pairs: tuple[str, ...]
+    start: int
+    end: int
+
+    @property
+    def key(self) -> str:
+        source = getattr(self.client, "SOURCE", "Unknown")
+        return f"{source}:{','.join(self.pairs)}:{self.start}-{self.end}"
+
+
+def plan_chunks(
+    clients: list, pairs: list[str], since: int, until: int
+) -> tuple[list[BackfillChunk], list[str]]:
+    # Чанки по первому источнику с историей для пары; границы выровнены
+    # по epoch, поэтому внутренние чанки совпадают при любом --since/--until.
+    # Крайние чанки обрезаны до [since, until) и ключ у них по фактическим
+    # границам: обрезанный чанк не должен засчитать повторному запуску
+    # с более ранним --since непрочитанную часть интервала.
+    # Возвращает (чанки, пары без источника)
+    chunks: list[BackfillChunk] = []
+    left = list(dict.fromkeys(p.upper() for p in pairs))
+    for client in clients:
+        span = int(getattr(client, "HISTORY_CHUNK_SECONDS", 0))
+        if span <= 0 or not left:
+            continue
+        groups = client.history_groups(left)
+        for group in groups:
+            t = since - since % span
+            while t < until:
+                start, end = max(t, since), min(t + span, until)
+                chunks.append(BackfillChunk(client, tuple(group), start, end))
+                t += span
+        taken = {p for g in groups for p in g}
+        left = [p for p in left if p not in taken]
+    return chunks, left
+
+
+class BackfillCheckpoint:
+    # Ключи выполненных чанков; пишется атомарно после каждой записи в историю
+    def __init__(self, path: Path) -> None:
+        self._path = Path(path)
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+            self._done = set(data.get("done", []))
+        except (OSError, ValueError):
+            self._done = set()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def add(self, keys: list[str]) -> None:
+        self._done.update(keys)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        tmp.write_text(json.dumps({"done": sorted(self._done)}), encoding="utf-8")
+        tmp.replace(self._path)
+
+
+class Backfiller:
+    """
+    Догрузка исторических курсов в HistoryStore.
+    Интервал режется на чанки (план — plan_chunks), чанки качаются
+    параллельно через fetch_history клиентов с общим бюджетом запросов.
+    Точки копятся и пишутся в историю пачками по flush_points; после каждой
+    записи ключи чанков попадают в checkpoint, поэтому прерванный запуск
+    продолжается с невыполненных чанков. Если источник просит ждать дольше
+    max_wait, задание останавливается — повторите его позже.
+    """
+
+    def __init__(
+        self,
+        clients: list,
+        storage: RatesStorage,
+        checkpoint_path: Path,
+        workers: int = 4,
+        flush_points: int = 50_000,
+        max_retries: int = 3,
+        max_wait: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._clients = clients
+        self._storage = storage
+        self._checkpoint = BackfillCheckpoint(checkpoint_path)
+        self._workers = max(1, int(workers))
+        self._flush_points = max(1, int(flush_points))
+        self._max_retries = max(0, int(max_retries))
+        self._max_wait = float(max_wait)
+        self._sleep = sleep
+        self._log = logging.getLogger(__name__)
+
+    def _fetch(self, chunk: BackfillChunk) -> dict[str, list[tuple[int, float]]]:
+        # Повторы сетевых ошибок; короткое ожидание лимита — тоже повтор
+        attempt = 0
+        while True:
+            try:
+                return chunk.client.fetch_history(
+                    list(chunk.pairs), chunk.start, chunk.end
+                )
+            except RateLimitExceededError as e:
+                if e.retry_after > self._max_wait:
+                    raise
+                self._sleep(max(e.retry_after, 0.1))
+            except ApiRequestError:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                self._sleep(min(2.0**attempt, self._max_wait))
+
+    def _entries(self, chunk: BackfillChunk, data: dict) -> list[dict]:
+        source = getattr(chunk.client, "SOURCE", "Unknown")
+        return [
+            {
+                "id": f"{pair}_{epoch_to_iso(ts)}",
+                "pair": pair,
+                "ts": ts,
+                "rate": rate,
+                "source": source,
+            }
+            for pair, points in data.items()
+            for ts, rate in points
+        ]
+
+    def run(
+        self,
+        pairs: list[str],
+        since: int,
+        until: int,
+        progress: Callable[[dict], None] | None = None,
+    ) -> dict:
+        chunks, unsupported = plan_chunks(self._clients, pairs, since, until)
+        todo = [c for c in chunks if c.key not in self._checkpoint]
+        stats = {
+            "chunks": len(chunks),
+            "skipped": len(chunks) - len(todo),
+            "fetched": 0,
+            "failed": 0,
+            "points": 0,
+            "added": 0,
+            "throttled": None,
+            "unsupported": unsupported,
+        }
+        buffer: list[dict] = []
+        buffered: list[str] = []
+
+        def flush() -> None:
+            # Запись пачкой и только потом — отметка чанков в checkpoint
+            if buffered:
+                stats["added"] += self._storage.append_history(buffer)
+                self._checkpoint.add(buffered)
+                buffer.clear()
+                buffered.clear()
+
+        pending = iter(todo)
+        pool = ThreadPoolExecutor(max_workers=self._workers)
+        running: dict = {}
+        try:
+            # Не больше 2*workers чанков в полёте — память не растёт с интервалом
+            for chunk in pending:
+                running[pool.submit(self._fetch, chunk)] = chunk
+                if len(running) >= 2 * self._workers:
+                    break
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    chunk = running.pop(fut)
+                    try:
+                        data = fut.result()
+                    except RateLimitExceededError as e:
+                        stats["throttled"] = e.source
+                        pending = iter(())
+                        continue
+                    except ApiRequestError as e:
+                        stats["failed"] += 1
+                        self._log.warning("Backfill chunk %s failed: %s", chunk.key, e)
+                        continue
+                    entries = self._entries(chunk, data)
+                    buffer.extend(entries)
+                    buffered.append(chunk.key)
+                    stats["fetched"] += 1
+                    stats["points"] += len(entries)
+                    if len(buffer) >= self._flush_points:
+                        flush()
+                    if progress is not None:
+                        progress(stats)
+                    for nxt in pending:
+                        running[pool.submit(self._fetch, nxt)] = nxt
+                        break
+        finally:
+            # И при прерывании сохраняем всё, что уже скачано
+            pool.shutdown(wait=False, cancel_futures=True)
+            flush()
+        return stats
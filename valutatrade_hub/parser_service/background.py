@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable
+
+from .updater import RatesUpdater
+
+
+class BackgroundUpdater:
+    """
+    Обновление курсов в рабочем потоке CLI-процесса.
+    Одновременно идёт не больше одного обновления; результат (или ошибка)
+    передаётся в on_done из рабочего потока. Пока сеть отвечает, остальные
+    команды читают последний записанный снимок (rates.json/rates.bin
+    подменяются атомарно).
+    """
+
+    def __init__(
+        self,
+        make_updater: Callable[[], RatesUpdater],
+        on_done: Callable[[dict | None, Exception | None], None],
+    ) -> None:
+        self._make_updater = make_updater
+        self._on_done = on_done
+        self._busy = threading.Lock()
+        self._stop = threading.Event()
+        self._auto: threading.Thread | None = None
+        self._log = logging.getLogger(__name__)
+
+    @property
+    def running(self) -> bool:
+        return self._busy.locked()
+
+    def start(self, only_source: str | None = None) -> bool:
+        # False — обновление уже идёт
+        if not self._busy.acquire(blocking=False):
+            return False
+        thread = threading.Thread(
+            target=self._run,
+            args=(only_source,),
+            name="rates-refresh",
+            daemon=True,
+        )
+        thread.start()
+        return True
+
+    def _run(self, only_source: str | None) -> None:
+        try:
+            res = self._make_updater().run_update(only_source=only_source)
+        except Exception as e:
+            # Ошибку не теряем: отдаём её в on_done
+            self._log.warning("Background rates update failed: %s", e)
+            self._busy.release()
+            self._on_done(None, e)
+            return
+        self._busy.release()
+        self._on_done(res, None)
+
+    def start_auto(self, interval_seconds: float) -> None:
+        # Периодическое обновление; тик пропускается, если прошлое ещё идёт
+        if interval_seconds <= 0 or self._auto is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(interval_seconds):
+                self.start()
+
+        self._auto = threading.Thread(target=loop, name="rates-auto", daemon=True)
+        self._auto.start()
+
+    def stop_auto(self) -> None:
+        self._stop.set()
+        self._auto = None
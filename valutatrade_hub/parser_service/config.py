@@ -4,6 +4,8 @@ import os
 from dataclasses import dataclass
 from pathlib import Path
 
+from ..core.currencies import coingecko_ids
+
 
 @dataclass(frozen=True)
 class ParserConfig:
@@ -11,7 +13,12 @@ class ParserConfig:
 
     # URL
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
+    COINGECKO_HISTORY_URL: str = (
+        "https://api.coingecko.com/api/v3/coins/{id}/market_chart/range"
+    )
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
+    BINANCE_URL: str = "https://api.binance.com/api/v3/ticker/price"
+    FRANKFURTER_URL: str = "https://api.frankfurter.app/latest"
 
     # База
     BASE_FIAT_CURRENCY: str = "USD"
@@ -26,17 +33,87 @@ class ParserConfig:
     # Таймаут
     REQUEST_TIMEOUT: int = 10
 
+    # CoinGecko: размер куска ids, параллельность и повторы упавших кусков
+    COINGECKO_CHUNK_SIZE: int = 100
+    COINGECKO_MAX_CONCURRENCY: int = 4
+    COINGECKO_MAX_RETRIES: int = 2
+    # Базовая пауза между повторами, секунды (растёт вдвое, с джиттером)
+    COINGECKO_RETRY_BACKOFF: float = 0.5
+
+    # Бюджет запросов: (ёмкость bucket, токенов в секунду), общий для хоста
+    COINGECKO_RATE_LIMIT: tuple[float, float] = (30, 0.5)
+    # Бесплатный план ExchangeRate-API: ~1500 запросов в месяц
+    EXCHANGERATE_RATE_LIMIT: tuple[float, float] = (10, 1500 / (30 * 86400))
+    # Резервные источники без ключа: лимиты с запасом от публичных
+    BINANCE_RATE_LIMIT: tuple[float, float] = (60, 5.0)
+    FRANKFURTER_RATE_LIMIT: tuple[float, float] = (10, 0.2)
+    # Сколько ждать токен, прежде чем отдать ответ из кеша
+    RATE_LIMIT_MAX_WAIT: float = 5.0
+
+    # Группы взаимозаменяемых источников (первый — основной) и режим опроса:
+    # single — только основной, hedged — резерв, если основной не ответил
+    # за HEDGE_PERCENTILE своих задержек, quorum — медиана первых QUORUM_SIZE
+    # ответов без выбросов дальше QUORUM_MAX_DEVIATION (доля) от медианы
+    SOURCE_GROUPS: tuple[tuple[str, ...], ...] = (
+        ("CoinGecko", "Binance"),
+        ("ExchangeRate-API", "Frankfurter"),
+    )
+    FETCH_MODE: str = "hedged"
+    HEDGE_PERCENTILE: float = 0.95
+    # Задержка резерва, пока нет статистики, и её нижняя граница, сек
+    HEDGE_DEFAULT_DELAY: float = 1.0
+    HEDGE_MIN_DELAY: float = 0.05
+    # Ответов для кворума (не больше размера группы). Выброс отбрасывается
+    # большинством, то есть от 3 источников; при двух — только спор
+    QUORUM_SIZE: int = 3
+    QUORUM_MAX_DEVIATION: float = 0.02
+
+    # Адаптивный планировщик: границы интервала опроса по источнику, сек
+    POLL_INTERVALS: tuple[tuple[str, int, int], ...] = (
+        ("CoinGecko", 30, 900),
+        ("ExchangeRate-API", 900, 6 * 3600),
+    )
+    POLL_DEFAULT_INTERVALS: tuple[int, int] = (60, 3600)
+    # Допустимое движение курса между опросами (доля) и окно оценки волатильности
+    POLL_TARGET_MOVE: float = 0.002
+    POLL_VOLATILITY_WINDOW_SECONDS: int = 3600
+
+    # Автообновление курсов в фоне интерактивного CLI (0 — выключено)
+    AUTO_REFRESH_SECONDS: int = 0
+
+    # Выбор лидера среди экземпляров планировщика: файл аренды и её срок, сек
+    SCHEDULER_LEASE_PATH: str = "data/scheduler.lease"
+    SCHEDULER_LEASE_SECONDS: int = 30
+
+    # Догрузка истории: параллельность, размер пачки записи (точек),
+    # предельное ожидание лимита до остановки задания и файл прогресса
+    BACKFILL_WORKERS: int = 4
+    BACKFILL_FLUSH_POINTS: int = 50_000
+    BACKFILL_MAX_WAIT_SECONDS: float = 60.0
+    BACKFILL_CHECKPOINT_PATH: str = "data/backfill.checkpoint.json"
+
     # Пути
     RATES_FILE_PATH: str = "data/rates.json"
     HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_DIR: str = "data/history"
+    RATE_LIMIT_DIR: str = "data/ratelimit"
+
+    # Сжатие закрытых сегментов истории: zlib / lzma
+    HISTORY_CODEC: str = "zlib"
+
+    # Сколько хранить уровни истории (None — бессрочно)
+    HISTORY_RAW_RETENTION_SECONDS: int = 7 * 86400
+    HISTORY_1M_RETENTION_SECONDS: int = 90 * 86400
+    HISTORY_1H_RETENTION_SECONDS: int = 2 * 365 * 86400
+    HISTORY_1D_RETENTION_SECONDS: int | None = None
 
     def __post_init__(self) -> None:
-        # Дефолт для dict в dataclass
+        # Дефолт для dict в dataclass: coin id берём из реестра валют
         if self.CRYPTO_ID_MAP is None:
             object.__setattr__(
                 self,
                 "CRYPTO_ID_MAP",
-                {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana"},
+                coingecko_ids(self.CRYPTO_CURRENCIES),
             )
 
     @property
@@ -46,3 +123,31 @@ class ParserConfig:
     @property
     def history_path(self) -> Path:
         return Path(self.HISTORY_FILE_PATH)
+
+    @property
+    def rate_limit_dir(self) -> Path:
+        return Path(self.RATE_LIMIT_DIR)
+
+    @property
+    def history_dir(self) -> Path:
+        return Path(self.HISTORY_DIR)
+
+    @property
+    def lease_path(self) -> Path:
+        return Path(self.SCHEDULER_LEASE_PATH)
+
+    def poll_bounds(self, source: str) -> tuple[int, int]:
+        # (min, max) интервал опроса источника
+        for name, lo, hi in self.POLL_INTERVALS:
+            if name.lower() == source.lower():
+                return lo, hi
+        return self.POLL_DEFAULT_INTERVALS
+
+    @property
+    def history_retention(self) -> dict[str, int | None]:
+        return {
+            "raw": self.HISTORY_RAW_RETENTION_SECONDS,
+            "1m": self.HISTORY_1M_RETENTION_SECONDS,
+            "1h": self.HISTORY_1H_RETENTION_SECONDS,
+            "1d": self.HISTORY_1D_RETENTION_SECONDS,
+        }
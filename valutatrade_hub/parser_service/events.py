@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from ..infra.filelock import FileLock
+
+
+@dataclass(frozen=True)
+class RatesChangedEvent:
+    # Версия снимка и пары, чей курс изменился
+    version: int
+    pairs: frozenset[str]
+    updated_at: str | None = None
+    # True — потребитель пропустил слишком много версий, сбросить всё
+    full: bool = False
+    # pair -> (старый курс или None, новый курс); только внутри процесса
+    moves: dict[str, tuple[float | None, float]] = field(
+        default_factory=dict, hash=False, compare=False
+    )
+
+
+Subscriber = Callable[[RatesChangedEvent], None]
+
+
+class RatesEventBus:
+    # Подписчики внутри процесса получают событие сразу после записи
+    def __init__(self) -> None:
+        self._subscribers: list[Subscriber] = []
+        self._lock = threading.Lock()
+        self._log = logging.getLogger(__name__)
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def publish(self, event: RatesChangedEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                # Сбой подписчика не должен ломать обновление курсов
+                self._log.error(f"Rates subscriber failed: {e}")
+
+
+# Общая шина процесса
+rates_bus = RatesEventBus()
+
+
+class RatesVersionFile:
+    """
+    Межпроцессное уведомление: маленький файл с номером версии курсов
+    и журналом последних изменённых пар. Читатели сначала смотрят mtime,
+    JSON разбирают только при изменении.
+    """
+
+    LOG_SIZE = 32
+
+    def __init__(self, path: Path) -> None:
+        self._path = Path(path)
+        self._lock = FileLock(self._path.with_name(self._path.name + ".lock"))
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def read_state(self) -> dict:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"version": 0, "log": []}
+
+    def current(self) -> int:
+        return int(self.read_state().get("version", 0))
+
+    def bump(
+        self,
+        pairs: set[str],
+        updated_at: str | None,
+        moves: dict[str, tuple[float | None, float]] | None = None,
+    ) -> RatesChangedEvent:
+        # Следующая версия (под межпроцессной блокировкой)
+        with self._lock:
+            state = self.read_state()
+            version = int(state.get("version", 0)) + 1
+            log = list(state.get("log", []))
+            log.append({"version": version, "pairs": sorted(pairs)})
+            state = {
+                "version": version,
+                "updated_at": updated_at,
+                "log": log[-self.LOG_SIZE :],
+            }
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._path.with_suffix(self._path.suffix + ".tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            tmp.replace(self._path)
+        return RatesChangedEvent(
+            version, frozenset(pairs), updated_at, moves=dict(moves or {})
+        )
+
+
+class RatesVersionWatcher:
+    # Опрос версии из другого процесса: poll() дёшев, пока файл не менялся
+    def __init__(self, version_file: RatesVersionFile, seen: int | None = None) -> None:
+        self._file = version_file
+        self._seen = version_file.current() if seen is None else int(seen)
+        self._mtime_ns: int | None = None
+
+    @property
+    def seen(self) -> int:
+        return self._seen
+
+    def poll(self) -> RatesChangedEvent | None:
+        try:
+            mtime_ns = os.stat(self._file.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime_ns == self._mtime_ns:
+            return None
+        self._mtime_ns = mtime_ns
+
+        state = self._file.read_state()
+        version = int(state.get("version", 0))
+        if version <= self._seen:
+            return None
+
+        log = state.get("log", [])
+        missed = [x for x in log if int(x["version"]) > self._seen]
+        full = not missed or int(missed[0]["version"]) != self._seen + 1
+        pairs: set[str] = set()
+        for x in missed:
+            pairs.update(x["pairs"])
+        self._seen = version
+        return RatesChangedEvent(
+            version, frozenset(pairs), state.get("updated_at"), full=full
+        )
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from .api_clients import (
+    BinanceClient,
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+    FrankfurterClient,
+)
+from .config import ParserConfig
+from .history import HistoryStore
+from .offline_clients import RecordingClient
+from .rate_limiter import TokenBucketLimiter
+from .redundancy import RedundantFetcher, build_source_groups
+from .storage import RatesStorage
+from .updater import RatesUpdater
+
+# Сборка хранилища, клиентов и обновлятора из ParserConfig —
+# общая для CLI, планировщика и дозагрузки истории
+
+
+def make_storage(cfg: ParserConfig) -> RatesStorage:
+    # Кеш курсов + сегментированная история
+    history = HistoryStore(
+        cfg.history_dir,
+        codec=cfg.HISTORY_CODEC,
+        retention_seconds=cfg.history_retention,
+    )
+    return RatesStorage(
+        rates_path=cfg.rates_path,
+        history_path=cfg.history_path,
+        history=history,
+    )
+
+
+def _limit(client, limit: tuple[float, float], cfg: ParserConfig):
+    # Общий (межпроцессный) бюджет запросов клиента
+    capacity, per_second = limit
+    limiter = TokenBucketLimiter(
+        cfg.rate_limit_dir, client.SOURCE, capacity, per_second
+    )
+    client.use_limiter(limiter, max_wait=cfg.RATE_LIMIT_MAX_WAIT)
+    return client
+
+
+def _recorded(clients: list, record: Path | None) -> list:
+    # С record ответы клиентов дописываются в JSONL для ReplayClient
+    if record is None:
+        return clients
+    return [RecordingClient(c, record) for c in clients]
+
+
+def make_fetcher(
+    cfg: ParserConfig, clients: list, record: Path | None = None
+) -> RedundantFetcher:
+    # Основные клиенты + резервные источники, сгруппированные по SOURCE_GROUPS
+    backups = [
+        _limit(
+            BinanceClient(
+                cfg.BINANCE_URL, cfg.CRYPTO_CURRENCIES, timeout=cfg.REQUEST_TIMEOUT
+            ),
+            cfg.BINANCE_RATE_LIMIT,
+            cfg,
+        ),
+        _limit(
+            FrankfurterClient(
+                cfg.FRANKFURTER_URL,
+                cfg.BASE_FIAT_CURRENCY,
+                cfg.FIAT_CURRENCIES,
+                timeout=cfg.REQUEST_TIMEOUT,
+            ),
+            cfg.FRANKFURTER_RATE_LIMIT,
+            cfg,
+        ),
+    ]
+    backups = _recorded(backups, record)
+    return RedundantFetcher(
+        build_source_groups(cfg.SOURCE_GROUPS, clients + backups),
+        mode=cfg.FETCH_MODE,
+        hedge_percentile=cfg.HEDGE_PERCENTILE,
+        hedge_default_delay=cfg.HEDGE_DEFAULT_DELAY,
+        hedge_min_delay=cfg.HEDGE_MIN_DELAY,
+        quorum=cfg.QUORUM_SIZE,
+        max_deviation=cfg.QUORUM_MAX_DEVIATION,
+    )
+
+
+def make_clients(cfg: ParserConfig) -> list:
+    # Основные клиенты API; резервные подключает make_fetcher
+    coingecko = CoinGeckoClient(
+        cfg.COINGECKO_URL,
+        cfg.CRYPTO_ID_MAP,
+        timeout=cfg.REQUEST_TIMEOUT,
+        chunk_size=cfg.COINGECKO_CHUNK_SIZE,
+        max_concurrency=cfg.COINGECKO_MAX_CONCURRENCY,
+        max_retries=cfg.COINGECKO_MAX_RETRIES,
+        history_url=cfg.COINGECKO_HISTORY_URL,
+        retry_backoff=cfg.COINGECKO_RETRY_BACKOFF,
+    )
+    exchangerate = ExchangeRateApiClient(
+        cfg.EXCHANGERATE_API_URL,
+        cfg.EXCHANGERATE_API_KEY,
+        cfg.BASE_FIAT_CURRENCY,
+        timeout=cfg.REQUEST_TIMEOUT,
+    )
+    return [
+        _limit(coingecko, cfg.COINGECKO_RATE_LIMIT, cfg),
+        _limit(exchangerate, cfg.EXCHANGERATE_RATE_LIMIT, cfg),
+    ]
+
+
+def make_updater(record: Path | None = None) -> RatesUpdater:
+    cfg = ParserConfig()
+    clients = _recorded(make_clients(cfg), record)
+    return RatesUpdater(
+        clients=clients,
+        storage=make_storage(cfg),
+        fetcher=make_fetcher(cfg, clients, record),
+    )
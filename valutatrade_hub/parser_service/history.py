@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import json
+import logging
+import lzma
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable
+
+from ..infra.codecs import write_tmp
+from ..infra.filelock import FileLock
+from ..infra.jsonstream import is_blank_file, iter_chunks, iter_json_array
+
+# Уровни истории: имя -> шаг бара в секундах (raw — сырые точки)
+TIERS: dict[str, int] = {"raw": 0, "1m": 60, "1h": 3600, "1d": 86400}
+
+# Длина сегмента по уровням (файлы выровнены по epoch)
+SEGMENT_SPAN: dict[str, int] = {
+    "raw": 86400,
+    "1m": 86400,
+    "1h": 86400 * 30,
+    "1d": 86400 * 360,
+}
+
+# Кодеки для закрытых сегментов
+_CODECS = {
+    "zlib": (".zz", zlib.compress, zlib.decompress),
+    "lzma": (".xz", lzma.compress, lzma.decompress),
+}
+_OPEN_SUFFIX = ".jsonl"
+
+
+def iso_to_epoch(value: Any) -> int:
+    # ISO (с Z) или число -> epoch-секунды UTC
+    if isinstance(value, (int, float)):
+        return int(value)
+    s = str(value).strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def epoch_to_iso(ts: int) -> str:
+    return (
+        datetime.fromtimestamp(int(ts), tz=timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z")
+    )
+
+
+def _align(ts: int, span: int) -> int:
+    return ts - ts % span
+
+
+def rollup(points: Iterable[dict], step: int) -> list[dict]:
+    # Сворачиваем точки/бары в OHLC-бары шага step
+    bars: dict[tuple[str, int], dict] = {}
+    for p in sorted(points, key=lambda x: x["ts"]):
+        key = (p["pair"], _align(int(p["ts"]), step))
+        o = p.get("open", p.get("rate"))
+        h = p.get("high", o)
+        lo = p.get("low", o)
+        c = p.get("close", o)
+        n = int(p.get("count", 1))
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {
+                "pair": key[0],
+                "ts": key[1],
+                "open": o,
+                "high": h,
+                "low": lo,
+                "close": c,
+                "count": n,
+            }
+            continue
+        bar["high"] = max(bar["high"], h)
+        bar["low"] = min(bar["low"], lo)
+        bar["close"] = c
+        bar["count"] += n
+    return sorted(bars.values(), key=lambda b: (b["ts"], b["pair"]))
+
+
+def _as_bar(row: dict) -> dict:
+    # Сырую точку отдаём в том же виде, что и бар
+    if "open" in row:
+        return row
+    r = float(row["rate"])
+    return {
+        "pair": row["pair"],
+        "ts": int(row["ts"]),
+        "open": r,
+        "high": r,
+        "low": r,
+        "close": r,
+        "count": 1,
+        "source": row.get("source"),
+    }
+
+
+class HistoryStore:
+    """
+    Сегментированная история курсов.
+
+    data/history/<tier>/<start>.jsonl — открытый сырой сегмент (дописывается),
+    data/history/<tier>/<start>.jsonl.zz|.xz — закрытый сжатый сегмент.
+    При закрытии сырого сегмента точки сворачиваются в OHLC-уровни 1m/1h/1d,
+    а устаревшие сегменты удаляются по политике хранения.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        codec: str = "zlib",
+        retention_seconds: dict[str, int | None] | None = None,
+    ) -> None:
+        if codec not in _CODECS:
+            raise ValueError(f"Неизвестный кодек истории: {codec}")
+        self._root = Path(root)
+        self._codec = codec
+        self._retention: dict[str, int | None] = {
+            "raw": 7 * 86400,
+            "1m": 90 * 86400,
+            "1h": 2 * 365 * 86400,
+            "1d": None,
+        }
+        if retention_seconds:
+            self._retention.update(retention_seconds)
+        # start -> (размер открытого сегмента, id): кэш сверяется с размером,
+        # дописи других процессов перечитываются
+        self._seen_ids: dict[int, tuple[int, set[str]]] = {}
+        # Дописи и обслуживание разных процессов идут по очереди
+        self._lock = FileLock(self._root / "history.lock")
+        self._log = logging.getLogger(__name__)
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    # --- файлы сегментов ---
+
+    def _dir(self, tier: str) -> Path:
+        return self._root / tier
+
+    def _segments(self, tier: str) -> list[tuple[int, Path, bool]]:
+        # [(start, path, is_open)] по возрастанию start
+        d = self._dir(tier)
+        if not d.exists():
+            return []
+        out = []
+        for p in d.iterdir():
+            name = p.name
+            start_str = name.split(".", 1)[0]
+            if not start_str.isdigit() or name.endswith(".tmp"):
+                continue
+            out.append((int(start_str), p, name.endswith(_OPEN_SUFFIX)))
+        out.sort(key=lambda x: (x[0], not x[2]))
+        return out
+
+    def _read_segment(self, path: Path) -> list[dict]:
+        data = path.read_bytes()
+        for suffix, _, decompress in _CODECS.values():
+            if path.name.endswith(suffix):
+                data = decompress(data)
+                break
+        rows = []
+        for line in data.decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # Оборванная строка после падения — пропускаем
+                continue
+        return rows
+
+    def _write_closed(self, tier: str, start: int, rows: list[dict]) -> Path:
+        suffix, compress, _ = _CODECS[self._codec]
+        d = self._dir(tier)
+        d.mkdir(parents=True, exist_ok=True)
+        path = d / f"{start}{_OPEN_SUFFIX}{suffix}"
+        text = "\n".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")) for r in rows
+        )
+        write_tmp(path, compress(text.encode("utf-8"))).replace(path)
+        # Сегмент мог быть записан другим кодеком — убираем дубликаты
+        for other, _, _ in _CODECS.values():
+            if other != suffix:
+                old = d / f"{start}{_OPEN_SUFFIX}{other}"
+                if old.exists():
+                    old.unlink()
+        return path
+
+    # --- запись ---
+
+    def append(self, entries: list[dict]) -> int:
+        # Дописываем сырые точки в открытые сегменты (без дублей по id)
+        with self._lock:
+            return self._append(entries)
+
+    def _append(self, entries: list[dict]) -> int:
+        by_segment: dict[int, list[dict]] = {}
+        span = SEGMENT_SPAN["raw"]
+        for e in entries:
+            ts = iso_to_epoch(e["timestamp"]) if "timestamp" in e else int(e["ts"])
+            pair = e.get("pair") or f"{e['from_currency']}_{e['to_currency']}"
+            row = {
+                "id": e.get("id") or f"{pair}_{epoch_to_iso(ts)}",
+                "pair": str(pair).upper(),
+                "ts": ts,
+                "rate": float(e["rate"]),
+                "source": e.get("source"),
+            }
+            by_segment.setdefault(_align(ts, span), []).append(row)
+
+        added = 0
+        d = self._dir("raw")
+        d.mkdir(parents=True, exist_ok=True)
+        for start, rows in sorted(by_segment.items()):
+            path = d / f"{start}{_OPEN_SUFFIX}"
+            size = path.stat().st_size if path.exists() else 0
+            cached = self._seen_ids.get(start)
+            if cached is not None and cached[0] == size:
+                seen = cached[1]
+            else:
+                seen = {r.get("id") for r in self._read_raw_day(start)}
+            lines = []
+            for r in rows:
+                if r["id"] in seen:
+                    continue
+                seen.add(r["id"])
+                lines.append(
+                    json.dumps(r, ensure_ascii=False, separators=(",", ":"))
+                )
+            if not lines:
+                self._seen_ids[start] = (size, seen)
+                continue
+            with path.open("a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            self._seen_ids[start] = (path.stat().st_size, seen)
+            added += len(lines)
+        return added
+
+    def _read_raw_day(self, start: int) -> list[dict]:
+        rows: list[dict] = []
+        for s, path, _ in self._segments("raw"):
+            if s == start:
+                rows.extend(self._read_segment(path))
+        return rows
+
+    # --- обслуживание ---
+
+    def maintain(self, now: int | None = None) -> dict[str, int]:
+        # Закрываем завершённые сегменты, сворачиваем в уровни, чистим старое.
+        # Под блокировкой: чужая дозапись между чтением и unlink не теряется
+        with self._lock:
+            return self._maintain(now)
+
+    def _maintain(self, now: int | None) -> dict[str, int]:
+        now = int(time.time()) if now is None else int(now)
+        span = SEGMENT_SPAN["raw"]
+        # Бары всех закрываемых дней сливаются в уровни одним проходом:
+        # сегмент 1h/1d переписывается раз, а не на каждый день (догрузка)
+        closing = []
+        bars: dict[str, list[dict]] = {"1m": [], "1h": [], "1d": []}
+        for start, path, is_open in self._segments("raw"):
+            if not is_open or start + span > now:
+                continue
+            rows = self._read_raw_day(start)
+            rows.sort(key=lambda r: (r["ts"], r["pair"]))
+            for tier in bars:
+                bars[tier].extend(rollup(rows, TIERS[tier]))
+            closing.append((start, path, rows))
+        for tier, tier_bars in bars.items():
+            if tier_bars:
+                self._merge_tier(tier, tier_bars)
+        # Сырые сегменты закрываем после уровней — сбой не теряет свёртку
+        for start, path, rows in closing:
+            self._write_closed("raw", start, rows)
+            path.unlink()
+            self._seen_ids.pop(start, None)
+        closed = len(closing)
+
+        dropped = 0
+        for tier, keep in self._retention.items():
+            if keep is None:
+                continue
+            tier_span = SEGMENT_SPAN[tier]
+            for start, path, is_open in self._segments(tier):
+                if is_open or start + tier_span > now - keep:
+                    continue
+                path.unlink()
+                dropped += 1
+
+        if closed or dropped:
+            self._log.info(
+                "History maintenance: closed=%s dropped=%s", closed, dropped
+            )
+        return {"closed": closed, "dropped": dropped}
+
+    def _merge_tier(self, tier: str, bars: list[dict]) -> None:
+        span = SEGMENT_SPAN[tier]
+        by_segment: dict[int, list[dict]] = {}
+        for b in bars:
+            by_segment.setdefault(_align(b["ts"], span), []).append(b)
+        for start, new_bars in by_segment.items():
+            merged: dict[tuple[str, int], dict] = {}
+            for s, path, _ in self._segments(tier):
+                if s == start:
+                    for b in self._read_segment(path):
+                        merged[(b["pair"], b["ts"])] = b
+            for b in new_bars:
+                merged[(b["pair"], b["ts"])] = b
+            rows = sorted(merged.values(), key=lambda b: (b["ts"], b["pair"]))
+            self._write_closed(tier, start, rows)
+
+    def import_legacy(self, path: Path) -> int:
+        # Переносим старый exchange_rates.json в сегменты потоком, пачками
+        if not path.exists() or is_blank_file(path):
+            return 0
+        added = 0
+        try:
+            records = iter_json_array(path)
+            for batch in iter_chunks(records, 50_000):
+                added += self.append([r for r in batch if isinstance(r, dict)])
+        except ValueError:
+            # Не массив или битый файл: оставляем как есть
+            return added
+        if not added:
+            return 0
+        path.write_text("[]", encoding="utf-8")
+        self._log.info("Legacy history imported: %s records", added)
+        return added
+
+    # --- чтение ---
+
+    @staticmethod
+    def pick_tier(resolution_seconds: int) -> str:
+        # Самый грубый уровень, шаг которого не больше запрошенного
+        best = "raw"
+        for name, step in TIERS.items():
+            if step <= resolution_seconds and step >= TIERS[best]:
+                best = name
+        return best
+
+    def query(
+        self,
+        pair: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+        resolution_seconds: int = 0,
+    ) -> list[dict]:
+        # Бары (или сырые точки как бары) по паре и диапазону
+        rows = self._collect(pair, since, until, resolution_seconds)
+        return [row for row, _ in rows]
+
+    def _collect(
+        self,
+        pair: str | None,
+        since: int | None,
+        until: int | None,
+        resolution_seconds: int,
+    ) -> list[tuple[dict, int]]:
+        # [(бар, шаг его уровня)] по (ts, pair); шаг нужен, чтобы знать,
+        # когда close бара стал известен
+        tier = self.pick_tier(resolution_seconds)
+        lo = -1 if since is None else int(since)
+        hi = 2**62 if until is None else int(until)
+        pair = pair.upper() if pair else None
+
+        def overlaps(start: int, span: int) -> bool:
+            return start <= hi and start + span > lo
+
+        def keep(row: dict) -> bool:
+            return (pair is None or row["pair"] == pair) and lo <= row["ts"] <= hi
+
+        raw_span = SEGMENT_SPAN["raw"]
+        raw_segments = [
+            s for s in self._segments("raw") if overlaps(s[0], raw_span)
+        ]
+        out: list[tuple[dict, int]] = []
+
+        if tier == "raw":
+            raw_days = {s[0] for s in raw_segments}
+            for _, path, _ in raw_segments:
+                out.extend(
+                    (_as_bar(r), 0) for r in self._read_segment(path) if keep(r)
+                )
+            # Сырые точки удалены по retention — берём минутки
+            step = TIERS["1m"]
+            for start, path, _ in self._segments("1m"):
+                if start in raw_days or not overlaps(start, SEGMENT_SPAN["1m"]):
+                    continue
+                out.extend((r, step) for r in self._read_segment(path) if keep(r))
+        else:
+            span, step = SEGMENT_SPAN[tier], TIERS[tier]
+            for start, path, _ in self._segments(tier):
+                if overlaps(start, span):
+                    out.extend(
+                        (r, step) for r in self._read_segment(path) if keep(r)
+                    )
+            # Открытые сегменты ещё не свёрнуты — сворачиваем на лету
+            fresh: list[dict] = []
+            for _, path, is_open in raw_segments:
+                if is_open:
+                    fresh.extend(r for r in self._read_segment(path) if keep(r))
+            out.extend((b, step) for b in rollup(fresh, step))
+
+        out.sort(key=lambda x: (x[0]["ts"], x[0]["pair"]))
+        return out
+
+    def series(
+        self,
+        pair: str,
+        since: int | None = None,
+        until: int | None = None,
+        resolution_seconds: int = 0,
+    ) -> RateSeries:
+        rows = self._collect(pair, since, until, resolution_seconds)
+        return RateSeries.from_bars(pair.upper(), rows)
+
+    def rate_at(self, pair: str, ts: int) -> float | None:
+        # Курс на момент ts: сначала сырые точки за сутки, затем дневные бары
+        ts = int(ts)
+        rate = self.series(pair, ts - 86400, ts).at(ts)
+        if rate is None:
+            rate = self.series(pair, None, ts, TIERS["1d"]).at(ts)
+        return rate
+
+
+class RateSeries:
+    # Временной индекс пары: отсортированные ts (int64) и close (float64).
+    # ts — момент, когда курс стал известен: у бара это его конец, а не начало,
+    # иначе запрос внутри бара вернул бы close из будущего
+    __slots__ = ("pair", "ts", "close")
+
+    def __init__(self, pair: str, bars: Iterable[dict]) -> None:
+        self.pair = pair
+        self.ts = array("q")
+        self.close = array("d")
+        for b in bars:
+            self.ts.append(int(b["ts"]))
+            self.close.append(float(b["close"]))
+
+    @classmethod
+    def from_bars(cls, pair: str, rows: Iterable[tuple[dict, int]]) -> RateSeries:
+        # [(бар, шаг)] -> ряд по времени закрытия (сырая точка: шаг 0)
+        known = sorted(
+            ({"ts": int(b["ts"]) + step, "close": b["close"]} for b, step in rows),
+            key=lambda b: b["ts"],
+        )
+        return cls(pair, known)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def at(self, ts: int) -> float | None:
+        # Последний известный курс не позже ts (бинарный поиск)
+        i = bisect_right(self.ts, int(ts)) - 1
+        return self.close[i] if i >= 0 else None
+
+    def sample(self, times: Iterable[int]) -> list[float | None]:
+        # Курсы на отсортированной сетке времени за один проход (merge)
+        out: list[float | None] = []
+        ts, close = self.ts, self.close
+        n = len(ts)
+        j = -1
+        for t in times:
+            while j + 1 < n and ts[j + 1] <= t:
+                j += 1
+            out.append(close[j] if j >= 0 else None)
+        return out
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from ..infra.filelock import FileLock
+
+
+def default_owner_id() -> str:
+    # host:pid:случайный суффикс — уникален и после перезапуска с тем же pid
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+
+class LeaseElector:
+    """
+    Выбор лидера через файл аренды в общем каталоге данных.
+
+    Аренда — JSON {owner, expires_at, term}; чтение-изменение-запись идёт под
+    FileLock, поэтому одновременно её держит не больше одного экземпляра.
+    Лидер продлевает аренду каждые lease/3 секунд, последователи в тот же
+    такт пытаются её захватить и становятся лидером, как только она истекла.
+    term растёт при каждой смене владельца и служит маркером ограждения.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        owner_id: str | None = None,
+        lease_seconds: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._path = Path(path)
+        self._lock = FileLock(self._path.with_name(self._path.name + ".lock"))
+        self._mutex = threading.Lock()
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._log = logging.getLogger(__name__)
+        self.owner_id = owner_id or default_owner_id()
+        self.lease_seconds = float(lease_seconds)
+        self.term = 0
+        self._expires_at = 0.0
+        # Когда истекает чужая аренда — последователь пробует ровно к этому сроку
+        self._other_expires = 0.0
+
+    @property
+    def heartbeat_seconds(self) -> float:
+        return self.lease_seconds / 3
+
+    @property
+    def is_leader(self) -> bool:
+        # Лидер, пока своя аренда не истекла (даже если продление запаздывает)
+        return self.term > 0 and self._clock() < self._expires_at
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, lease: dict) -> None:
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        tmp.write_text(json.dumps(lease), encoding="utf-8")
+        tmp.replace(self._path)
+
+    def try_acquire(self) -> bool:
+        # Захват или продление аренды; True — этот экземпляр лидер
+        with self._mutex, self._lock:
+            now = self._clock()
+            lease = self._read()
+            owner = lease.get("owner")
+            expires = float(lease.get("expires_at", 0.0))
+            term = int(lease.get("term", 0))
+            if owner != self.owner_id and now < expires:
+                if self.term:
+                    self._log.warning("Leadership lost to %s", owner)
+                self.term = 0
+                self._other_expires = expires
+                return False
+            if owner != self.owner_id:
+                term += 1
+                self._log.info("Became leader (term %s)", term)
+            self._expires_at = now + self.lease_seconds
+            self._write(
+                {"owner": self.owner_id, "expires_at": self._expires_at, "term": term}
+            )
+            self.term = term
+            return True
+
+    def release(self) -> None:
+        # Добровольная передача: аренда истекает сразу
+        with self._mutex, self._lock:
+            lease = self._read()
+            if lease.get("owner") == self.owner_id:
+                lease["expires_at"] = 0.0
+                self._write(lease)
+            self.term = 0
+            self._expires_at = 0.0
+
+    def holds(self) -> bool:
+        # Ограждение перед записью: аренда не истекла и в файле наш срок
+        term = self.term
+        if not self.is_leader:
+            return False
+        lease = self._read()
+        return lease.get("owner") == self.owner_id and lease.get("term") == term
+
+    def _next_wait(self) -> float:
+        # Лидер продлевает раз в такт; последователь просыпается не позже
+        # истечения чужой аренды, поэтому захват занимает не больше lease
+        if self.term:
+            return self.heartbeat_seconds
+        until = self._other_expires - self._clock() + 0.01
+        return min(self.heartbeat_seconds, max(0.01, until))
+
+    def start_heartbeat(self) -> None:
+        # Фоновое продление/захват, чтобы долгие обновления не теряли аренду
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while True:
+                try:
+                    self.try_acquire()
+                except OSError as e:
+                    self._log.warning("Lease heartbeat failed: %s", e)
+                if self._stop.wait(self._next_wait()):
+                    return
+
+        self._thread = threading.Thread(target=loop, name="lease", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.release()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from ..core.exceptions import ApiRequestError
+from .api_clients import BaseApiClient
+
+
+class RecordingClient(BaseApiClient):
+    # Обёртка: пишет ответы реального клиента в JSONL для replay.
+    # Клиенты групп опрашиваются параллельно — строки пишем по одной
+    _write_lock = threading.Lock()
+
+    def __init__(self, inner: BaseApiClient, path: Path) -> None:
+        self._inner = inner
+        self._path = Path(path)
+        self.SOURCE = inner.SOURCE
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        rates, meta = self._inner.fetch_rates()
+        record = {"t": time.time(), "rates": rates, "meta": meta}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, self._path.open("a", encoding="utf-8") as f:
+            f.write(line)
+        return rates, meta
+
+
+class ReplayClient(BaseApiClient):
+    """
+    Проигрывает записанные ответы по порядку.
+    speed=1 — с исходными интервалами, speed=10 — в 10 раз быстрее,
+    speed=0 — без пауз (для бенчмарков пропускной способности).
+    """
+
+    def __init__(self, path: Path, speed: float = 0.0, loop: bool = False) -> None:
+        self._records: list[dict] = []
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                self._records.append(json.loads(line))
+        if not self._records:
+            raise ValueError(f"Пустая запись: {path}")
+        self._speed = float(speed)
+        self._loop = loop
+        self._pos = 0
+        self._last_t: float | None = None
+        self._last_wall: float | None = None
+        self.SOURCE = str(self._records[0]["meta"].get("source", "Replay"))
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        if self._pos >= len(self._records):
+            if not self._loop:
+                raise ApiRequestError(f"{self.SOURCE}: запись закончилась")
+            self._pos = 0
+            self._last_t = None
+        record = self._records[self._pos]
+        self._pos += 1
+
+        # Выдерживаем исходный интервал, делённый на speed
+        if self._speed > 0 and self._last_t is not None:
+            gap = (record["t"] - self._last_t) / self._speed
+            sleep = gap - (time.monotonic() - self._last_wall)
+            if sleep > 0:
+                time.sleep(sleep)
+        self._last_t = record["t"]
+        self._last_wall = time.monotonic()
+
+        meta = dict(record["meta"])
+        meta["replay"] = True
+        return dict(record["rates"]), meta
+
+
+class SyntheticMarketClient(BaseApiClient):
+    """
+    Синтетический рынок: геометрическое случайное блуждание цен.
+    Детерминирован при фиксированном seed; realtime=True выдерживает
+    частоту frequency (тиков в секунду), иначе отдаёт тики без пауз.
+    """
+
+    SOURCE = "Synthetic"
+
+    def __init__(
+        self,
+        n_pairs: int = 1000,
+        frequency: float = 1.0,
+        volatility: float = 0.001,
+        seed: int = 42,
+        quote: str = "USD",
+        realtime: bool = False,
+    ) -> None:
+        self._rng = random.Random(seed)
+        self._frequency = float(frequency)
+        self._volatility = float(volatility)
+        self._realtime = realtime
+        self._tick = 0
+        self._next_at: float | None = None
+        self._prices: dict[str, float] = {
+            f"S{i:04d}_{quote}": math.exp(self._rng.uniform(-3.0, 10.0))
+            for i in range(int(n_pairs))
+        }
+
+    def fetch_rates(self) -> tuple[dict[str, float], dict[str, Any]]:
+        if self._realtime and self._frequency > 0:
+            now = time.monotonic()
+            if self._next_at is not None and now < self._next_at:
+                time.sleep(self._next_at - now)
+            self._next_at = max(now, self._next_at or now) + 1.0 / self._frequency
+
+        gauss = self._rng.gauss
+        sigma = self._volatility
+        for pair, price in self._prices.items():
+            self._prices[pair] = price * math.exp(gauss(0.0, sigma))
+        self._tick += 1
+
+        meta = {
+            "source": self.SOURCE,
+            "request_ms": 0,
+            "status_code": 200,
+            "etag": None,
+            "raw": {"tick": self._tick, "pairs": len(self._prices)},
+        }
+        return dict(self._prices), meta
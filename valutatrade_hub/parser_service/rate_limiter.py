@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from ..core.exceptions import RateLimitExceededError
+from ..infra.filelock import FileLock
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket для одного внешнего источника.
+    Состояние лежит в маленьком файле под FileLock, поэтому бюджет
+    общий для всех процессов на хосте (scheduler, CLI update-rates).
+    """
+
+    def __init__(
+        self,
+        state_dir: Path,
+        source: str,
+        capacity: float,
+        refill_per_second: float,
+    ) -> None:
+        self._source = source
+        name = source.lower().replace(" ", "-")
+        self._state_path = Path(state_dir) / f"{name}.json"
+        self._lock = FileLock(Path(state_dir) / f"{name}.lock")
+        self._capacity = float(capacity)
+        self._rate = float(refill_per_second)
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @property
+    def refill_per_second(self) -> float:
+        return self._rate
+
+    def _load(self, now: float) -> dict:
+        try:
+            state = json.loads(self._state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        tokens = float(state.get("tokens", self._capacity))
+        updated = float(state.get("updated", now))
+        blocked_until = float(state.get("blocked_until", 0.0))
+        # Доливаем токены за прошедшее время
+        tokens = min(self._capacity, tokens + max(0.0, now - updated) * self._rate)
+        return {"tokens": tokens, "updated": now, "blocked_until": blocked_until}
+
+    def _save(self, state: dict) -> None:
+        self._state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        tmp.replace(self._state_path)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        # 0.0 — токены списаны, иначе сколько секунд ждать
+        with self._lock:
+            now = time.time()
+            state = self._load(now)
+            if state["blocked_until"] > now:
+                wait = state["blocked_until"] - now
+            elif state["tokens"] >= tokens:
+                state["tokens"] -= tokens
+                wait = 0.0
+            elif self._rate > 0:
+                wait = (tokens - state["tokens"]) / self._rate
+            else:
+                wait = float("inf")
+            self._save(state)
+        return wait
+
+    def acquire(self, tokens: float = 1.0, max_wait: float = 0.0) -> None:
+        # Ждём не дольше max_wait, иначе RateLimitExceededError
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            left = deadline - time.monotonic()
+            if wait > left:
+                raise RateLimitExceededError(self._source, wait)
+            time.sleep(wait)
+
+    def penalize(self, retry_after: float | None = None) -> None:
+        # Сервер ответил 429: обнуляем бюджет и блокируем до retry_after
+        with self._lock:
+            now = time.time()
+            state = self._load(now)
+            state["tokens"] = 0.0
+            if retry_after:
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+            self._save(state)
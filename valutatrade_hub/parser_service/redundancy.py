@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import logging
+import statistics
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from time import perf_counter
+from typing import Any, Iterator
+
+from ..core.exceptions import RateLimitExceededError
+
+FETCH_MODES = ("single", "hedged", "quorum")
+
+
+class LatencyTracker:
+    # Скользящее окно задержек успешных ответов по источникам
+    def __init__(self, window: int = 50) -> None:
+        self._window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, source: str, seconds: float) -> None:
+        with self._lock:
+            q = self._samples.setdefault(source, deque(maxlen=self._window))
+            q.append(seconds)
+
+    def percentile(self, source: str, p: float) -> float | None:
+        with self._lock:
+            data = sorted(self._samples.get(source, ()))
+        if len(data) < 5:
+            return None
+        return data[min(len(data) - 1, int(p * len(data)))]
+
+
+# Общие на процесс: CLI создаёт updater на каждую команду
+latency_stats = LatencyTracker()
+_requests_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rates-fetch")
+
+
+def combine_quorum(
+    answers: list[tuple[str, dict[str, float]]],
+    previous: dict[str, float],
+    max_deviation: float,
+) -> tuple[dict[str, float], dict[str, list[str]], list[str]]:
+    """
+    Курс пары — медиана ответов без выбросов (отклонение от медианы больше
+    max_deviation). Выброс отбрасывается только большинством, поэтому для
+    этого нужно 3 и больше ответов. Два ответа либо согласны (расходятся не
+    больше чем на max_deviation) и дают среднее, либо пара спорная: какой
+    из двух врёт, не определить. Для спорной пары берётся значение,
+    ближайшее к прошлому курсу, а без него — основного источника.
+    Возвращает (курсы, выбросы {пара: [источники]}, спорные пары).
+    """
+    by_pair: dict[str, list[tuple[str, float]]] = {}
+    for source, rates in answers:
+        for pair, rate in rates.items():
+            by_pair.setdefault(pair, []).append((source, float(rate)))
+
+    out: dict[str, float] = {}
+    outliers: dict[str, list[str]] = {}
+    disputed: list[str] = []
+    for pair, values in by_pair.items():
+        if len(values) == 1:
+            out[pair] = values[0][1]
+            continue
+        med = statistics.median(v for _, v in values)
+        if len(values) == 2:
+            (_, a), (_, b) = values
+            if abs(a - b) <= max_deviation * abs(med):
+                out[pair] = med
+                continue
+            keep = []
+        else:
+            limit = max_deviation * abs(med)
+            keep = [(s, v) for s, v in values if abs(v - med) <= limit]
+        if len(keep) * 2 > len(values):
+            out[pair] = statistics.median(v for _, v in keep)
+            dropped = [s for s, v in values if (s, v) not in keep]
+            if dropped:
+                outliers[pair] = dropped
+            continue
+        disputed.append(pair)
+        prev = previous.get(pair)
+        if prev is not None:
+            out[pair] = min(values, key=lambda sv: abs(sv[1] - prev))[1]
+        else:
+            out[pair] = values[0][1]
+    return out, outliers, disputed
+
+
+class RedundantFetcher:
+    """
+    Получение курсов из групп взаимозаменяемых источников (первый — основной).
+    Группы опрашиваются параллельно, ответ группы — как у одного клиента
+    (rates, meta), meta["source"] — имя основного источника группы,
+    meta["provider"] — кто фактически ответил.
+
+    single — только основной источник;
+    hedged — если основной не ответил за hedge_percentile своих задержек
+    (или упал), запускается следующий; побеждает первый успешный ответ;
+    quorum — запрос ко всем, итог по первым quorum ответам: медиана
+    без выбросов (combine_quorum; отбрасывать выбросы может только группа
+    из 3+ источников, пара источников лишь выявляет спор).
+    Медленные запросы не дожидаются — они доживают в фоне до таймаута.
+    """
+
+    def __init__(
+        self,
+        groups: list[list],
+        mode: str = "hedged",
+        hedge_percentile: float = 0.95,
+        hedge_default_delay: float = 1.0,
+        hedge_min_delay: float = 0.05,
+        quorum: int = 3,
+        max_deviation: float = 0.02,
+        latency: LatencyTracker | None = None,
+    ) -> None:
+        if mode not in FETCH_MODES:
+            raise ValueError(
+                f"Неизвестный режим '{mode}'. Доступны: {', '.join(FETCH_MODES)}"
+            )
+        self._groups = [g for g in groups if g]
+        self._mode = mode
+        self._percentile = float(hedge_percentile)
+        self._default_delay = float(hedge_default_delay)
+        self._min_delay = float(hedge_min_delay)
+        self._quorum = max(1, int(quorum))
+        self._max_deviation = float(max_deviation)
+        self._latency = latency or latency_stats
+        self._pool = _requests_pool
+        self._log = logging.getLogger(__name__)
+
+    @property
+    def primaries(self) -> list:
+        return [g[0] for g in self._groups]
+
+    def _call(self, client) -> tuple[dict[str, float], dict[str, Any]]:
+        t0 = perf_counter()
+        rates, meta = client.fetch_rates()
+        self._latency.observe(client.SOURCE, perf_counter() - t0)
+        return rates, meta
+
+    def _hedge_delay(self, client) -> float:
+        p = self._latency.percentile(client.SOURCE, self._percentile)
+        return max(self._min_delay, self._default_delay if p is None else p)
+
+    def _hedged(self, group: list) -> tuple[dict[str, float], dict[str, Any]]:
+        running: dict[Future, Any] = {}
+        errors: list[Exception] = []
+        launched = 0
+
+        def launch() -> None:
+            nonlocal launched
+            client = group[launched]
+            running[self._pool.submit(self._call, client)] = client
+            launched += 1
+
+        launch()
+        delay = self._hedge_delay(group[0])
+        while running:
+            more = launched < len(group)
+            done, _ = wait(
+                running, timeout=delay if more else None, return_when=FIRST_COMPLETED
+            )
+            if not done:
+                # Основной медлит дольше своего перцентиля — страхуемся
+                self._log.info(
+                    "Hedging %s with %s", group[0].SOURCE, group[launched].SOURCE
+                )
+                launch()
+                continue
+            for fut in done:
+                client = running.pop(fut)
+                try:
+                    rates, meta = fut.result()
+                except Exception as e:
+                    errors.append(e)
+                    if launched < len(group):
+                        launch()
+                    continue
+                return rates, dict(
+                    meta,
+                    source=group[0].SOURCE,
+                    provider=client.SOURCE,
+                    hedged=launched > 1,
+                )
+        raise _pick_error(errors)
+
+    def _quorum_fetch(
+        self, group: list, previous: dict[str, float]
+    ) -> tuple[dict[str, float], dict[str, Any]]:
+        need = min(self._quorum, len(group))
+        running = {self._pool.submit(self._call, c): c for c in group}
+        answers: list[tuple[str, dict[str, float]]] = []
+        errors: list[Exception] = []
+        slowest = 0
+        while running and len(answers) < need:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                client = running.pop(fut)
+                try:
+                    rates, meta = fut.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                answers.append((client.SOURCE, rates))
+                slowest = max(slowest, int(meta.get("request_ms") or 0))
+        if not answers:
+            raise _pick_error(errors)
+        # Порядок ответов по группе: при споре без истории побеждает основной
+        order = {c.SOURCE: i for i, c in enumerate(group)}
+        answers.sort(key=lambda a: order[a[0]])
+        rates, outliers, disputed = combine_quorum(
+            answers, previous, self._max_deviation
+        )
+        for pair, sources in outliers.items():
+            self._log.warning("Outlier %s from %s dropped", pair, ",".join(sources))
+        meta = {
+            "source": group[0].SOURCE,
+            "provider": "+".join(s for s, _ in answers),
+            "request_ms": slowest,
+            "status_code": 200,
+            "etag": None,
+            # Кворум не собран: часть источников группы упала
+            "partial": len(answers) < need,
+            "raw": {"quorum": need, "answers": len(answers)},
+            "outliers": outliers,
+            "disputed": disputed,
+        }
+        return rates, meta
+
+    def _fetch_group(
+        self, group: list, previous: dict[str, float]
+    ) -> tuple[dict[str, float], dict[str, Any]]:
+        if self._mode == "quorum" and len(group) > 1:
+            return self._quorum_fetch(group, previous)
+        if self._mode == "hedged" and len(group) > 1:
+            return self._hedged(group)
+        rates, meta = self._call(group[0])
+        return rates, dict(meta, provider=group[0].SOURCE)
+
+    def fetch_all(
+        self, previous: dict[str, float], only_source: str | None = None
+    ) -> Iterator[tuple[str, dict | None, dict | None, Exception | None]]:
+        # (источник группы, rates, meta, ошибка) по мере готовности групп
+        groups = [
+            g
+            for g in self._groups
+            if not only_source
+            or any(c.SOURCE.lower() == only_source.lower() for c in g)
+        ]
+        # Отдельные потоки на группы: вложенные запросы идут в общий пул
+        runners = ThreadPoolExecutor(max_workers=max(1, len(groups)))
+        try:
+            futures = {
+                runners.submit(self._fetch_group, g, previous): g[0].SOURCE
+                for g in groups
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        rates, meta = fut.result()
+                    except Exception as e:
+                        yield futures[fut], None, None, e
+                        continue
+                    yield futures[fut], rates, meta, None
+        finally:
+            runners.shutdown(wait=False)
+
+
+def build_source_groups(spec, clients: list) -> list[list]:
+    # Группы клиентов по именам из конфига; клиент вне групп — сам по себе
+    by_name = {str(getattr(c, "SOURCE", "Unknown")): c for c in clients}
+    groups: list[list] = []
+    used: set[str] = set()
+    for names in spec:
+        group = [by_name[n] for n in names if n in by_name and n not in used]
+        used.update(getattr(c, "SOURCE", "Unknown") for c in group)
+        if group:
+            groups.append(group)
+    groups += [[c] for name, c in by_name.items() if name not in used]
+    return groups
+
+
+def _pick_error(errors: list[Exception]) -> Exception:
+    # Ограничение бюджета важнее сетевой ошибки: updater отдаст кеш
+    for e in errors:
+        if not isinstance(e, RateLimitExceededError):
+            return e
+    return errors[0]
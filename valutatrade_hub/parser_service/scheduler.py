@@ -1,23 +1,308 @@
 from __future__ import annotations
 
 import logging
+import math
 import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
 
+from .config import ParserConfig
+from .history import iso_to_epoch
+from .leader import LeaseElector
+from .storage import RatesStorage
 from .updater import RatesUpdater
 
 
 class SimpleScheduler:
-    # Простой цикл обновления
-    def __init__(self, updater: RatesUpdater, interval_seconds: int = 300) -> None:
+    # Простой цикл обновления; с elector опрашивает только лидер
+    def __init__(
+        self,
+        updater: RatesUpdater,
+        interval_seconds: int = 300,
+        elector: LeaseElector | None = None,
+    ) -> None:
         self._updater = updater
         self._interval = int(interval_seconds)
+        self._elector = elector
         self._log = logging.getLogger(__name__)
 
     def run_forever(self) -> None:
         self._log.info(f"Scheduler started. Interval={self._interval}s")
+        next_due = 0.0
         while True:
+            if self._elector is None or self._elector.is_leader:
+                if time.time() >= next_due:
+                    try:
+                        self._updater.run_update()
+                    except Exception as e:
+                        self._log.error(f"Scheduler update failed: {e}")
+                    next_due = time.time() + self._interval
+            wait = max(0.0, next_due - time.time())
+            if self._elector is not None:
+                # Последователь просыпается каждый такт аренды
+                wait = min(wait, self._elector.heartbeat_seconds)
+            time.sleep(max(0.5, wait))
+
+
+class VolatilityTracker:
+    """
+    Реализованная волатильность по парам: экспоненциально сглаженная
+    дисперсия лог-доходностей в единицу времени (r^2 / dt) с окном window.
+    На пару хранится одно число и последняя точка — память O(пар).
+    """
+
+    def __init__(self, window_seconds: float) -> None:
+        self._window = float(window_seconds)
+        self._last: dict[str, tuple[float, float]] = {}
+        self._var: dict[str, float] = {}
+
+    def observe(self, pair: str, ts: float, rate: float) -> None:
+        last = self._last.get(pair)
+        if rate <= 0 or (last is not None and ts <= last[0]):
+            return
+        self._last[pair] = (ts, rate)
+        if last is None:
+            return
+        dt = ts - last[0]
+        r = math.log(rate / last[1])
+        # Вес наблюдения растёт с интервалом: редкие опросы не теряют память
+        alpha = 1.0 - math.exp(-dt / self._window)
+        prev = self._var.get(pair)
+        sample = r * r / dt
+        self._var[pair] = sample if prev is None else prev + alpha * (sample - prev)
+
+    def seed(self, bars: Iterable[dict]) -> None:
+        # Начальная оценка по уже записанной истории (бары по возрастанию ts)
+        for b in bars:
+            self.observe(b["pair"], float(b["ts"]), float(b["close"]))
+
+    def value(self, pairs: Iterable[str]) -> float | None:
+        # Волатильность группы: самая подвижная пара, в долях на sqrt(секунду)
+        known = [self._var[p] for p in pairs if p in self._var]
+        return math.sqrt(max(known)) if known else None
+
+
+@dataclass
+class PollGroup:
+    # Источник курсов с собственным интервалом опроса
+    source: str
+    min_interval: float
+    max_interval: float
+    budget_floor: float = 0.0
+    interval: float = 0.0
+    next_due: float = 0.0
+    volatility: float | None = None
+
+    @property
+    def floor(self) -> float:
+        return min(self.max_interval, max(self.min_interval, self.budget_floor))
+
+
+def next_interval(
+    group: PollGroup, volatility: float | None, target_move: float
+) -> float:
+    # Интервал, за который ожидаемое движение vol*sqrt(t) равно target_move
+    if volatility is None:
+        wanted = group.floor
+    elif volatility <= 0:
+        wanted = group.max_interval
+    else:
+        wanted = (target_move / volatility) ** 2
+    if group.interval > 0:
+        # Не больше чем вдвое за шаг — без скачков от одного выброса
+        wanted = min(max(wanted, group.interval / 2), group.interval * 2)
+    return min(max(wanted, group.floor), group.max_interval)
+
+
+class AdaptiveScheduler:
+    """
+    Опрос источников с интервалом по волатильности их пар: быстрые движения
+    сокращают интервал, затишье растягивает его. Интервал ограничен
+    [min, max] источника и бюджетом запросов (min_poll_interval клиента).
+    С elector опрашивает только лидер; последователи следят за общим
+    снимком, держат оценки волатильности и сроки опроса актуальными и при
+    захвате аренды продолжают с того же места.
+    """
+
+    def __init__(
+        self,
+        updater: RatesUpdater,
+        storage: RatesStorage,
+        groups: list[PollGroup],
+        target_move: float = 0.002,
+        window_seconds: float = 3600,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        elector: LeaseElector | None = None,
+    ) -> None:
+        self._updater = updater
+        self._elector = elector
+        self._storage = storage
+        self._groups = groups
+        self._target = float(target_move)
+        self._window = float(window_seconds)
+        self._clock = clock
+        self._sleep = sleep
+        self._vol = VolatilityTracker(window_seconds)
+        self._log = logging.getLogger(__name__)
+        self._seeded = False
+
+    @property
+    def groups(self) -> list[PollGroup]:
+        return self._groups
+
+    def _group_pairs(self, pairs: dict) -> dict[str, list[tuple[str, dict]]]:
+        out: dict[str, list[tuple[str, dict]]] = {g.source: [] for g in self._groups}
+        for pair, entry in pairs.items():
+            if isinstance(entry, dict) and entry.get("source") in out:
+                out[entry["source"]].append((pair, entry))
+        return out
+
+    def _seed(self, now: float) -> None:
+        # Один раз читаем окно истории, дальше — только свежие снимки
+        self._seeded = True
+        try:
+            bars = self._storage.load_history(since=int(now - self._window))
+        except Exception as e:
+            self._log.warning(f"Volatility seed failed: {e}")
+            return
+        self._vol.seed(bars)
+
+    def step(self) -> list[str]:
+        # Опрашиваем источники, чей срок подошёл; возвращаем их имена
+        now = self._clock()
+        if not self._seeded:
+            self._seed(now)
+        if self._elector is not None and not self._elector.is_leader:
+            self._follow()
+            return []
+        due = [g for g in self._groups if g.next_due <= now]
+        if not due:
+            return []
+        for g in due:
             try:
-                self._updater.run_update()
+                self._updater.run_update(only_source=g.source)
             except Exception as e:
-                self._log.error(f"Scheduler update failed: {e}")
-            time.sleep(self._interval)
+                self._log.error(f"Scheduler update failed for {g.source}: {e}")
+        self._observe(due, self._clock())
+        for g in due:
+            self._log.info(
+                "Next poll of %s in %.0fs (volatility %s)",
+                g.source,
+                g.interval,
+                "n/a" if g.volatility is None else f"{g.volatility:.2e}",
+            )
+        return [g.source for g in due]
+
+    def _observe(self, groups: list[PollGroup], now: float | None) -> None:
+        # Новые точки из снимка -> волатильность, интервал и срок опроса.
+        # now=None: срок считаем от последнего обновления пар группы
+        by_source = self._group_pairs(self._storage.load_snapshot().get("pairs", {}))
+        for g in groups:
+            members = by_source.get(g.source, [])
+            last = 0.0
+            for pair, entry in members:
+                updated = entry.get("updated_at")
+                if updated:
+                    ts = iso_to_epoch(updated)
+                    last = max(last, ts)
+                    self._vol.observe(pair, ts, entry["rate"])
+            g.volatility = self._vol.value(p for p, _ in members)
+            g.interval = next_interval(g, g.volatility, self._target)
+            g.next_due = (last if now is None else now) + g.interval
+
+    def _follow(self) -> None:
+        # Последователь: без сети, только чтение снимка лидера
+        try:
+            self._observe(self._groups, None)
+        except Exception as e:
+            self._log.warning(f"Follower snapshot read failed: {e}")
+
+    def _wait(self) -> float:
+        wait = min(g.next_due for g in self._groups) - self._clock()
+        if self._elector is not None:
+            wait = min(wait, self._elector.heartbeat_seconds)
+        return max(0.5, wait)
+
+    def run_forever(self) -> None:
+        bounds = ", ".join(
+            f"{g.source} [{g.floor:.0f}..{g.max_interval:.0f}]s" for g in self._groups
+        )
+        self._log.info(f"Adaptive scheduler started: {bounds}")
+        while True:
+            self.step()
+            self._sleep(self._wait())
+
+
+def build_poll_groups(cfg: ParserConfig, clients: list) -> list[PollGroup]:
+    # Группа на источник: границы из конфига, пол — из бюджета запросов
+    groups = []
+    for client in clients:
+        source = str(getattr(client, "SOURCE", "Unknown"))
+        lo, hi = cfg.poll_bounds(source)
+        floor = getattr(client, "min_poll_interval", lambda: 0.0)()
+        groups.append(PollGroup(source, float(lo), float(hi), budget_floor=floor))
+    return groups
+
+
+def main() -> None:
+    # python -m valutatrade_hub.parser_service.scheduler [--fixed 300] [--no-lease]
+    import argparse
+
+    from ..core import usecases
+    from ..infra.settings import SettingsLoader
+    from ..logging_config import setup_logging
+    from .events import rates_bus
+    from .factory import make_clients, make_fetcher, make_storage
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixed", type=int, default=0, help="постоянный интервал")
+    parser.add_argument(
+        "--no-lease", action="store_true", help="без выбора лидера (один экземпляр)"
+    )
+    parser.add_argument("--lease-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings = SettingsLoader()
+    setup_logging(settings.get("LOG_PATH"), settings.get("LOG_LEVEL", "INFO"))
+    # Алерты, заявки и рейтинги срабатывают и без открытого CLI
+    rates_bus.subscribe(usecases.handle_rates_changed)
+    cfg = ParserConfig()
+    storage = make_storage(cfg)
+    clients = make_clients(cfg)
+    elector = None
+    if not args.no_lease:
+        elector = LeaseElector(
+            cfg.lease_path,
+            lease_seconds=args.lease_seconds or cfg.SCHEDULER_LEASE_SECONDS,
+        )
+        elector.start_heartbeat()
+    updater = RatesUpdater(
+        clients=clients,
+        storage=storage,
+        write_guard=elector.holds if elector is not None else None,
+        fetcher=make_fetcher(cfg, clients),
+        fence_term=(lambda: elector.term) if elector is not None else None,
+    )
+    try:
+        if args.fixed > 0:
+            SimpleScheduler(updater, args.fixed, elector=elector).run_forever()
+            return
+        AdaptiveScheduler(
+            updater,
+            storage,
+            build_poll_groups(cfg, clients),
+            target_move=cfg.POLL_TARGET_MOVE,
+            window_seconds=cfg.POLL_VOLATILITY_WINDOW_SECONDS,
+            elector=elector,
+        ).run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Освобождаем аренду сразу — последователь не ждёт её истечения
+        if elector is not None:
+            elector.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from ..infra.codecs import (
+    StorageCodec,
+    codec_for_dir,
+    dump_file,
+    is_json_file,
+    load_file,
+)
+from ..infra.filelock import FileLock
+from ..infra.jsonstream import is_blank_file, read_json
+from ..infra.rates_snapshot import write_rates_snapshot
+from .events import RatesVersionFile
+from .history import HistoryStore
+
 
 def utc_now_iso() -> str:
     # ISO-UTC с Z
@@ -16,56 +28,89 @@ def utc_now_iso() -> str:
     )
 
 
-def atomic_write_json(path: Path, data: Any) -> None:
-    # Атомарная запись (tmp -> rename)
+def atomic_write_json(
+    path: Path, data: Any, codec: StorageCodec | None = None
+) -> None:
+    # Атомарная запись (tmp -> rename) в кодеке каталога данных
     path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(path)
+    dump_file(path, data, codec or codec_for_dir(path.parent))
 
 
 def read_json_safe(path: Path, default: Any) -> Any:
-    # Чтение JSON с дефолтом
-    if not path.exists():
-        return default
-    text = path.read_text(encoding="utf-8").strip()
-    if not text:
+    # Чтение хранилища с дефолтом; формат определяется по заголовку
+    if not path.exists() or is_blank_file(path):
         return default
     try:
-        return json.loads(text)
+        if is_json_file(path):
+            return read_json(path)
+        return load_file(path)
     except ValueError:
         return default
 
 
 class RatesStorage:
-    # Хранилище rates.json и history exchange_rates.json
-    def __init__(self, rates_path: Path, history_path: Path) -> None:
+    # Хранилище rates.json и сегментированной истории курсов
+    def __init__(
+        self,
+        rates_path: Path,
+        history_path: Path,
+        history: HistoryStore | None = None,
+    ) -> None:
         self._rates_path = rates_path
         self._history_path = history_path
+        self._history = history or HistoryStore(history_path.parent / "history")
+        # Номер версии курсов для других процессов
+        self._version_file = RatesVersionFile(rates_path.with_suffix(".version"))
+        # Проверка срока аренды и запись снимка — под одной блокировкой
+        self._lock = FileLock(rates_path.with_name(rates_path.name + ".lock"))
+
+    def import_legacy_history(self) -> int:
+        # Явный шаг migrate-storage: старый exchange_rates.json -> сегменты
+        return self._history.import_legacy(self._history_path)
+
+    @property
+    def history(self) -> HistoryStore:
+        return self._history
+
+    @property
+    def version_file(self) -> RatesVersionFile:
+        return self._version_file
 
     def load_snapshot(self) -> dict:
         # {"pairs": {...}, "last_refresh": ...}
         return read_json_safe(self._rates_path, {"pairs": {}, "last_refresh": None})
 
-    def save_snapshot(self, snapshot: dict) -> None:
-        atomic_write_json(self._rates_path, snapshot)
+    @property
+    def binary_path(self) -> Path:
+        return self._rates_path.with_suffix(".bin")
+
+    def save_snapshot(self, snapshot: dict, term: int | None = None) -> bool:
+        # term — срок аренды писателя (маркер ограждения). Снимок хранит
+        # наибольший записанный срок; запись с меньшим отклоняется (False),
+        # даже если старый лидер прошёл проверку аренды до смены владельца.
+        # Без term (один экземпляр, CLI) запись сохраняет хранимый срок
+        with self._lock:
+            stored = int(self.load_snapshot().get("term") or 0)
+            if term is not None and term < stored:
+                return False
+            snapshot = dict(snapshot, term=max(stored, term or 0))
+            atomic_write_json(self._rates_path, snapshot)
+            # Бинарная копия для быстрых точечных чтений (mmap) из других процессов
+            write_rates_snapshot(self.binary_path, snapshot)
+        return True
 
-    def load_history(self) -> list[dict]:
-        # Список записей
-        return read_json_safe(self._history_path, [])
+    def load_history(
+        self,
+        pair: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+        resolution_seconds: int = 0,
+    ) -> list[dict]:
+        # Бары истории с подходящего уровня
+        return self._history.query(pair, since, until, resolution_seconds)
 
     def append_history(self, entries: list[dict]) -> int:
-        # Добавляем новые записи без дублей по id
-        history = self.load_history()
-        existed = {x.get("id") for x in history if isinstance(x, dict)}
-
-        added = 0
-        for e in entries:
-            if e.get("id") in existed:
-                continue
-            history.append(e)
-            existed.add(e.get("id"))
-            added += 1
-
-        atomic_write_json(self._history_path, history)
+        # Дописываем в открытый сегмент (без дублей по id) и обслуживаем уровни
+        added = self._history.append(entries)
+        self._history.maintain()
         return added
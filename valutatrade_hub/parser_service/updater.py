@@ -1,18 +1,55 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
+from typing import Any, Callable, Iterator
 
+from ..core.exceptions import RateLimitExceededError
+from .events import RatesEventBus, rates_bus
+from .redundancy import RedundantFetcher
 from .storage import RatesStorage, utc_now_iso
 
 
 class RatesUpdater:
     # Точка входа обновления
-    def __init__(self, clients: list, storage: RatesStorage) -> None:
+    def __init__(
+        self,
+        clients: list,
+        storage: RatesStorage,
+        bus: RatesEventBus | None = None,
+        write_guard: Callable[[], bool] | None = None,
+        fetcher: RedundantFetcher | None = None,
+        fence_term: Callable[[], int] | None = None,
+    ) -> None:
         self._clients = clients
+        # Группы резервных источников (hedged/quorum); без него — по очереди
+        self._fetcher = fetcher
         self._storage = storage
+        self._bus = bus or rates_bus
+        # Проверка перед записью (аренда лидера); False — результат отбрасывается
+        self._write_guard = write_guard
+        # Срок аренды, под которым начато обновление; хранилище отклонит
+        # запись, если в снимке уже есть более новый срок
+        self._fence_term = fence_term
         self._log = logging.getLogger(__name__)
 
+    def _results(
+        self, previous: dict[str, float], only_source: str | None
+    ) -> Iterator[tuple[str, dict | None, dict | None, Exception | None]]:
+        if self._fetcher is not None:
+            yield from self._fetcher.fetch_all(previous, only_source)
+            return
+        for client in self._clients:
+            # Фильтр по источнику до запроса, чтобы не тратить квоту
+            name = str(getattr(client, "SOURCE", "Unknown"))
+            if only_source and name.lower() != only_source.lower():
+                continue
+            try:
+                rates, meta = client.fetch_rates()
+            except Exception as e:
+                yield name, None, None, e
+                continue
+            yield name, rates, meta, None
+
     def run_update(self, only_source: str | None = None) -> dict[str, Any]:
         """
         Обновляет:
@@ -20,6 +57,7 @@ class RatesUpdater:
         - exchange_rates.json (history)
         """
         self._log.info("Starting rates update...")
+        term = self._fence_term() if self._fence_term is not None else None
 
         snapshot = self._storage.load_snapshot()
         pairs = snapshot.get("pairs", {})
@@ -28,19 +66,24 @@ class RatesUpdater:
 
         history_entries: list[dict] = []
         total_updated = 0
+        changed: set[str] = set()
+        moves: dict[str, tuple[float | None, float]] = {}
+        throttled: list[str] = []
         ts = utc_now_iso()
 
-        for client in self._clients:
+        previous = {
+            p: e["rate"]
+            for p, e in pairs.items()
+            if isinstance(e, dict) and isinstance(e.get("rate"), (int, float))
+        }
+        for name, rates, meta, error in self._results(previous, only_source):
             try:
-                rates, meta = client.fetch_rates()
-
-                source = str(meta.get("source", "Unknown")).lower()
-                if only_source and source != only_source.lower():
-                    continue
+                if error is not None:
+                    raise error
 
                 self._log.info(
                     "Fetching from %s... OK (%s rates)",
-                    meta.get("source"),
+                    meta.get("provider") or meta.get("source"),
                     len(rates),
                 )
 
@@ -54,15 +97,23 @@ class RatesUpdater:
                         "updated_at": ts,
                         "source": meta.get("source"),
                     }
+                    if meta.get("provider", new_entry["source"]) != new_entry["source"]:
+                        # Ответил резервный источник группы (или кворум)
+                        new_entry["provider"] = meta["provider"]
 
                     if not isinstance(entry, dict) or entry.get("updated_at") is None:
                         pairs[pair] = new_entry
                         total_updated += 1
+                        changed.add(pair)
+                        moves[pair] = (None, new_entry["rate"])
                     else:
                         # ISO-строки сопоставимы при одном формате UTC-Z
                         if str(entry.get("updated_at")) < ts:
                             pairs[pair] = new_entry
                             total_updated += 1
+                            if entry.get("rate") != new_entry["rate"]:
+                                changed.add(pair)
+                                moves[pair] = (entry.get("rate"), new_entry["rate"])
 
                     from_cur, to_cur = pair.split("_", 1)
                     hist_id = f"{pair}_{ts}"
@@ -77,20 +128,49 @@ class RatesUpdater:
                             "meta": {
                                 "request_ms": meta.get("request_ms"),
                                 "status_code": meta.get("status_code"),
+                                "partial": meta.get("partial", False),
                                 "etag": meta.get("etag"),
                                 "raw": meta.get("raw"),
+                                "provider": meta.get("provider"),
                             },
                         }
                     )
 
+            except RateLimitExceededError as e:
+                # Бюджет исчерпан: оставляем курсы из кеша
+                throttled.append(e.source)
+                self._log.warning(f"{e}. Serving cached rates for {e.source}")
+
             except Exception as e:
-                self._log.error(f"Failed to fetch: {e}")
+                self._log.error(f"Failed to fetch from {name}: {e}")
 
         snapshot["pairs"] = pairs
         snapshot["last_refresh"] = utc_now_iso()
 
         self._log.info("Writing %s pairs to rates.json...", len(pairs))
-        self._storage.save_snapshot(snapshot)
+        guarded = self._write_guard is None or self._write_guard()
+        if not guarded or not self._storage.save_snapshot(snapshot, term):
+            # Аренду потеряли во время запроса: пишет уже другой экземпляр
+            self._log.warning("Not the leader anymore, discarding fetched rates")
+            return {
+                "total_pairs": len(pairs),
+                "updated_pairs": 0,
+                "last_refresh": None,
+                "history_added": 0,
+                "throttled": throttled,
+                "changed_pairs": 0,
+                "version": None,
+                "fenced": True,
+            }
+
+        # Версию публикуем после записи snapshot: читатель увидит новые курсы
+        version = None
+        if changed:
+            event = self._storage.version_file.bump(
+                changed, snapshot["last_refresh"], moves
+            )
+            version = event.version
+            self._bus.publish(event)
 
         added = self._storage.append_history(history_entries)
         self._log.info("History appended: %s new records", added)
@@ -105,4 +185,7 @@ class RatesUpdater:
             "updated_pairs": total_updated,
             "last_refresh": snapshot["last_refresh"],
             "history_added": added,
+            "throttled": throttled,
+            "changed_pairs": len(changed),
+            "version": version,
         }
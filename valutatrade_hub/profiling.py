@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+MODES = ("cpu", "mem")
+
+
+class CommandProfiler:
+    """
+    Профилирование команд CLI: cpu — cProfile (.pstats), mem — tracemalloc
+    (топ аллокаций, .mem.txt). Профилируется доля sample_rate команд, старые
+    отчёты удаляются сверх max_files — режим можно держать включённым.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        mode: str | None = None,
+        sample_rate: float = 1.0,
+        max_files: int = 500,
+        top: int = 25,
+    ) -> None:
+        self._out_dir = Path(out_dir)
+        self._max_files = max(1, int(max_files))
+        self._top = top
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._log = logging.getLogger(__name__)
+        self.mode: str | None = None
+        self.sample_rate = 1.0
+        self.configure(mode, sample_rate)
+
+    def configure(self, mode: str | None, sample_rate: float | None = None) -> None:
+        # mode: cpu, mem или None/off — выключить
+        mode = None if mode in (None, "", "off") else str(mode).lower()
+        if mode is not None and mode not in MODES:
+            raise ValueError("Режим профилирования: cpu, mem или off")
+        if sample_rate is not None:
+            rate = float(sample_rate)
+            if not 0.0 < rate <= 1.0:
+                raise ValueError("Доля профилирования должна быть в (0, 1]")
+            self.sample_rate = rate
+        self.mode = mode
+
+    def run(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        force_mode: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        # force_mode — разовое профилирование одной команды без выборки
+        mode = force_mode or self.mode
+        if mode is None or (not force_mode and random.random() >= self.sample_rate):
+            return fn(*args, **kwargs)
+        if mode not in MODES:
+            raise ValueError("Режим профилирования: cpu, mem или off")
+        if mode == "cpu":
+            return self._run_cpu(name, fn, args, kwargs)
+        if tracemalloc.is_tracing():
+            # Вложенный вызов уже под tracemalloc
+            return fn(*args, **kwargs)
+        return self._run_mem(name, fn, args, kwargs)
+
+    def _path(self, name: str, suffix: str) -> Path:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name) or "command"
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self._out_dir.mkdir(parents=True, exist_ok=True)
+        return self._out_dir / f"{stamp}-{os.getpid()}-{seq}-{safe}{suffix}"
+
+    def _run_cpu(self, name: str, fn, args, kwargs) -> Any:
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Профилировщик уже активен (например, в другом потоке)
+            return fn(*args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            elapsed = time.perf_counter() - t0
+            path = self._path(name, ".pstats")
+            prof.dump_stats(path)
+            self._done(name, "cpu", elapsed, path)
+
+    def _run_mem(self, name: str, fn, args, kwargs) -> Any:
+        tracemalloc.start(10)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                )
+            )
+            lines = [
+                f"command: {name}",
+                f"elapsed: {elapsed:.3f}s",
+                f"traced current: {current / 1024:.1f} KiB, "
+                f"peak: {peak / 1024:.1f} KiB",
+                "",
+                f"top {self._top} allocations by line:",
+            ]
+            for stat in snapshot.statistics("lineno")[: self._top]:
+                lines.append(str(stat))
+            path = self._path(name, ".mem.txt")
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            self._done(name, "mem", elapsed, path)
+
+    def _done(self, name: str, mode: str, elapsed: float, path: Path) -> None:
+        self._log.info(
+            "PROFILE command=%s mode=%s elapsed=%.3fs report=%s",
+            name,
+            mode,
+            elapsed,
+            path,
+        )
+        self._prune()
+
+    def _prune(self) -> None:
+        # Храним не больше max_files отчётов — самые старые удаляем
+        try:
+            files = sorted(self._out_dir.iterdir(), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for old in files[: max(0, len(files) - self._max_files)]:
+            old.unlink(missing_ok=True)